@@ -0,0 +1,84 @@
+import heapq
+import os
+import time
+
+from utils.storage import PersistentMap
+
+STREAM_CACHE_SIZE = int(os.getenv('MUSIC_STREAM_CACHE_SIZE', 2000))
+# Entradas que expiram em menos que isso já contam como vencidas
+EXPIRY_MARGIN = 600
+
+
+class SearchCache:
+    # Nível 1: busca -> id do vídeo, persistido em disco entre reinícios
+    def __init__(self):
+        self.store = PersistentMap('music.sqlite3', 'search_cache')
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query):
+        return ' '.join(query.lower().split())
+
+    def get(self, query):
+        video_id = self.store.get(self.normalize(query))
+        if video_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return video_id
+
+    def set(self, query, video_id):
+        self.store.set(self.normalize(query), video_id)
+
+    def forget(self, query):
+        self.store.delete(self.normalize(query))
+
+    def flush(self):
+        self.store.flush()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.store)}
+
+
+class StreamCache:
+    # Nível 2: id do vídeo -> URL do stream e metadados, em memória até a URL expirar
+    def __init__(self, max_size=STREAM_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = {}
+        self.expiry_heap = []
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, video_id):
+        info = self.entries.get(video_id)
+        if info is not None and info['expires_at'] - time.time() <= EXPIRY_MARGIN:
+            del self.entries[video_id]
+            info = None
+        if info is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return info
+
+    def put(self, info):
+        if not info.get('id'):
+            return
+        self.entries[info['id']] = info
+        heapq.heappush(self.expiry_heap, (info['expires_at'], info['id']))
+        self.purge()
+
+    def purge(self):
+        # Remove primeiro o que expira antes; se ainda passar do limite, sai quem expira mais cedo
+        deadline = time.time() + EXPIRY_MARGIN
+        while self.expiry_heap and (self.expiry_heap[0][0] <= deadline or len(self.entries) > self.max_size):
+            expires_at, video_id = heapq.heappop(self.expiry_heap)
+            info = self.entries.get(video_id)
+            if info is not None and info['expires_at'] == expires_at:
+                del self.entries[video_id]
+
+    def invalidate(self, video_id):
+        self.entries.pop(video_id, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
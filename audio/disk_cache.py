@@ -0,0 +1,233 @@
+import asyncio
+import os
+import re
+import time
+
+from audio.source import cache_command
+from utils import metrics
+from utils.storage import connect, data_path
+
+# Cache de áudio em disco: 0 MB desliga
+AUDIO_CACHE_MB = int(os.getenv('MUSIC_AUDIO_CACHE_MB', 512))
+# A partir de quantas reproduções a faixa é baixada
+AUDIO_CACHE_MIN_PLAYS = int(os.getenv('MUSIC_AUDIO_CACHE_MIN_PLAYS', 3))
+# Downloads simultâneos: ficam em segundo plano, sem disputar banda com quem está tocando
+AUDIO_CACHE_DOWNLOADS = int(os.getenv('MUSIC_AUDIO_CACHE_DOWNLOADS', 1))
+AUDIO_CACHE_TIMEOUT = 300
+AUDIO_CACHE_DIR = 'audio_cache'
+# Ids do YouTube; qualquer outra coisa não vira nome de arquivo
+CACHEABLE_ID = re.compile(r'[\w-]{1,64}')
+
+AUDIO_CACHE_LOOKUPS = metrics.counter(
+    'potinho_audio_cache_lookups_total', 'Consultas ao cache de áudio em disco', ['result']
+)
+
+
+class AudioCache:
+    # Faixas muito tocadas guardadas como Ogg/Opus em DATA_DIR, com limite de tamanho.
+    # Contagem de reproduções e último uso ficam no SQLite; quem passa do limite sai por LRU
+    def __init__(self, max_bytes=AUDIO_CACHE_MB * 1024 * 1024, min_plays=AUDIO_CACHE_MIN_PLAYS,
+                 downloads=AUDIO_CACHE_DOWNLOADS):
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.directory = data_path(AUDIO_CACHE_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.conn = connect('music.sqlite3')
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS audio_cache ("
+            "video_id TEXT PRIMARY KEY, title TEXT, plays INTEGER NOT NULL DEFAULT 0, "
+            "size INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.semaphore = asyncio.Semaphore(downloads)
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.failures = 0
+        self.evicted = 0
+        self.total_bytes = self._reconcile()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path(self, video_id):
+        return os.path.join(self.directory, f"{video_id}.opus")
+
+    def _reconcile(self):
+        # Banco e diretório podem divergir (arquivo apagado à mão, download interrompido)
+        cached = dict(self.conn.execute("SELECT video_id, size FROM audio_cache WHERE size > 0"))
+        total = 0
+        for video_id, size in cached.items():
+            if os.path.exists(self.path(video_id)):
+                total += size
+            else:
+                self.conn.execute("UPDATE audio_cache SET size = 0 WHERE video_id = ?", (video_id,))
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            # Arquivos recentes podem ser downloads de outro processo do cluster
+            if name.removesuffix('.opus') not in cached and time.time() - os.path.getmtime(path) > AUDIO_CACHE_TIMEOUT:
+                self._remove(path)
+        self.conn.commit()
+        return total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[AudioCache] Falha ao remover {path}: {e}")
+
+    def entry(self, video_id):
+        # (caminho, título) de uma faixa já baixada, sem contar como consulta: o player usa antes
+        # de extrair, e a consulta de verdade acontece ao abrir a fonte
+        if not self.enabled or not video_id or not CACHEABLE_ID.fullmatch(video_id):
+            return None
+        row = self.conn.execute("SELECT size, title FROM audio_cache WHERE video_id = ?", (video_id,)).fetchone()
+        path = self.path(video_id)
+        if row and row[0] > 0 and os.path.exists(path):
+            return path, row[1]
+        return None
+
+    def lookup(self, video_id):
+        # Caminho do arquivo se a faixa estiver no cache
+        if not self.enabled or not video_id or not CACHEABLE_ID.fullmatch(video_id):
+            return None
+        row = self.conn.execute("SELECT size FROM audio_cache WHERE video_id = ?", (video_id,)).fetchone()
+        path = self.path(video_id)
+        if row and row[0] > 0 and os.path.exists(path):
+            self.hits += 1
+            AUDIO_CACHE_LOOKUPS.labels('hit').inc()
+            return path
+        self.misses += 1
+        AUDIO_CACHE_LOOKUPS.labels('miss').inc()
+        return None
+
+    def record_play(self, info, ffmpeg_path):
+        # Conta a reprodução e, passado o limite, agenda o download sem atrasar quem está tocando
+        video_id = info.get('id')
+        if not self.enabled or not video_id or not CACHEABLE_ID.fullmatch(video_id):
+            return
+        self.conn.execute(
+            "INSERT INTO audio_cache (video_id, title, plays, last_used) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(video_id) DO UPDATE SET plays = plays + 1, title = excluded.title, "
+            "last_used = excluded.last_used",
+            (video_id, info.get('title'), time.time())
+        )
+        self.conn.commit()
+        plays, size = self.conn.execute(
+            "SELECT plays, size FROM audio_cache WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if plays >= self.min_plays and size == 0 and video_id not in self.pending:
+            task = asyncio.get_running_loop().create_task(self._store(info, ffmpeg_path))
+            self.pending[video_id] = task
+            task.add_done_callback(lambda _: self.pending.pop(video_id, None))
+
+    async def _store(self, info, ffmpeg_path):
+        video_id = info['id']
+        path = self.path(video_id)
+        # Com o pid: processos do cluster podem baixar a mesma faixa ao mesmo tempo
+        partial = f"{path}.{os.getpid()}.part"
+        async with self.semaphore:
+            started = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *cache_command(ffmpeg_path, info, partial),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), AUDIO_CACHE_TIMEOUT)
+            except BaseException as e:
+                # Timeout, cog descarregado ou cache limpo no meio do download
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                self._remove(partial)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.failures += 1
+                    print(f"[AudioCache] Timeout ao baixar {video_id}")
+                    return
+                raise
+            size = os.path.getsize(partial) if os.path.exists(partial) else 0
+            if process.returncode != 0 or size == 0 or size > self.max_bytes:
+                self.failures += 1
+                self._remove(partial)
+                error = stderr.decode(errors='replace').strip().splitlines()[-1:] or [f"{size} bytes"]
+                print(f"[AudioCache] Falha ao baixar {video_id}: {error[0]}")
+                return
+            os.replace(partial, path)
+            self.conn.execute("UPDATE audio_cache SET size = ? WHERE video_id = ?", (size, video_id))
+            self.conn.commit()
+            self.stored += 1
+            print(f"[AudioCache] {info.get('title') or video_id} salva ({size / 1024 / 1024:.1f} MB em "
+                  f"{time.perf_counter() - started:.1f}s)")
+            self.evict()
+
+    def evict(self):
+        # Remove as faixas usadas há mais tempo até caber no limite. O total vem do banco:
+        # outros processos do cluster também gravam no diretório
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM audio_cache").fetchone()[0]
+        while self.total_bytes > self.max_bytes:
+            row = self.conn.execute(
+                "SELECT video_id, size FROM audio_cache WHERE size > 0 ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self.total_bytes = 0
+                break
+            video_id, size = row
+            # No Linux, quem estiver tocando o arquivo continua lendo até o fim
+            self._remove(self.path(video_id))
+            self.conn.execute("UPDATE audio_cache SET size = 0 WHERE video_id = ?", (video_id,))
+            self.total_bytes -= size
+            self.evicted += 1
+        self.conn.commit()
+
+    async def purge(self):
+        # Apaga arquivos e contagens; devolve quantas faixas e bytes foram liberados
+        for task in list(self.pending.values()):
+            task.cancel()
+        files, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio_cache WHERE size > 0"
+        ).fetchone()
+        # Contagens primeiro: a partir daqui nenhuma consulta aponta para um arquivo sendo apagado
+        self.conn.execute("DELETE FROM audio_cache")
+        self.conn.commit()
+        self.total_bytes = 0
+        # Milhares de arquivos removidos um a um: fora do event loop
+        await asyncio.to_thread(self._remove_files)
+        return files, size
+
+    def _remove_files(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith('.part'):
+                self._remove(os.path.join(self.directory, name))
+
+    def top(self, limit=5):
+        return self.conn.execute(
+            "SELECT title, video_id, plays FROM audio_cache WHERE size > 0 ORDER BY plays DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        files = self.conn.execute("SELECT COUNT(*) FROM audio_cache WHERE size > 0").fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'files': files,
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'stored': self.stored,
+            'failures': self.failures,
+            'evicted': self.evicted,
+            'pending': len(self.pending),
+        }
+
+    def close(self):
+        for task in list(self.pending.values()):
+            task.cancel()
+        self.conn.close()
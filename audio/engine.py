@@ -0,0 +1,230 @@
+import os
+import threading
+
+import discord
+
+from utils import metrics
+
+try:
+    import audioop
+except ImportError:
+    # Removido no Python 3.13: sem ele não há crossfade, só a troca sem silêncio
+    audioop = None
+
+# Quantos segundos antes do fim a próxima faixa já tem o ffmpeg aberto e o primeiro pacote lido
+PREWARM_SECONDS = float(os.getenv('MUSIC_PREWARM_SECONDS', 5))
+# Duração do crossfade em segundos; 0 troca seco, mas ainda sem silêncio entre as faixas
+CROSSFADE_SECONDS = float(os.getenv('MUSIC_CROSSFADE', 0))
+
+FRAME_SECONDS = discord.opus.Decoder.FRAME_LENGTH / 1000
+SAMPLES_PER_FRAME = discord.opus.Decoder.SAMPLES_PER_FRAME
+# PCM de um pacote: 20 ms, 48 kHz, estéreo, 16 bits
+FRAME_BYTES = discord.opus.Decoder.FRAME_SIZE
+SAMPLE_WIDTH = 2
+# Cabeçalhos do Ogg/Opus que o ffmpeg e o cache em disco entregam antes do áudio
+OPUS_HEADERS = (b'OpusHead', b'OpusTags')
+
+TRANSITIONS = metrics.counter(
+    'potinho_track_transitions_total', 'Trocas de faixa pelo motor de reprodução', ['kind']
+)
+
+
+def can_crossfade():
+    # Mixar exige decodificar e recodificar Opus dentro do processo
+    if audioop is None:
+        return False
+    if not discord.opus.is_loaded():
+        try:
+            discord.opus._load_default()
+        except Exception:
+            return False
+    return discord.opus.is_loaded()
+
+
+def cleanup_later(entry):
+    # Matar o ffmpeg pode bloquear; fora da thread de áudio e do event loop
+    threading.Thread(target=entry.cleanup, name='potinho-cleanup', daemon=True).start()
+
+
+class EngineTrack:
+    # Uma fonte de áudio dentro do motor: conta os pacotes lidos para saber a posição na faixa
+    __slots__ = ('source', 'track', 'duration', 'frames', 'primed', 'decoder')
+
+    def __init__(self, source, track, duration=None, start=0):
+        self.source = source
+        self.track = track
+        self.duration = duration
+        # Fonte aberta com seek (retomada depois de uma queda de voz): a posição começa dali
+        self.frames = int(start / FRAME_SECONDS)
+        self.primed = None
+        self.decoder = None
+
+    @property
+    def position(self):
+        return self.frames * FRAME_SECONDS
+
+    @property
+    def remaining(self):
+        if not self.duration:
+            return None
+        return self.duration - self.position
+
+    def _read_source(self):
+        packet = self.source.read()
+        while packet.startswith(OPUS_HEADERS):
+            packet = self.source.read()
+        return packet
+
+    def prime(self):
+        # Bloqueia até o ffmpeg entregar o primeiro pacote: conexão e buffers prontos antes da troca
+        self.primed = self._read_source()
+        return bool(self.primed)
+
+    def read(self):
+        if self.primed is not None:
+            packet, self.primed = self.primed, None
+        else:
+            packet = self._read_source()
+        # Silêncio de um stream se recuperando não avança a posição da faixa
+        if packet and packet is not discord.opus.OPUS_SILENCE:
+            self.frames += 1
+        return packet
+
+    def decode(self, packet):
+        if self.decoder is None:
+            self.decoder = discord.opus.Decoder()
+        pcm = self.decoder.decode(packet)
+        # Pacotes de outra duração viram exatamente um quadro de 20 ms
+        return pcm[:FRAME_BYTES].ljust(FRAME_BYTES, b'\0')
+
+    def cleanup(self):
+        self.source.cleanup()
+
+
+class PlaybackEngine(discord.AudioSource):
+    # Única fonte entregue ao VoiceClient durante uma sessão de reprodução. Quando a faixa atual
+    # acaba, passa para a próxima já aquecida dentro da mesma leitura de 20 ms, sem parar o
+    # AudioPlayer. Tudo é Opus; só a janela do crossfade é decodificada, mixada e recodificada
+    def __init__(self, entry, on_switch, crossfade=CROSSFADE_SECONDS):
+        self.current = entry
+        self.next = None
+        # Chamado na thread de áudio com a nova EngineTrack
+        self.on_switch = on_switch
+        self.crossfade_frames = int(crossfade / FRAME_SECONDS) if crossfade > 0 and can_crossfade() else 0
+        self._encoder = None
+        self._faded = 0
+        self._skip = False
+        self._lock = threading.Lock()
+
+    def is_opus(self):
+        return True
+
+    @property
+    def position(self):
+        current = self.current
+        return current.position if current else 0.0
+
+    @property
+    def remaining(self):
+        current = self.current
+        return current.remaining if current else None
+
+    @property
+    def lead_time(self):
+        # Quanto antes do fim a próxima faixa precisa estar pronta
+        return PREWARM_SECONDS + self.crossfade_frames * FRAME_SECONDS
+
+    def snapshot(self):
+        # Faixa atual e posição; None se a sessão acabou por falta de faixas
+        with self._lock:
+            current = self.current
+            return (current.track, current.position) if current is not None else None
+
+    def set_next(self, entry):
+        with self._lock:
+            if self.current is None:
+                return False
+            old, self.next = self.next, entry
+        if old is not None:
+            cleanup_later(old)
+        return True
+
+    def drop_next(self):
+        with self._lock:
+            old, self.next = self.next, None
+        if old is not None:
+            cleanup_later(old)
+
+    def skip(self):
+        # Troca na próxima leitura; False se não houver faixa aquecida para assumir
+        with self._lock:
+            if self.current is None or self.next is None:
+                return False
+            self._skip = True
+        return True
+
+    def _advance(self, kind):
+        old, self.current, self.next = self.current, self.next, None
+        self._faded = 0
+        if old is not None:
+            cleanup_later(old)
+        if self.current is None:
+            return False
+        TRANSITIONS.labels(kind).inc()
+        self.on_switch(self.current)
+        return True
+
+    def _fading(self, current):
+        if not self.crossfade_frames:
+            return False
+        if self._faded:
+            return True
+        remaining = current.remaining
+        return remaining is not None and remaining <= self.crossfade_frames * FRAME_SECONDS
+
+    def _mix(self, current):
+        outgoing = current.read()
+        incoming = self.next.read()
+        if not outgoing:
+            # A faixa acabou antes do previsto: a próxima segue sozinha
+            self._advance('crossfade')
+            return incoming
+        if not incoming:
+            return outgoing
+        if self._encoder is None:
+            self._encoder = discord.opus.Encoder()
+        self._faded += 1
+        gain = min(self._faded / self.crossfade_frames, 1.0)
+        pcm = audioop.add(
+            audioop.mul(current.decode(outgoing), SAMPLE_WIDTH, 1.0 - gain),
+            audioop.mul(self.next.decode(incoming), SAMPLE_WIDTH, gain),
+            SAMPLE_WIDTH
+        )
+        packet = self._encoder.encode(pcm, SAMPLES_PER_FRAME)
+        if self._faded >= self.crossfade_frames:
+            self._advance('crossfade')
+        return packet
+
+    def read(self):
+        with self._lock:
+            if self._skip:
+                self._skip = False
+                self._advance('skip')
+            current = self.current
+            if current is None:
+                return b''
+            if self.next is not None and self._fading(current):
+                return self._mix(current)
+            packet = current.read()
+            if not packet and self._advance('gapless'):
+                packet = self.current.read()
+            return packet
+
+    def cleanup(self):
+        # Chamado pelo AudioPlayer quando a sessão termina (fila acabou, parar, desconexão)
+        with self._lock:
+            entries = (self.current, self.next)
+            self.current = self.next = None
+        for entry in entries:
+            if entry is not None:
+                entry.cleanup()
@@ -0,0 +1,488 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlparse
+
+from audio.cache import SearchCache, StreamCache
+from utils import metrics
+from utils.storage import PersistentMap
+
+# Validade assumida quando a URL não traz o parâmetro "expire"
+DEFAULT_STREAM_TTL = 3600
+
+EXTRACT_WORKERS = int(os.getenv('MUSIC_EXTRACT_WORKERS', 2))
+EXTRACT_TIMEOUT = float(os.getenv('MUSIC_EXTRACT_TIMEOUT', 30))
+# Pedidos aguardando um worker livre além dos que já estão rodando
+EXTRACT_QUEUE_SIZE = int(os.getenv('MUSIC_EXTRACT_QUEUE_SIZE', 16))
+
+# Playlists e mixes do YouTube: quantas faixas entram no máximo e quantas vêm por chamada ao worker
+PLAYLIST_LIMIT = int(os.getenv('MUSIC_PLAYLIST_LIMIT', 500))
+PLAYLIST_PAGE_SIZE = 100
+YOUTUBE_DOMAINS = ('youtube.com', 'youtu.be')
+# Entradas planas de vídeos que não tocam mais
+UNAVAILABLE_TITLES = ('[Private video]', '[Deleted video]')
+
+# Candidatos do YouTube comparados com cada faixa do Spotify
+SPOTIFY_CANDIDATES = 5
+# Versões que só servem se o próprio título no Spotify também as mencionar
+UNWANTED_VERSIONS = ('live', 'ao vivo', 'en vivo', 'cover', 'karaoke', 'lyric', 'letra', 'remix', 'sped up', 'slowed', '8d')
+
+YTDL_OPTIONS = {
+    # Opus primeiro: com ele o player só copia os pacotes, sem transcodificar
+    'format': 'bestaudio[acodec=opus]/bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'ignoreerrors': True,
+    # Buscas e playlists voltam "planas" (só ids); vídeos são extraídos por completo
+    'extract_flat': 'in_playlist',
+    'default_search': 'ytsearch',
+    'socket_timeout': 15,
+    'retries': 5,
+    'extractor_args': {
+        'youtube': {
+            'skip': ['dash', 'hls'],
+            'player_client': ['android', 'web'],
+        }
+    },
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '192',
+    }],
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7'
+    }
+}
+
+
+YOUTUBE_ID_RE = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+
+class NoResults(Exception):
+    pass
+
+
+class ExtractorBusy(Exception):
+    pass
+
+
+class DownloadError(Exception):
+    # DownloadError do yt-dlp convertido no worker: o processo do bot nunca importa o yt-dlp
+    pass
+
+
+EXTRACT_SECONDS = metrics.histogram(
+    'potinho_extract_seconds', 'Tempo das chamadas ao yt-dlp (busca e extração)', ['operation']
+)
+EXTRACT_FAILURES = metrics.counter(
+    'potinho_extract_failures_total', 'Chamadas ao yt-dlp que falharam ou estouraram o tempo', ['operation']
+)
+
+# Instância do YoutubeDL reaproveitada por todas as extrações de um processo worker
+_ytdl = None
+
+
+def _get_ytdl():
+    global _ytdl
+    if _ytdl is None:
+        import yt_dlp
+        _ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+    return _ytdl
+
+
+def _extract_info(url):
+    import yt_dlp
+    try:
+        return _get_ytdl().extract_info(url, download=False)
+    except yt_dlp.utils.DownloadError as e:
+        raise DownloadError(str(e)) from None
+
+
+def _warmup():
+    _get_ytdl()
+    return os.getpid()
+
+
+def is_url(query):
+    return query.startswith(('http://', 'https://'))
+
+
+def video_id_from_url(url):
+    match = YOUTUBE_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def playlist_id_from_url(url):
+    # Links de playlist e de mix ("watch?v=...&list=RD...") trazem o parâmetro "list"
+    parsed = urlparse(url)
+    host = parsed.hostname or ''
+    # Domínio exato ou subdomínio: "notyoutube.com" não é YouTube
+    if not any(host == domain or host.endswith('.' + domain) for domain in YOUTUBE_DOMAINS):
+        return None
+    return (parse_qs(parsed.query).get('list') or [None])[0]
+
+
+def watch_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def pick_audio_format(info):
+    # URL do áudio e, quando o yt-dlp informa, codec e contêiner (o player decide se copia o Opus)
+    if 'url' in info:
+        return info
+
+    # Tenta encontrar a melhor URL de áudio nos formatos disponíveis
+    for fmt in info.get('formats', []):
+        if fmt.get('acodec') != 'none' and fmt.get('url'):
+            return fmt
+
+    for fmt in info.get('requested_formats', []):
+        if fmt.get('acodec') != 'none' and fmt.get('url'):
+            return fmt
+
+    return {'url': f"https://youtu.be/{info.get('id', '')}"}
+
+
+def stream_expiry(url):
+    # As URLs do googlevideo carregam o timestamp de expiração em "expire"
+    try:
+        return float(parse_qs(urlparse(url).query)['expire'][0])
+    except (KeyError, IndexError, ValueError):
+        return time.time() + DEFAULT_STREAM_TTL
+
+
+def first_entry(info):
+    if not info:
+        raise NoResults("❌ Nenhum resultado encontrado para sua busca.")
+
+    # Se for uma busca ou playlist, pega o primeiro resultado
+    if 'entries' in info:
+        entries = [e for e in info['entries'] if e is not None]
+        if not entries:
+            raise NoResults("❌ Nenhum vídeo encontrado ou vídeo restrito.")
+        return entries[0]
+    return info
+
+
+def search(query):
+    # Roda no worker: só descobre o id do primeiro resultado (busca plana, barata)
+    info = _extract_info(f"ytsearch1:{query}")
+    return first_entry(info)['id']
+
+
+def search_candidates(query, count):
+    # Roda no worker: vários resultados planos de uma vez, com título e duração
+    info = _extract_info(f"ytsearch{count}:{query}")
+    entries = [e for e in (info or {}).get('entries') or [] if e and e.get('id')]
+    if not entries:
+        raise NoResults("❌ Nenhum vídeo encontrado ou vídeo restrito.")
+    return [
+        {'id': e['id'], 'title': e.get('title') or '', 'duration': e.get('duration')}
+        for e in entries
+    ]
+
+
+def playlist_page(url, start, count):
+    # Roda no worker: uma página plana da playlist (id, título e duração), sem extrair os vídeos.
+    # O yt-dlp percorre as continuações até a página pedida, que é buscada por último
+    ytdl = _get_ytdl()
+    ytdl.params['playlist_items'] = f"{start + 1}:{start + count}"
+    try:
+        info = _extract_info(url)
+    finally:
+        ytdl.params.pop('playlist_items', None)
+
+    if not info or 'entries' not in info:
+        raise NoResults("❌ Playlist vazia, privada ou indisponível.")
+    entries = list(info['entries'])
+    return {
+        'title': info.get('title') or 'Playlist',
+        'count': info.get('playlist_count'),
+        # Inclui os indisponíveis: uma página incompleta é a última
+        'fetched': len(entries),
+        'entries': [
+            {'id': e['id'], 'title': e.get('title'), 'duration': e.get('duration')}
+            for e in entries
+            if e and e.get('id') and e.get('title') not in UNAVAILABLE_TITLES
+        ],
+    }
+
+
+def match_score(candidate, track):
+    # Menor é melhor: diferença de duração em segundos mais penalidades por versões indesejadas
+    if candidate['duration'] is None or not track.get('duration_ms'):
+        score = 60.0
+    else:
+        score = abs(candidate['duration'] - track['duration_ms'] / 1000)
+
+    title = candidate['title'].lower()
+    wanted = track['name'].lower()
+    for word in UNWANTED_VERSIONS:
+        if word in title and word not in wanted:
+            score += 30
+    if not any(artist.lower() in title for artist in track['artists']):
+        score += 5
+    return score
+
+
+def spotify_search_query(track):
+    return f"{' '.join(track['artists'][:2])} - {track['name']}"
+
+
+def _stop_pool(pool, grace):
+    # Roda em uma thread: o que ainda roda no pool aposentado tem `grace` segundos para
+    # terminar; o worker que sobrar (o travado) é encerrado à força
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    deadline = time.monotonic() + grace
+    for process in processes:
+        process.join(max(0, deadline - time.monotonic()))
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+
+
+def extract(url):
+    # Roda no worker: extrai o stream e devolve só o que o player usa
+    info = first_entry(_extract_info(url))
+    if info.get('_type') == 'url':
+        info = first_entry(_extract_info(info['url']))
+
+    audio = pick_audio_format(info)
+    return {
+        'id': info.get('id'),
+        'url': audio['url'],
+        'expires_at': stream_expiry(audio['url']),
+        'acodec': audio.get('acodec'),
+        'ext': audio.get('ext'),
+        'title': info.get('title', url),
+        'duration': info.get('duration'),
+        'webpage_url': info.get('webpage_url', f"https://youtu.be/{info.get('id', '')}"),
+    }
+
+
+class Extractor:
+    # Resolve buscas/URLs compartilhando os caches entre todos os servidores
+    def __init__(self, bot, workers=EXTRACT_WORKERS, timeout=EXTRACT_TIMEOUT, queue_size=EXTRACT_QUEUE_SIZE):
+        self.bot = bot
+        self.searches = SearchCache()
+        self.streams = StreamCache()
+        # id da faixa no Spotify -> id do vídeo escolhido no YouTube
+        self.spotify_matches = PersistentMap('music.sqlite3', 'spotify_matches')
+        self.extractions = 0
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = workers + queue_size
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.pool = None
+        self._slots = asyncio.Semaphore(workers)
+        self._inflight = {}
+
+    def _ensure_pool(self):
+        if self.pool is None:
+            # "spawn" para os workers não herdarem o loop e as conexões do bot
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self.pool
+
+    async def start(self):
+        # Sobe os processos e cria o YoutubeDL de cada um antes do primeiro pedido
+        pool = self._ensure_pool()
+        pids = await asyncio.gather(*(
+            self.bot.loop.run_in_executor(pool, _warmup) for _ in range(self.workers)
+        ))
+        print(f"[Extractor] {len(set(pids))} worker(s) de extração prontos")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        # Escritas ainda na fila da thread do banco chegam ao disco antes do descarregamento
+        self.searches.flush()
+        self.spotify_matches.flush()
+
+    def _retire(self, pool):
+        # Os próximos pedidos sobem um pool novo; o antigo é desligado fora do event loop
+        if self.pool is pool:
+            self.pool = None
+        print("[Extractor] Worker travado após timeout, trocando o pool")
+        self.bot.loop.run_in_executor(None, _stop_pool, pool, self.timeout)
+
+    def _submit(self, func, *args):
+        try:
+            return self._ensure_pool().submit(func, *args)
+        except BrokenProcessPool:
+            print("[Extractor] Pool de workers quebrado, recriando")
+            self.pool = None
+            return self._ensure_pool().submit(func, *args)
+
+    async def _run(self, func, *args, background=False):
+        # Pedidos em segundo plano (prefetch) não ocupam a fila de quem está esperando
+        limit = self.workers if background else self.max_pending
+        if self.pending >= limit:
+            self.rejected += 1
+            raise ExtractorBusy("⏳ Muitas buscas em andamento, tente novamente em instantes.")
+
+        self.pending += 1
+        try:
+            await self._slots.acquire()
+            try:
+                future = self._submit(func, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            pool = self.pool
+            released = False
+
+            def release():
+                nonlocal released
+                if not released:
+                    released = True
+                    self._slots.release()
+
+            # Cancelado (pular/sair) depois de já estar rodando, o worker segue até o fim: a vaga
+            # só volta quando ele termina de fato
+            future.add_done_callback(lambda _: self.bot.loop.call_soon_threadsafe(release))
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                EXTRACT_FAILURES.labels(func.__name__).inc()
+                # Worker travado: o pool é trocado e a vaga volta agora, em vez de esperar o yt-dlp
+                self._retire(pool)
+                release()
+                raise
+            except BrokenProcessPool:
+                if self.pool is pool:
+                    self.pool = None
+                EXTRACT_FAILURES.labels(func.__name__).inc()
+                raise
+            except Exception:
+                EXTRACT_FAILURES.labels(func.__name__).inc()
+                raise
+            EXTRACT_SECONDS.labels(func.__name__).observe(time.perf_counter() - started)
+            return result
+        finally:
+            self.pending -= 1
+
+    async def resolve(self, query, background=False):
+        if is_url(query):
+            video_id = video_id_from_url(query)
+            if video_id is None:
+                return await self._extract(query, background)
+            return await self._resolve_id(video_id, background)
+
+        video_id = self.searches.get(query)
+        if video_id is not None:
+            try:
+                return await self._resolve_id(video_id, background)
+            except (NoResults, DownloadError):
+                # O vídeo salvo pode ter saído do ar: esquece e busca de novo
+                self.searches.forget(query)
+
+        video_id = await self._run(search, query, background=background)
+        self.searches.set(query, video_id)
+        return await self._resolve_id(video_id, background)
+
+    async def resolve_spotify(self, track, background=False):
+        # A mesma gravação aparece com ids diferentes (single, álbum, coletânea): o ISRC une todas
+        keys = [track['id']]
+        if track.get('isrc'):
+            keys.append(f"isrc:{track['isrc']}")
+
+        for key in keys:
+            video_id = self.spotify_matches.get(key)
+            if video_id is None:
+                continue
+            try:
+                return await self._resolve_id(video_id, background)
+            except (NoResults, DownloadError):
+                self.spotify_matches.delete(key)
+
+        # Uma busca só, com vários candidatos: fica o de duração mais próxima da faixa
+        candidates = await self._run(
+            search_candidates, spotify_search_query(track), SPOTIFY_CANDIDATES, background=background
+        )
+        best = min(candidates, key=lambda candidate: match_score(candidate, track))
+        print(f"[Extractor] Spotify {track['id']} -> YouTube {best['id']} ({best['title']})")
+        for key in keys:
+            self.spotify_matches.set(key, best['id'])
+        return await self._resolve_id(best['id'], background)
+
+    async def playlist(self, url, limit=PLAYLIST_LIMIT):
+        # A primeira página sai sozinha para a fila começar a tocar logo. O yt-dlp percorre as
+        # continuações desde o início a cada extração, então o resto vem numa só (página por
+        # página seria quadrático no tamanho da playlist)
+        count = min(PLAYLIST_PAGE_SIZE, limit)
+        page = await self._run(playlist_page, url, 0, count)
+        yield page
+        if page['fetched'] < count or count >= limit:
+            return
+        yield await self._run(playlist_page, url, count, limit - count)
+
+    async def _resolve_id(self, video_id, background=False):
+        info = self.streams.get(video_id)
+        if info is not None:
+            return info
+        return await self._extract(watch_url(video_id), background)
+
+    async def refresh(self, info):
+        # A URL do stream parou de responder no meio da faixa (expirou, 403): extrai de novo
+        if not info.get('id'):
+            return await self._extract(info['webpage_url'])
+        self.streams.invalidate(info['id'])
+        return await self._extract(watch_url(info['id']))
+
+    async def _extract(self, url, background=False):
+        # Servidores pedindo o mesmo vídeo ao mesmo tempo compartilham uma extração
+        # [tarefa, quantos ainda esperam por ela]
+        entry = self._inflight.get(url)
+        if entry is None or entry[0].cancelling():
+            task = self.bot.loop.create_task(self._extract_now(url, background))
+            entry = self._inflight[url] = [task, 0]
+            task.add_done_callback(lambda t: self._forget(url, entry))
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # shield: quem cancela (pular/sair) não derruba a extração dos outros
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            # O último a desistir leva a extração junto; na fila, ela nem chega a um worker
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    def _forget(self, url, entry):
+        if self._inflight.get(url) is entry:
+            del self._inflight[url]
+        task = entry[0]
+        if not task.cancelled():
+            task.exception()
+
+    async def _extract_now(self, url, background):
+        info = await self._run(extract, url, background=background)
+        self.extractions += 1
+        self.streams.put(info)
+        return info
+
+    def stats(self):
+        return {
+            'extractions': self.extractions,
+            'pending': self.pending,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'search_cache': self.searches.stats(),
+            'stream_cache': self.streams.stats(),
+        }
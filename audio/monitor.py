@@ -0,0 +1,173 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import discord
+
+from audio.source import FRAME_SECONDS
+from utils import metrics
+
+# Sem pacotes do ffmpeg por esse tempo no meio da faixa: o stream travou e é reaberto
+STALL_SECONDS = float(os.getenv('MUSIC_STALL_SECONDS', 3))
+# Reaberturas por faixa; passando disso a faixa termina onde parou
+MAX_RESTARTS = int(os.getenv('MUSIC_STREAM_RESTARTS', 3))
+# Fim do stream mais cedo que isso antes da duração conhecida conta como queda, não como fim
+EARLY_EOF_MARGIN = 5
+# Pacotes lidos à frente do que o Discord consome (3 s): absorve oscilações curtas da rede
+BUFFER_PACKETS = 150
+STARTUP_TIMEOUT = 15
+REOPEN_TIMEOUT = 30
+OPUS_HEADERS = (b'OpusHead', b'OpusTags')
+# Preenche os buracos; o motor reconhece o objeto e não conta como posição da faixa
+SILENCE = discord.opus.OPUS_SILENCE
+
+STREAM_EVENTS = metrics.counter(
+    'potinho_stream_events_total', 'Falhas e recuperações dos streams de áudio', ['event']
+)
+STREAM_HICCUPS = metrics.histogram(
+    'potinho_stream_hiccup_seconds', 'Silêncio inserido até o stream voltar a entregar pacotes'
+)
+
+
+class StreamMonitor(discord.AudioSource):
+    # Envolve o ffmpeg de um stream remoto. Uma thread lê os pacotes para um buffer; a thread de
+    # áudio só consome dele, então um stream lento vira silêncio em vez de travar o AudioPlayer.
+    # Travou por STALL_SECONDS ou terminou antes da hora (URL expirada, 403, conexão caída):
+    # pede uma URL nova ao event loop e reabre o ffmpeg com -ss no último pacote lido
+    def __init__(self, source, reopen, loop, duration=None, start=0):
+        self.source = source
+        # Corrotina (posição) -> nova fonte; roda no event loop
+        self.reopen = reopen
+        self.loop = loop
+        self.duration = duration
+        self.start = start
+        # Pacotes lidos do ffmpeg, não os entregues: o que já está no buffer ainda vai tocar
+        self.read_frames = 0
+        self.restarts = 0
+        self.buffer = queue.Queue(BUFFER_PACKETS)
+        self.started = False
+        self.ended = False
+        self.starved_since = None
+        self._stalled = False
+        self._restarting = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._pump, name='potinho-stream', daemon=True)
+        self.thread.start()
+
+    def is_opus(self):
+        return True
+
+    @property
+    def read_position(self):
+        return self.start + self.read_frames * FRAME_SECONDS
+
+    def _put(self, item):
+        # Buffer cheio é o caso normal (o ffmpeg lê mais rápido que o tempo real)
+        while not self._closed:
+            try:
+                self.buffer.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _pump(self):
+        while not self._closed:
+            try:
+                packet = self.source.read()
+            except Exception:
+                # Processo morto pelo detector de travamento no meio da leitura
+                packet = b''
+            if packet:
+                if not packet.startswith(OPUS_HEADERS):
+                    self.read_frames += 1
+                    self._put(packet)
+                continue
+            if self._closed:
+                break
+            reason = 'stall' if self._stalled else self._eof_reason()
+            if reason is None or not self._restart(reason):
+                break
+        self._put(None)
+
+    def _eof_reason(self):
+        if self.duration and self.read_position < self.duration - EARLY_EOF_MARGIN:
+            return 'early_eof'
+        return None
+
+    def _restart(self, reason):
+        STREAM_EVENTS.labels(reason).inc()
+        if self.restarts >= MAX_RESTARTS:
+            STREAM_EVENTS.labels('gave_up').inc()
+            print(f"[Stream] {reason} em {self.read_position:.1f}s, sem mais tentativas")
+            return False
+        self.restarts += 1
+        # Ao vivo (sem duração) não tem como voltar ao ponto: reabre na ponta do stream
+        seek = self.read_position if self.duration else 0
+        self._restarting = True
+        old = self.source
+        try:
+            old.cleanup()
+            future = asyncio.run_coroutine_threadsafe(self.reopen(seek), self.loop)
+            try:
+                source = future.result(REOPEN_TIMEOUT)
+            except Exception as e:
+                future.cancel()
+                STREAM_EVENTS.labels('restart_failed').inc()
+                print(f"[Stream] Falha ao reabrir após {reason}: {type(e).__name__}: {e}")
+                return False
+            with self._lock:
+                if self._closed:
+                    source.cleanup()
+                    return False
+                self.source = source
+                self._stalled = False
+        finally:
+            self._restarting = False
+        STREAM_EVENTS.labels('restart').inc()
+        print(f"[Stream] {reason}: reaberto em {seek:.1f}s (tentativa {self.restarts})")
+        return True
+
+    def read(self):
+        if self.ended:
+            return b''
+        if not self.started:
+            # Começo da faixa: espera o ffmpeg como qualquer fonte (o prime do motor conta com isso)
+            try:
+                packet = self.buffer.get(timeout=STARTUP_TIMEOUT)
+            except queue.Empty:
+                packet = None
+            self.started = True
+        else:
+            try:
+                packet = self.buffer.get_nowait()
+            except queue.Empty:
+                return self._underrun()
+        if packet is None:
+            self.ended = True
+            return b''
+        if self.starved_since is not None:
+            STREAM_HICCUPS.observe(time.monotonic() - self.starved_since)
+            self.starved_since = None
+        return packet
+
+    def _underrun(self):
+        now = time.monotonic()
+        if self.starved_since is None:
+            self.starved_since = now
+            STREAM_EVENTS.labels('underrun').inc()
+        elif not (self._stalled or self._restarting) and now - self.starved_since > STALL_SECONDS:
+            # Mata o ffmpeg travado; a thread de leitura vê o fim e reabre
+            self._stalled = True
+            with self._lock:
+                source = self.source
+            threading.Thread(target=source.cleanup, name='potinho-cleanup', daemon=True).start()
+        return SILENCE
+
+    def cleanup(self):
+        self._closed = True
+        with self._lock:
+            source = self.source
+        source.cleanup()
@@ -0,0 +1,432 @@
+import asyncio
+import os
+import time
+
+import discord
+
+from audio import extractor
+from audio.engine import EngineTrack, PlaybackEngine, cleanup_later
+from audio.monitor import StreamMonitor
+from audio.queue import TrackQueue
+from audio.source import CachedOpusAudio, create_source, ogg_duration, probe
+from utils import metrics
+
+IDLE_TIMEOUT = int(os.getenv('MUSIC_IDLE_TIMEOUT', 300))
+# Quantas faixas à frente da atual ficam resolvidas enquanto ela toca
+PREFETCH_DEPTH = int(os.getenv('MUSIC_PREFETCH_DEPTH', 2))
+# Faixas cuja URL expira em menos que isso são resolvidas de novo
+REFRESH_MARGIN = 600
+PREFETCH_INTERVAL = 60
+# Tempo máximo para o ffmpeg da próxima faixa entregar o primeiro pacote
+PREWARM_TIMEOUT = 15
+
+# Sem label por servidor: uma série por guild cresce sem limite com o número de servidores
+VOICE_STREAMS = metrics.counter('potinho_voice_streams_total', 'Streams de áudio iniciados')
+
+
+class GuildPlayer:
+    # Estado de música de um único servidor: fila, faixa atual e a task que toca a fila
+    def __init__(self, cog, guild):
+        self.cog = cog
+        self.bot = cog.bot
+        self.guild = guild
+        self.queue = TrackQueue()
+        self.current = None
+        self.channel = None
+        self.task = None
+        self.ingest_tasks = set()
+        # Motor da sessão de reprodução atual (um por voice_client.play) e a próxima faixa sendo aquecida
+        self.engine = None
+        self.prewarm_task = None
+        # Faixa que o motor assumiu sem pausa e o player_loop ainda não registrou
+        self.switched = None
+        # Canal de voz da sessão (para reconectar) e onde a última sessão parou
+        self.voice_channel_id = None
+        self.stopped_at = None
+        self._wake = asyncio.Event()
+        self._track_done = asyncio.Event()
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    @property
+    def voice_connected(self):
+        voice_client = self.voice_client
+        return voice_client is not None and voice_client.is_connected()
+
+    @property
+    def is_active(self):
+        return self.current is not None or bool(self.queue) or bool(self.ingest_tasks)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = self.bot.loop.create_task(self.player_loop())
+
+    def wake(self):
+        self._wake.set()
+        self.start()
+
+    def enqueue(self, track):
+        self.queue.append(track)
+        self.wake()
+        self.prefetch()
+
+    def enqueue_many(self, tracks):
+        self.queue.extend(tracks)
+        self.wake()
+        self.prefetch()
+
+    def ingest(self, coro):
+        # Tasks que vão alimentando a fila (ex.: playlists do Spotify)
+        task = self.bot.loop.create_task(coro)
+        self.ingest_tasks.add(task)
+        task.add_done_callback(self.ingest_tasks.discard)
+        return task
+
+    def queue_changed(self):
+        # Depois de embaralhar/mover/remover: a faixa aquecida no motor pode não ser mais a próxima
+        engine = self.engine
+        if engine is not None and engine.next is not None and engine.next.track is not self.queue.peek():
+            self.cancel_prewarm()
+        self.prefetch()
+
+    def shuffle(self):
+        self.queue.shuffle()
+        self.queue_changed()
+
+    def move(self, source, destination):
+        track = self.queue.move(source, destination)
+        self.queue_changed()
+        return track
+
+    def remove(self, index):
+        track = self.queue.remove(index)
+        track.cancel()
+        self.queue_changed()
+        return track
+
+    def dedupe(self):
+        removed = self.queue.dedupe()
+        for track in removed:
+            track.cancel()
+        self.queue_changed()
+        return removed
+
+    def clear(self):
+        for task in list(self.ingest_tasks):
+            task.cancel()
+        self.cancel_prewarm()
+        for track in self.queue:
+            track.cancel()
+        self.queue.clear()
+
+    def stop(self):
+        self.clear()
+        self.switched = None
+        if self.voice_client:
+            self.voice_client.stop()
+
+    def skip(self):
+        # Se a faixa atual ainda está sendo resolvida, cancela a extração
+        if self.current is not None:
+            self.current.cancel()
+        voice_client = self.voice_client
+        if self.engine is not None and self.engine.skip():
+            # A próxima já está aquecida: o motor troca na próxima leitura, sem parar o player
+            if voice_client and voice_client.is_paused():
+                voice_client.resume()
+            return
+        if voice_client:
+            voice_client.stop()
+
+    def destroy(self):
+        self.clear()
+        self.engine = None
+        self.switched = None
+        if self.current is not None:
+            self.current.cancel()
+        self.current = None
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def prefetch(self):
+        # Resolve em segundo plano as próximas faixas (ou renova as que vão expirar)
+        for track in self.queue.head(PREFETCH_DEPTH):
+            if track.is_fresh(REFRESH_MARGIN) or self.cached_info(track):
+                continue
+            if track.task is None or track.task.done():
+                track.task = self.bot.loop.create_task(self._prefetch_track(track))
+
+    async def _prefetch_track(self, track):
+        try:
+            await self._resolve(track, background=True)
+        except Exception as e:
+            print(f"[prefetch {self.guild.id}] Falha ao resolver {track.query}: {type(e).__name__}: {e}")
+
+    async def _resolve(self, track, background=False):
+        started = time.perf_counter()
+        if track.spotify and track.spotify.get('id'):
+            info = await self.cog.extractor.resolve_spotify(track.spotify, background=background)
+        else:
+            info = await self.cog.extractor.resolve(track.query, background=background)
+        track.set_info(info)
+        print(f"[resolve {self.guild.id}] {track.title} resolvida em {time.perf_counter() - started:.2f}s")
+        return info
+
+    def cached_info(self, track):
+        # Link do YouTube ou item de playlist (id conhecido) já no cache em disco: toca do arquivo
+        # sem passar pelo yt-dlp. A entrada não tem URL de stream e já nasce expirada; se o
+        # arquivo sumir até a fonte abrir, build_source extrai como qualquer faixa
+        if track.is_fresh(REFRESH_MARGIN):
+            return None
+        video_id = track.video_id or extractor.video_id_from_url(track.query)
+        stored = self.cog.audio_cache.entry(video_id)
+        if stored is None:
+            return None
+        path, title = stored
+        info = {
+            'id': video_id,
+            'title': title or track.title,
+            'duration': track.duration or ogg_duration(path),
+            'webpage_url': extractor.watch_url(video_id),
+            'expires_at': 0,
+        }
+        track.set_info(info)
+        return info
+
+    async def ensure_resolved(self, track):
+        if track.task is not None and not track.task.done():
+            await track.task
+        if track.is_fresh(REFRESH_MARGIN):
+            return track.info
+        # Prefetch falhou ou a URL está para expirar: resolve agora, numa task que pular/sair podem cancelar
+        track.task = self.bot.loop.create_task(self._resolve(track))
+        return await track.task
+
+    def send(self, content):
+        # Status do player: o agendador de mensagens mescla e, sob acúmulo, descarta
+        if self.channel is not None:
+            self.bot.outbox.status(self.channel, content)
+
+    async def player_loop(self):
+        try:
+            while True:
+                self._wake.clear()
+                switched, self.switched = self.switched, None
+                if switched is not None:
+                    # O motor já está tocando a faixa aquecida: só assume o estado e anuncia
+                    if self.queue.peek() is switched:
+                        self.queue.popleft()
+                    self.current = switched
+                    self._track_done.clear()
+                    self.cog.audio_cache.record_play(switched.info, self.cog.ffmpeg_path)
+                    self.announce(switched.info)
+                    await self._follow()
+                    self.current = None
+                elif not self.queue:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), IDLE_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        print(f"[GuildPlayer {self.guild.id}] Ocioso, liberando player")
+                        return
+                    continue
+                else:
+                    self.current = self.queue.popleft()
+                    self._track_done.clear()
+                    if await self.play_yt(self.current):
+                        await self._follow()
+                    self.current = None
+
+                if not self.queue:
+                    self.send("🎶 Fila vazia")
+        finally:
+            self.current = None
+            self.cog.drop_player(self)
+
+    async def _follow(self):
+        # Espera a faixa acabar; se foi a sessão de voz que caiu no meio dela (servidor de voz
+        # trocado, conexão perdida), volta ao canal e continua do mesmo ponto
+        while True:
+            self.stopped_at = None
+            await self._wait_track()
+            stopped, self.stopped_at = self.stopped_at, None
+            if stopped is None or self.voice_connected:
+                return
+            track, position = stopped
+            print(f"[GuildPlayer {self.guild.id}] Voz caiu em {position:.1f}s de {track.title}")
+            if not await self.cog.voice.reconnect(self):
+                self.send("❌ Perdi a conexão com o canal de voz e não consegui voltar.")
+                self.clear()
+                return
+            self._track_done.clear()
+            self.current = track
+            if not await self.play_yt(track, seek=position):
+                return
+
+    async def _wait_track(self):
+        # Enquanto a faixa toca, mantém as próximas resolvidas e com URL válida e, perto do fim,
+        # deixa a seguinte aquecida no motor
+        while True:
+            self.prefetch()
+            self.prewarm()
+            try:
+                await asyncio.wait_for(self._track_done.wait(), self._next_check())
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    def _next_check(self):
+        engine = self.engine
+        remaining = engine.remaining if engine is not None else None
+        if remaining is None or engine.next is not None:
+            return PREFETCH_INTERVAL
+        return min(max(remaining - engine.lead_time, 1), PREFETCH_INTERVAL)
+
+    def prewarm(self):
+        engine = self.engine
+        if engine is None or engine.next is not None or not self.queue:
+            return
+        if self.prewarm_task is not None and not self.prewarm_task.done():
+            return
+        remaining = engine.remaining
+        if remaining is None or remaining > engine.lead_time:
+            return
+        self.prewarm_task = self.bot.loop.create_task(self._prewarm(engine, self.queue.peek()))
+
+    async def _prewarm(self, engine, track):
+        entry = None
+        try:
+            info = self.cached_info(track) or await self.ensure_resolved(track)
+            source, info = await self.build_source(track, info)
+            entry = EngineTrack(source, track, info.get('duration'))
+            primed = await asyncio.wait_for(asyncio.to_thread(entry.prime), PREWARM_TIMEOUT)
+            # A fila pode ter mudado enquanto o ffmpeg abria
+            if primed and self.queue.peek() is track and engine.set_next(entry):
+                entry = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[prewarm {self.guild.id}] Falha ao aquecer {track.query}: {type(e).__name__}: {e}")
+        finally:
+            if entry is not None:
+                cleanup_later(entry)
+
+    def cancel_prewarm(self):
+        if self.prewarm_task is not None and not self.prewarm_task.done():
+            self.prewarm_task.cancel()
+        self.prewarm_task = None
+        if self.engine is not None:
+            self.engine.drop_next()
+
+    def _after(self, engine, error):
+        # Chamado pela thread de áudio do discord.py, antes do cleanup do motor
+        if error:
+            print(f"Erro na reprodução: {error}")
+        self.bot.loop.call_soon_threadsafe(self._stopped, engine.snapshot())
+
+    def _stopped(self, position):
+        self.stopped_at = position
+        self._track_done.set()
+
+    def _switched(self, entry):
+        # Chamado pela thread de áudio quando o motor assume a faixa aquecida
+        self.bot.loop.call_soon_threadsafe(self._take_switch, entry.track)
+
+    def _take_switch(self, track):
+        self.switched = track
+        self._track_done.set()
+
+    def cached_source(self, info, seek=0):
+        path = self.cog.audio_cache.lookup(info.get('id'))
+        if path is None:
+            return None
+        try:
+            return CachedOpusAudio(path, seek)
+        except (OSError, ValueError) as e:
+            # Arquivo removido entre a consulta e a abertura: volta para o stream
+            print(f"[GuildPlayer {self.guild.id}] Falha ao abrir {path}: {e}")
+            return None
+
+    async def build_source(self, track, info, seek=0):
+        # Do cache em disco se a faixa já foi baixada; senão, ffmpeg sobre o stream, vigiado
+        source = self.cached_source(info, seek)
+        if source is None:
+            if not info.get('url'):
+                # Veio do cache em disco, mas o arquivo saiu antes de abrir: extrai agora
+                info = await self.ensure_resolved(track)
+            info = await probe(self.cog.ffmpeg_path, info)
+            source = StreamMonitor(
+                create_source(self.cog.ffmpeg_path, info, seek),
+                lambda position: self._reopen(track, position),
+                self.bot.loop,
+                duration=info.get('duration'),
+                start=seek,
+            )
+        return source, info
+
+    async def _reopen(self, track, seek):
+        # Stream travado ou encerrado antes da hora: URL nova e ffmpeg a partir de onde parou
+        info = await self.cog.extractor.refresh(track.info)
+        track.set_info(info)
+        info = await probe(self.cog.ffmpeg_path, info)
+        return create_source(self.cog.ffmpeg_path, info, seek)
+
+    def announce(self, info):
+        # Uma mensagem de "tocando agora" por canal, editada enquanto nada for postado depois dela
+        if self.channel is not None:
+            self.bot.outbox.now_playing(self.channel, f"🎵 Tocando: **{info['title']}**\n🔗 {info['webpage_url']}")
+
+    async def play_yt(self, track, seek=0):
+        print(f"[play_yt {self.guild.id}] Buscando: {track.query}")
+
+        try:
+            info = self.cached_info(track) or await self.ensure_resolved(track)
+
+            # Verifica se o bot ainda está conectado
+            voice_client = self.voice_client
+            if not voice_client or not voice_client.is_connected():
+                self.send("❌ O bot foi desconectado do canal de voz.")
+                self.clear()
+                return False
+
+            self.voice_channel_id = voice_client.channel.id
+
+            # Cria a fonte de áudio e abre uma nova sessão do motor
+            source, info = await self.build_source(track, info, seek)
+            engine = self.engine = PlaybackEngine(
+                EngineTrack(source, track, info.get('duration'), start=seek), self._switched
+            )
+
+            # Reproduz a música
+            voice_client.play(engine, after=lambda error: self._after(engine, error))
+            VOICE_STREAMS.inc()
+            if seek:
+                minutes, seconds = divmod(int(seek), 60)
+                self.send(f"🔄 Conexão de voz restabelecida, continuando **{info['title']}** de {minutes}:{seconds:02d}")
+                return True
+            self.cog.audio_cache.record_play(info, self.cog.ffmpeg_path)
+
+            self.announce(info)
+            return True
+
+        except asyncio.CancelledError:
+            if self.task is not None and self.task.cancelling():
+                raise
+            print(f"[play_yt {self.guild.id}] Resolução cancelada: {track.query}")
+        except (extractor.NoResults, extractor.ExtractorBusy) as e:
+            self.send(str(e))
+        except asyncio.TimeoutError:
+            print(f"[play_yt {self.guild.id}] Timeout ao resolver: {track.query}")
+            self.send("⌛ A busca demorou demais, indo para a próxima.")
+        except extractor.DownloadError as e:
+            print(f"[ERRO Download] {e}")
+            self.send("❌ Erro ao baixar o vídeo. O vídeo pode estar indisponível ou restrito.")
+        except discord.ClientException as e:
+            print(f"[ERRO Discord] {e}")
+            self.send("❌ Erro na conexão de voz. Verifique se o bot está conectado corretamente.")
+            self.clear()
+        except Exception as e:
+            print(f"[ERRO play_yt] {type(e).__name__}: {e}")
+            self.send("❌ Erro inesperado ao reproduzir a música.")
+        return False
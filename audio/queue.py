@@ -0,0 +1,79 @@
+import random
+from collections import deque
+from itertools import islice
+
+
+class TrackQueue:
+    # Fila de faixas sobre um deque: entrar no fim e sair do começo são O(1), mesmo com
+    # playlists de milhares de faixas. Posições usadas pelos comandos começam em 0
+    __slots__ = ('tracks',)
+
+    def __init__(self, tracks=()):
+        self.tracks = deque(tracks)
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __bool__(self):
+        return bool(self.tracks)
+
+    def __iter__(self):
+        return iter(self.tracks)
+
+    def __getitem__(self, index):
+        return self.tracks[index]
+
+    def append(self, track):
+        self.tracks.append(track)
+
+    def extend(self, tracks):
+        self.tracks.extend(tracks)
+
+    def popleft(self):
+        return self.tracks.popleft()
+
+    def peek(self):
+        return self.tracks[0] if self.tracks else None
+
+    def head(self, count):
+        return list(islice(self.tracks, count))
+
+    def page(self, start, count):
+        # Só percorre até o fim da página pedida
+        return list(islice(self.tracks, start, start + count))
+
+    def clear(self):
+        self.tracks.clear()
+
+    def shuffle(self, rng=random):
+        tracks = list(self.tracks)
+        rng.shuffle(tracks)
+        self.tracks = deque(tracks)
+
+    def remove(self, index):
+        if not 0 <= index < len(self.tracks):
+            raise IndexError(index)
+        self.tracks.rotate(-index)
+        track = self.tracks.popleft()
+        self.tracks.rotate(index)
+        return track
+
+    def move(self, source, destination):
+        track = self.remove(source)
+        destination = min(max(destination, 0), len(self.tracks))
+        self.tracks.insert(destination, track)
+        return track
+
+    def dedupe(self):
+        # Mantém a primeira ocorrência de cada faixa; devolve as removidas
+        seen = set()
+        kept, removed = deque(), []
+        for track in self.tracks:
+            key = track.key
+            if key in seen:
+                removed.append(track)
+            else:
+                seen.add(key)
+                kept.append(track)
+        self.tracks = kept
+        return removed
@@ -0,0 +1,143 @@
+import mmap
+import os
+import shlex
+
+import discord
+from discord.oggparse import OggStream
+
+from utils import metrics
+
+# Volume de todas as faixas. O modo cópia não tem como aplicá-lo: com valor diferente de 1 tudo
+# é transcodificado, para stream, cópia e cache em disco soarem iguais
+VOLUME = float(os.getenv('MUSIC_VOLUME', 1.0))
+OPUS_BITRATE = int(os.getenv('MUSIC_OPUS_BITRATE', 128))
+
+RECONNECT_OPTIONS = '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5'
+# Codec já conhecido pelo yt-dlp: o ffmpeg só precisa ler o cabeçalho do contêiner
+KNOWN_CODEC_PROBE = '-probesize 32k -analyzeduration 0'
+# Codec desconhecido (entrada antiga do cache, extrator genérico): sonda um pouco mais
+UNKNOWN_CODEC_PROBE = '-probesize 1M -analyzeduration 2M'
+
+OPUS_CONTAINERS = ('webm', 'ogg', 'opus')
+# Duração de cada pacote Opus enviado ao Discord
+FRAME_SECONDS = discord.opus.Encoder.FRAME_LENGTH / 1000
+
+AUDIO_SOURCES = metrics.counter(
+    'potinho_audio_sources_total', 'Fontes de áudio criadas por modo (cópia, transcodificação ou cache em disco)',
+    ['mode']
+)
+
+
+def is_passthrough(info):
+    # Opus dentro de WebM/Ogg vai direto para o Discord, sem decodificar nem recodificar
+    if VOLUME != 1:
+        return False
+    acodec = (info.get('acodec') or '').lower()
+    return acodec.startswith('opus') and info.get('ext') in OPUS_CONTAINERS
+
+
+async def probe(ffmpeg_path, info):
+    # Entradas sem codec (cache antigo, extratores que não informam): pergunta ao próprio ffmpeg
+    if info.get('acodec'):
+        return info
+    try:
+        codec, _ = await discord.FFmpegOpusAudio.probe(info['url'], method='fallback', executable=ffmpeg_path)
+    except Exception as e:
+        print(f"[Áudio] Falha ao sondar o codec: {type(e).__name__}: {e}")
+        return info
+    if codec == 'opus' and info.get('ext') is None:
+        # O probe só informa o codec; Opus que o ffmpeg leu veio de WebM/Ogg
+        return dict(info, acodec=codec, ext='webm')
+    return dict(info, acodec=codec)
+
+
+def before_options(info, seek=0):
+    options = [KNOWN_CODEC_PROBE if info.get('acodec') else UNKNOWN_CODEC_PROBE]
+    if info['url'].startswith(('http://', 'https://')):
+        # Opções do protocolo HTTP: em arquivo local o ffmpeg recusa a entrada
+        options.insert(0, RECONNECT_OPTIONS)
+    if seek:
+        options.append(f"-ss {seek:.3f}")
+    return ' '.join(options)
+
+
+def create_source(ffmpeg_path, info, seek=0):
+    # Sempre FFmpegOpusAudio: o ffmpeg entrega pacotes Opus prontos e o processo do bot não
+    # codifica nada. Só há transcodificação quando a origem não é Opus
+    passthrough = is_passthrough(info)
+    AUDIO_SOURCES.labels('copy' if passthrough else 'transcode').inc()
+    if passthrough:
+        return discord.FFmpegOpusAudio(
+            info['url'],
+            codec='copy',
+            executable=ffmpeg_path,
+            before_options=before_options(info, seek),
+            options='-vn',
+        )
+    # Sem codec: o discord.py codifica com libopus. O codec da origem não serve ("opus" e até
+    # "libopus" viram "-c:a copy"), e Opus fora de Ogg/WebM com o filtro de volume faz o ffmpeg recusar
+    return discord.FFmpegOpusAudio(
+        info['url'],
+        bitrate=OPUS_BITRATE,
+        executable=ffmpeg_path,
+        before_options=before_options(info, seek),
+        options=f'-vn -filter:a "volume={VOLUME}"',
+    )
+
+
+def cache_command(ffmpeg_path, info, output):
+    # Baixa a faixa inteira para um Ogg/Opus local. Já sai com o volume aplicado quando precisa
+    # transcodificar, então tocar do cache soa igual a tocar do stream
+    args = [ffmpeg_path, '-nostdin', '-loglevel', 'error', *shlex.split(before_options(info)), '-i', info['url']]
+    args += ['-vn', '-map_metadata', '-1']
+    if is_passthrough(info):
+        args += ['-c:a', 'copy']
+    else:
+        args += ['-c:a', 'libopus', '-b:a', f'{OPUS_BITRATE}k', '-filter:a', f'volume={VOLUME}']
+    return args + ['-f', 'opus', '-y', output]
+
+
+def ogg_duration(path):
+    # Duração de um Ogg/Opus pela posição (granule, em amostras de 48 kHz) da última página:
+    # lê só o fim do arquivo
+    try:
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(size - 65536, 0))
+            tail = f.read()
+    except OSError:
+        return None
+    index = tail.rfind(b'OggS')
+    if index < 0 or len(tail) < index + 14:
+        return None
+    granule = int.from_bytes(tail[index + 6:index + 14], 'little', signed=True)
+    return granule / 48000 if granule > 0 else None
+
+
+class CachedOpusAudio(discord.AudioSource):
+    # Faixa do cache em disco: os pacotes Opus saem direto do arquivo mapeado em memória,
+    # sem processo do ffmpeg e sem depender da URL do YouTube continuar válida
+    def __init__(self, path, seek=0):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        self._packets = OggStream(self._map).iter_packets()
+        for _ in range(int(seek / FRAME_SECONDS)):
+            if next(self._packets, None) is None:
+                break
+        AUDIO_SOURCES.labels('cache').inc()
+
+    def read(self):
+        return next(self._packets, b'')
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        self._packets = iter(())
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+from utils.cache import LRUCache
+from utils.storage import data_path
+
+# Quantas páginas são buscadas ao mesmo tempo
+SPOTIFY_CONCURRENCY = int(os.getenv('SPOTIFY_CONCURRENCY', 4))
+RATE_LIMIT_RETRIES = 5
+PLAYLIST_PAGE_SIZE = 100
+ALBUM_PAGE_SIZE = 50
+
+SPOTIFY_CACHE_FILE = 'spotify_cache.json'
+SPOTIFY_TRACK_CACHE_SIZE = int(os.getenv('SPOTIFY_TRACK_CACHE_SIZE', 20000))
+SPOTIFY_ALBUM_CACHE_SIZE = int(os.getenv('SPOTIFY_ALBUM_CACHE_SIZE', 1000))
+SPOTIFY_PLAYLIST_CACHE_SIZE = int(os.getenv('SPOTIFY_PLAYLIST_CACHE_SIZE', 100))
+
+
+def compact_track(track):
+    # Só o que a fila e o resolvedor usam; é isso que vai para o cache em disco
+    return {
+        'id': track.get('id'),
+        'name': track['name'],
+        'artists': [artist['name'] for artist in track.get('artists', [])],
+        'duration_ms': track.get('duration_ms'),
+        'isrc': (track.get('external_ids') or {}).get('isrc'),
+    }
+
+
+def track_query(track):
+    if not track['artists']:
+        return track['name']
+    return f"{track['name']} {track['artists'][0]}"
+
+
+class SpotifyCache:
+    # Metadados do Spotify em LRUs na memória, salvos em JSON no DATA_DIR.
+    # Playlists valem enquanto o snapshot_id não muda; faixas e álbuns valem pelo id
+    def __init__(self, path=None, load=True):
+        self.path = path or data_path(SPOTIFY_CACHE_FILE)
+        self.tracks = LRUCache(SPOTIFY_TRACK_CACHE_SIZE)
+        self.albums = LRUCache(SPOTIFY_ALBUM_CACHE_SIZE)
+        self.playlists = LRUCache(SPOTIFY_PLAYLIST_CACHE_SIZE)
+        self.dirty = False
+        if load:
+            self.load()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ [Spotify] Cache em disco ignorado: {e}")
+            return None
+
+    def load(self):
+        self._fill(self._read())
+
+    async def load_async(self):
+        # Leitura e parse do JSON fora do loop; só o preenchimento das LRUs roda nele
+        self._fill(await asyncio.to_thread(self._read))
+
+    def _fill(self, data):
+        if data is None:
+            return
+        for name in ('tracks', 'albums', 'playlists'):
+            cache = getattr(self, name)
+            for key, value in data.get(name, []):
+                cache.put(key, value)
+        print(f"[Spotify] Cache carregado: {len(self.tracks)} faixas, {len(self.albums)} álbuns, {len(self.playlists)} playlists")
+
+    def _snapshot(self):
+        # Cópia rasa na thread do loop; os valores nunca são alterados depois de entrar no cache
+        return {name: list(getattr(self, name).items.items()) for name in ('tracks', 'albums', 'playlists')}
+
+    def _write(self, snapshot):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def save(self):
+        if self.dirty:
+            self.dirty = False
+            self._write(self._snapshot())
+
+    async def save_async(self):
+        if self.dirty:
+            self.dirty = False
+            await asyncio.to_thread(self._write, self._snapshot())
+
+    def put_track(self, track):
+        self.tracks.put(track['id'], track)
+        self.dirty = True
+
+    def get_album(self, album_id):
+        return self.albums.get(album_id)
+
+    def put_album(self, album_id, tracks):
+        self.albums.put(album_id, tracks)
+        self.dirty = True
+
+    def get_playlist(self, playlist_id, snapshot_id):
+        cached = self.playlists.get(playlist_id)
+        if cached is None or cached['snapshot_id'] != snapshot_id:
+            return None
+        return cached['tracks']
+
+    def put_playlist(self, playlist_id, snapshot_id, tracks):
+        self.playlists.put(playlist_id, {'snapshot_id': snapshot_id, 'tracks': tracks})
+        self.dirty = True
+
+    def stats(self):
+        return {
+            'tracks': self.tracks.stats(),
+            'albums': self.albums.stats(),
+            'playlists': self.playlists.stats(),
+        }
+
+
+SPOTIFY_SECONDS = metrics.histogram('potinho_spotify_seconds', 'Tempo das chamadas à API do Spotify', ['method'])
+SPOTIFY_RATE_LIMITED = metrics.counter('potinho_spotify_rate_limited_total', 'Respostas 429 da API do Spotify')
+
+
+class SpotifyAPI:
+    # Cliente spotipy rodando fora do loop, com limite de concorrência e respeito ao Retry-After
+    def __init__(self, auth_manager, cache=None, concurrency=SPOTIFY_CONCURRENCY):
+        # O spotipy só é importado quando o primeiro link do Spotify aparece
+        import spotipy
+
+        # 429 fica fora do status_forcelist: o urllib3 dormiria dentro da thread,
+        # aqui a espera é feita no loop e vale para todos os pedidos em andamento
+        self.client = spotipy.Spotify(
+            auth_manager=auth_manager,
+            requests_timeout=10,
+            status_forcelist=(500, 502, 503, 504),
+        )
+        self.cache = cache if cache is not None else SpotifyCache()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='spotify')
+        self._slots = asyncio.Semaphore(concurrency)
+        self._cooldown_until = 0.0
+        self.requests = 0
+        self.rate_limited = 0
+
+    async def call(self, method, *args, **kwargs):
+        from spotipy import SpotifyException
+
+        func = getattr(self.client, method)
+        for _ in range(RATE_LIMIT_RETRIES):
+            delay = self._cooldown_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            async with self._slots:
+                try:
+                    self.requests += 1
+                    loop = asyncio.get_running_loop()
+                    with SPOTIFY_SECONDS.labels(method).time():
+                        return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+                except SpotifyException as e:
+                    if e.http_status != 429:
+                        raise
+                    retry_after = float((e.headers or {}).get('Retry-After', 1))
+                    self.rate_limited += 1
+                    SPOTIFY_RATE_LIMITED.inc()
+                    self._cooldown_until = max(self._cooldown_until, time.monotonic() + retry_after)
+                    print(f"[Spotify] Rate limit, aguardando {retry_after:.0f}s")
+
+        raise SpotifyException(429, -1, "Limite de requisições do Spotify excedido")
+
+    async def pages(self, method, item_id, first_page, page_size, **kwargs):
+        # Os offsets saem do "total" da primeira página: as demais são pedidas em paralelo
+        # e entregues na ordem, cada uma assim que ela e as anteriores chegam
+        tasks = [
+            asyncio.create_task(self.call(method, item_id, limit=page_size, offset=offset, **kwargs))
+            for offset in range(page_size, first_page['total'], page_size)
+        ]
+        try:
+            yield first_page['items']
+            for task in tasks:
+                yield (await task)['items']
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def track(self, track_id):
+        track = self.cache.tracks.get(track_id)
+        if track is None:
+            track = compact_track(await self.call('track', track_id))
+            self.cache.put_track(track)
+        return track
+
+    async def playlist(self, playlist_id):
+        # Só os campos usados: a chamada fica barata mesmo em playlists enormes
+        return await self.call('playlist', playlist_id, fields='name,snapshot_id')
+
+    async def playlist_tracks(self, playlist_id, snapshot_id):
+        # Playlist sem mudanças desde a última vez: sai inteira do cache
+        cached = self.cache.get_playlist(playlist_id, snapshot_id)
+        if cached is not None:
+            yield cached
+            return
+
+        first_page = await self.call(
+            'playlist_items', playlist_id, limit=PLAYLIST_PAGE_SIZE, additional_types=['track']
+        )
+        tracks = []
+        async for items in self.pages('playlist_items', playlist_id, first_page, PLAYLIST_PAGE_SIZE, additional_types=['track']):
+            page = [
+                compact_track(item['track']) for item in items
+                if item.get('track') and item['track'].get('type') == 'track'
+            ]
+            tracks.extend(page)
+            yield page
+        self.cache.put_playlist(playlist_id, snapshot_id, tracks)
+
+    async def album_tracks(self, album_id):
+        cached = self.cache.get_album(album_id)
+        if cached is not None:
+            yield cached
+            return
+
+        first_page = await self.call('album_tracks', album_id, limit=ALBUM_PAGE_SIZE)
+        tracks = []
+        async for items in self.pages('album_tracks', album_id, first_page, ALBUM_PAGE_SIZE):
+            page = [compact_track(track) for track in items]
+            tracks.extend(page)
+            yield page
+        self.cache.put_album(album_id, tracks)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,77 @@
+import time
+
+from audio.extractor import video_id_from_url, watch_url
+from audio.spotify import track_query
+
+
+class Track:
+    # Entrada da fila: a busca original e, depois de resolvida, a URL do stream.
+    # Com __slots__: playlists grandes põem milhares destas na fila
+    __slots__ = ('query', 'spotify', 'requester', 'hint', 'info', 'expires_at', 'task')
+
+    def __init__(self, query, spotify=None, requester=None, hint=None):
+        self.query = query
+        # Metadados compactos do Spotify (id, nome, artistas, duração, ISRC), se vier de lá
+        self.spotify = spotify
+        # Id de quem pediu a faixa
+        self.requester = requester
+        # Título e duração da listagem plana de uma playlist do YouTube, antes de resolver
+        self.hint = hint
+        self.info = None
+        self.expires_at = 0.0
+        self.task = None
+
+    @classmethod
+    def from_spotify(cls, track, requester=None):
+        return cls(track_query(track), spotify=track, requester=requester)
+
+    @classmethod
+    def from_youtube(cls, entry, requester=None):
+        hint = (entry['title'], entry['duration']) if entry.get('title') else None
+        return cls(watch_url(entry['id']), requester=requester, hint=hint)
+
+    @property
+    def title(self):
+        if self.info:
+            return self.info['title']
+        if self.spotify:
+            return f"{self.spotify['name']} - {', '.join(self.spotify['artists'])}"
+        if self.hint:
+            return self.hint[0]
+        return self.query
+
+    @property
+    def duration(self):
+        if self.info and self.info.get('duration'):
+            return self.info['duration']
+        if self.spotify and self.spotify.get('duration_ms'):
+            return self.spotify['duration_ms'] / 1000
+        if self.hint:
+            return self.hint[1]
+        return None
+
+    @property
+    def video_id(self):
+        return self.info.get('id') if self.info else None
+
+    @property
+    def key(self):
+        # Identidade para remover repetidas: vídeo resolvido, faixa do Spotify ou a busca normalizada
+        video_id = self.video_id or video_id_from_url(self.query)
+        if video_id:
+            return ('youtube', video_id)
+        if self.spotify and self.spotify.get('id'):
+            return ('spotify', self.spotify['id'])
+        return ('query', ' '.join(self.query.lower().split()))
+
+    def is_fresh(self, margin=0):
+        return self.info is not None and self.expires_at - time.time() > margin
+
+    def set_info(self, info):
+        self.info = info
+        self.expires_at = info['expires_at']
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.task = None
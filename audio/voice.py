@@ -0,0 +1,161 @@
+import asyncio
+import os
+import time
+
+import discord
+
+from audio.player import IDLE_TIMEOUT
+from utils import metrics
+
+# Canal de voz sem ninguém (além de bots) por esse tempo: o bot sai mesmo tocando
+EMPTY_TIMEOUT = int(os.getenv('MUSIC_EMPTY_TIMEOUT', 60))
+# Tentativas de voltar ao canal quando a conexão de voz cai no meio de uma faixa
+RECONNECT_ATTEMPTS = int(os.getenv('MUSIC_VOICE_RECONNECT_ATTEMPTS', 5))
+RECONNECT_BACKOFF_MAX = 30
+CONNECT_TIMEOUT = 30
+# Recuperações seguidas dentro da janela: passando do limite o bot desiste (ex.: alguém
+# desconectando o bot de propósito, o que para o discord.py é igual a uma queda)
+RECOVERY_LIMIT = 3
+RECOVERY_WINDOW = 600
+SWEEP_INTERVAL = 15
+
+VOICE_EVENTS = metrics.counter(
+    'potinho_voice_lifecycle_total', 'Eventos do ciclo de vida das conexões de voz', ['event']
+)
+
+
+def has_listeners(channel):
+    return channel is not None and any(not member.bot for member in channel.members)
+
+
+class VoiceLifecycle:
+    # Dono das conexões de voz do cog de música: desconecta quem ficou ocioso ou sozinho no
+    # canal (libera socket UDP, encoder e ffmpeg) e reconecta quem caiu no meio de uma faixa
+    def __init__(self, cog):
+        self.cog = cog
+        self.bot = cog.bot
+        # guild_id -> (motivo, desde quando); o bot sai se o motivo durar mais que o limite
+        self.idle = {}
+        self.recovering = set()
+        self.recoveries = {}
+        self.task = None
+
+    def start(self):
+        self.task = self.bot.loop.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"[Voz] Falha na varredura: {type(e).__name__}: {e}")
+
+    def idle_reason(self, voice_client):
+        if not has_listeners(voice_client.channel):
+            return 'empty'
+        player = self.cog.players.get(voice_client.guild.id)
+        # Pausado conta como ocioso: ninguém volta de um p!pausar esquecido
+        if voice_client.is_paused() or not (voice_client.is_playing() or (player and player.is_active)):
+            return 'idle'
+        return None
+
+    async def sweep(self):
+        now = time.monotonic()
+        seen = set()
+        for voice_client in list(self.bot.voice_clients):
+            guild = voice_client.guild
+            # Desconectado ou no meio de um reconnect do próprio discord.py: não mexe
+            if guild.id in self.recovering or not voice_client.is_connected():
+                continue
+            seen.add(guild.id)
+            reason = self.idle_reason(voice_client)
+            if reason is None:
+                self.idle.pop(guild.id, None)
+                continue
+            previous = self.idle.get(guild.id)
+            if previous is None or previous[0] != reason:
+                self.idle[guild.id] = previous = (reason, now)
+            limit = EMPTY_TIMEOUT if reason == 'empty' else IDLE_TIMEOUT
+            if now - previous[1] >= limit:
+                await self.leave(guild, reason)
+        for guild_id in self.idle.keys() - seen:
+            del self.idle[guild_id]
+
+    async def leave(self, guild, reason):
+        self.idle.pop(guild.id, None)
+        VOICE_EVENTS.labels(reason).inc()
+        player = self.cog.players.pop(guild.id, None)
+        if player is not None:
+            if reason == 'empty':
+                player.send("👋 Todo mundo saiu do canal de voz, desconectei")
+            else:
+                player.send("💤 Saí do canal de voz por inatividade")
+            player.destroy()
+        voice_client = guild.voice_client
+        print(f"[Voz {guild.id}] Desconectando ({reason})")
+        if voice_client is not None:
+            await voice_client.disconnect(force=True)
+
+    def moved(self, guild, channel):
+        # O bot foi movido de canal (por alguém ou pelo p!entrar): reconexões voltam para o novo
+        player = self.cog.players.get(guild.id)
+        if player is not None:
+            player.voice_channel_id = channel.id
+
+    def _allow_recovery(self, guild_id):
+        now = time.monotonic()
+        recent = [t for t in self.recoveries.get(guild_id, ()) if now - t < RECOVERY_WINDOW]
+        if len(recent) >= RECOVERY_LIMIT:
+            self.recoveries[guild_id] = recent
+            return False
+        self.recoveries[guild_id] = recent + [now]
+        return True
+
+    async def reconnect(self, player):
+        # Chamado pelo player quando a sessão de voz morreu com uma faixa tocando. True se
+        # voltou ao canal; o player retoma a faixa de onde parou
+        guild = player.guild
+        channel = guild.get_channel(player.voice_channel_id) if player.voice_channel_id else None
+        VOICE_EVENTS.labels('lost').inc()
+        if not has_listeners(channel) or not self._allow_recovery(guild.id):
+            print(f"[Voz {guild.id}] Conexão perdida, sem recuperação")
+            return False
+
+        self.recovering.add(guild.id)
+        try:
+            for attempt in range(RECONNECT_ATTEMPTS):
+                # O discord.py precisa confirmar a saída antes de uma conexão nova no mesmo servidor
+                await asyncio.sleep(min(2 ** attempt, RECONNECT_BACKOFF_MAX))
+                if not has_listeners(channel):
+                    break
+                voice_client = guild.voice_client
+                if voice_client is not None and voice_client.is_connected():
+                    # O próprio discord.py reconectou nesse meio tempo
+                    VOICE_EVENTS.labels('recovered').inc()
+                    return True
+                try:
+                    if voice_client is not None:
+                        await voice_client.disconnect(force=True)
+                    await channel.connect(timeout=CONNECT_TIMEOUT)
+                    print(f"[Voz {guild.id}] Reconectado a {channel.name} (tentativa {attempt + 1})")
+                    VOICE_EVENTS.labels('recovered').inc()
+                    return True
+                except (asyncio.TimeoutError, discord.ClientException, OSError) as e:
+                    print(f"[Voz {guild.id}] Falha ao reconectar: {type(e).__name__}: {e}")
+        finally:
+            self.recovering.discard(guild.id)
+        VOICE_EVENTS.labels('recovery_failed').inc()
+        return False
+
+    def stats(self):
+        return {
+            'recovering': len(self.recovering),
+            'idle': sum(1 for reason, _ in self.idle.values() if reason == 'idle'),
+            'empty': sum(1 for reason, _ in self.idle.values() if reason == 'empty'),
+        }
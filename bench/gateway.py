@@ -0,0 +1,268 @@
+import asyncio
+import itertools
+import random
+import threading
+import time
+
+import discord
+
+BOT_ID = 1
+BASE_ID = 10 ** 17
+
+
+def _user(user_id, name, bot=False):
+    return {
+        'id': str(user_id),
+        'username': name,
+        'global_name': name,
+        'discriminator': '0',
+        'avatar': f"{user_id:032x}"[-32:],
+        'bot': bot,
+    }
+
+
+def _member(user=None):
+    member = {'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0}
+    if user is not None:
+        member['user'] = user
+    return member
+
+
+class FakeWebSocket:
+    # Sem intent de membros o conversor de Member cai na API REST quando o websocket está
+    # "limitado"; é o caminho que o bot usa em produção para membros fora do cache
+    latency = 0.05
+    open = False
+
+    def is_ratelimited(self):
+        return True
+
+
+class FakeVoiceClient(discord.VoiceProtocol):
+    # Faz o papel do VoiceClient sem UDP nem Opus: uma thread consome a fonte no ritmo do
+    # AudioPlayer (um pacote a cada 20 ms) e chama o after no fim, como o discord.py
+    def __init__(self, client, channel):
+        super().__init__(client, channel)
+        self.guild = channel.guild
+        self.thread = None
+        self.packets = 0
+        self._playing = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._connected = True
+
+    def is_connected(self):
+        return self._connected
+
+    def is_playing(self):
+        return self._playing.is_set() and self._resumed.is_set()
+
+    def is_paused(self):
+        return self._playing.is_set() and not self._resumed.is_set()
+
+    def play(self, source, *, after=None, **kwargs):
+        if self._playing.is_set():
+            raise discord.ClientException('Already playing audio.')
+        self._playing.set()
+        self._resumed.set()
+        self.thread = threading.Thread(target=self._run, args=(source, after), name='bench-voice', daemon=True)
+        self.thread.start()
+
+    def _run(self, source, after):
+        error = None
+        try:
+            next_at = time.perf_counter()
+            while self._playing.is_set() and self._connected:
+                if not self._resumed.wait(0.1):
+                    next_at = time.perf_counter()
+                    continue
+                if not source.read():
+                    break
+                self.packets += 1
+                next_at += 0.02
+                time.sleep(max(next_at - time.perf_counter(), 0))
+        except Exception as e:
+            error = e
+        self._playing.clear()
+        if after is not None:
+            after(error)
+        source.cleanup()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def stop(self):
+        self._playing.clear()
+        self._resumed.set()
+
+    async def move_to(self, channel, **kwargs):
+        self.channel = channel
+
+    async def disconnect(self, *, force=False):
+        self.stop()
+        self._connected = False
+        # O after do player agenda no event loop: espera a thread enquanto o loop ainda existe
+        if self.thread is not None:
+            await asyncio.to_thread(self.thread.join)
+        self.cleanup()
+
+
+async def _voice_connect(channel, *, timeout=60.0, reconnect=True, cls=None, self_deaf=False, self_mute=False):
+    # VoiceChannel.connect sem handshake: registra o cliente falso no estado como o discord.py faz
+    state = channel._state
+    if state._get_voice_client(channel.guild.id):
+        raise discord.ClientException('Already connected to a voice channel.')
+    voice_client = FakeVoiceClient(state._get_client(), channel)
+    state._add_voice_client(channel.guild.id, voice_client)
+    return voice_client
+
+
+class FakeGuild:
+    __slots__ = ('id', 'channel_id', 'voice_channel_id', 'role_id', 'member_ids')
+
+    def __init__(self, guild_id, channel_id, voice_channel_id, role_id, member_ids):
+        self.id = guild_id
+        self.channel_id = channel_id
+        self.voice_channel_id = voice_channel_id
+        self.role_id = role_id
+        self.member_ids = member_ids
+
+
+class FakeGateway:
+    # Faz o papel do websocket e da API REST: alimenta o ConnectionState com payloads
+    # READY/GUILD_CREATE/MESSAGE_CREATE e responde aos envios com latência simulada
+    def __init__(self, bot, guilds=10, members=20, rest_latency=None, seed=0):
+        self.bot = bot
+        self.state = bot._connection
+        self.rest_latency = rest_latency
+        self.rng = random.Random(seed)
+        self.ids = itertools.count(BASE_ID)
+        self.guilds = []
+        self.sent = 0
+        self._build(guilds, members)
+
+    def _build(self, guilds, members):
+        for _ in range(guilds):
+            guild_id, channel_id, voice_channel_id, role_id = (next(self.ids) for _ in range(4))
+            member_ids = [next(self.ids) for _ in range(members)]
+            self.guilds.append(FakeGuild(guild_id, channel_id, voice_channel_id, role_id, member_ids))
+
+    def _guild_payload(self, guild):
+        members = [_member(_user(BOT_ID, 'Potinho', bot=True))]
+        for i, member_id in enumerate(guild.member_ids):
+            member = _member(_user(member_id, f"membro{i}"))
+            if i % 2 == 0:
+                member['roles'] = [str(guild.role_id)]
+            members.append(member)
+        role = {
+            'id': str(guild.id), 'name': '@everyone', 'permissions': '104324673', 'position': 0,
+            'color': 0, 'hoist': False, 'managed': False, 'mentionable': False,
+        }
+        return {
+            'id': str(guild.id),
+            'name': f"Servidor {guild.id}",
+            'owner_id': str(guild.member_ids[0]),
+            'roles': [role, dict(role, id=str(guild.role_id), name='bench', position=1)],
+            'channels': [{
+                'id': str(guild.channel_id), 'type': 0, 'name': 'geral', 'position': 0,
+                'permission_overwrites': [], 'guild_id': str(guild.id),
+            }, {
+                'id': str(guild.voice_channel_id), 'type': 2, 'name': 'voz', 'position': 1,
+                'permission_overwrites': [], 'guild_id': str(guild.id), 'bitrate': 64000, 'user_limit': 0,
+            }],
+            'members': members,
+            'member_count': len(members),
+            # Todo mundo no canal de voz: qualquer autor pode usar os comandos de música
+            'voice_states': [self._voice_state(guild, member_id) for member_id in guild.member_ids],
+            'presences': [],
+            'emojis': [],
+            'stickers': [],
+            'features': [],
+            'unavailable': False,
+        }
+
+    @staticmethod
+    def _voice_state(guild, member_id):
+        return {
+            'user_id': str(member_id), 'channel_id': str(guild.voice_channel_id), 'guild_id': str(guild.id),
+            'session_id': 'bench', 'deaf': False, 'mute': False, 'self_deaf': False, 'self_mute': False,
+            'self_video': False, 'suppress': False, 'request_to_speak_timestamp': None,
+        }
+
+    def _patch_rest(self):
+        async def request(route, **kwargs):
+            if self.rest_latency is not None:
+                await asyncio.sleep(self.rest_latency.sample())
+            self.sent += 1
+            if route.method == 'GET' and route.path.endswith('/members/{member_id}'):
+                user_id = int(route.url.rsplit('/', 1)[-1])
+                return _member(_user(user_id, f"user{user_id}"))
+            if route.method == 'POST' and route.path.endswith('/messages'):
+                payload = kwargs.get('json') or {}
+                channel_id = int(route.channel_id)
+                return self._message_payload(
+                    BOT_ID, channel_id, self._guild_for_channel(channel_id), payload.get('content') or '',
+                    author=_user(BOT_ID, 'Potinho', bot=True), embeds=payload.get('embeds') or []
+                )
+            return {}
+
+        self.bot.http.request = request
+
+    def _guild_for_channel(self, channel_id):
+        for guild in self.guilds:
+            if guild.channel_id == channel_id:
+                return guild.id
+        return None
+
+    def _message_payload(self, author_id, channel_id, guild_id, content, author=None, embeds=()):
+        return {
+            'id': str(next(self.ids)),
+            'channel_id': str(channel_id),
+            'guild_id': str(guild_id),
+            'author': author or _user(author_id, f"user{author_id}"),
+            'content': content,
+            'timestamp': discord.utils.utcnow().isoformat(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': list(embeds),
+            'pinned': False,
+            'type': 0,
+            'flags': 0,
+        }
+
+    async def connect(self):
+        # READY + um GUILD_CREATE por servidor; devolve o tempo até o on_ready
+        started = time.perf_counter()
+        self._patch_rest()
+        discord.VoiceChannel.connect = _voice_connect
+        self.bot.ws = FakeWebSocket()
+        self.state.guild_ready_timeout = 0.01
+        self.state.parse_ready({
+            'v': 10,
+            'user': _user(BOT_ID, 'Potinho', bot=True),
+            'guilds': [{'id': str(guild.id), 'unavailable': True} for guild in self.guilds],
+            'session_id': 'bench',
+            'resume_gateway_url': 'wss://bench.invalid',
+            'application': {'id': str(BOT_ID), 'flags': 0},
+        })
+        for guild in self.guilds:
+            self.state.parse_guild_create(self._guild_payload(guild))
+        await self.bot.wait_until_ready()
+        return time.perf_counter() - started
+
+    def random_guild(self):
+        return self.rng.choice(self.guilds)
+
+    def send(self, guild, author_id, content):
+        # MESSAGE_CREATE de um membro do servidor; devolve o id da mensagem
+        payload = self._message_payload(author_id, guild.channel_id, guild.id, content)
+        payload['member'] = _member()
+        self.state.parse_message_create(payload)
+        return int(payload['id'])
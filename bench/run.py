@@ -0,0 +1,401 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Tudo local: dados em diretório temporário, sem endpoint de métricas e sem Spotify real
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='potinho-bench-')
+os.environ['METRICS_PORT'] = '0'
+# Sem ffmpeg de verdade não há o que baixar para o cache em disco
+os.environ['MUSIC_AUDIO_CACHE_MB'] = '0'
+os.environ.pop('SPOTIFY_CLIENT_ID', None)
+os.environ.pop('SPOTIFY_CLIENT_SECRET', None)
+
+from bench.gateway import FakeGateway
+from bench.stubs import (
+    Latency, StubSession, StubSpotifyClient, install_audio_stub, install_extractor_stub,
+    install_translator_stub,
+)
+
+# (peso, modelo) — {member}/{other} são menções a membros do servidor, {role} ao cargo de teste
+WORKLOAD = [
+    (10, 'p!ping'),
+    (8, 'p!roll 100'),
+    (10, 'p!abraçar <@{member}>'),
+    (6, 'p!beijar <@{member}>'),
+    (6, 'p!tapa <@{member}>'),
+    (6, 'p!ship <@{member}> <@{other}>'),
+    (8, 'p!calc (12+7)/3*{n}'),
+    (2, 'p!calc 3^{big}'),
+    (8, 'p!traduzir en olá mundo {n}'),
+    (5, 'p!userinfo <@{member}>'),
+    (5, 'p!avatar'),
+    (4, 'p!serverinfo'),
+    (4, 'p!par <@&{role}>'),
+    (3, 'p!lembrete 1h benchmark {n}'),
+    (2, 'p!ajuda'),
+    (5, 'p!tocar música {track}'),
+    (3, 'p!fila'),
+    (2, 'p!pular'),
+]
+
+# Métricas comparadas com a baseline: (caminho no relatório, True se maior é melhor)
+COMPARED = [
+    (('throughput',), True),
+    (('startup', 'time_to_ready_s'), False),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p99'), False),
+    (('loop_lag_ms', 'p99'), False),
+    (('backends', 'resolve', 'p50'), False),
+    (('backends', 'resolve', 'p99'), False),
+    (('backends', 'spotify_playlist', 'p99'), False),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do Bot Potinho (gateway e backends simulados)")
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--members', type=int, default=30, help="membros por servidor")
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=500, help="mensagens por segundo (0 = todas de uma vez)")
+    parser.add_argument('--resolves', type=int, default=200, help="buscas de música resolvidas")
+    parser.add_argument(
+        '--max-rejected', type=float, default=0.01,
+        help="fração das buscas recusadas pelo extrator (ExtractorBusy) acima da qual a execução falha"
+    )
+    parser.add_argument('--playlists', type=int, default=10, help="playlists do Spotify carregadas")
+    parser.add_argument('--rest-latency', type=float, default=0.02, help="latência da API do Discord (s)")
+    parser.add_argument('--ytdl-latency', type=float, default=0.3)
+    parser.add_argument('--spotify-latency', type=float, default=0.1)
+    parser.add_argument('--gif-latency', type=float, default=0.15)
+    parser.add_argument('--translate-latency', type=float, default=0.2)
+    parser.add_argument('--failure-rate', type=float, default=0.02, help="taxa de falha de todos os backends")
+    parser.add_argument('--timeout', type=float, default=120, help="tempo máximo esperando os comandos terminarem")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="grava o relatório em JSON")
+    parser.add_argument('--baseline', help="compara com um relatório anterior e falha se houver regressão")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="piora relativa aceita na comparação")
+    parser.add_argument('--min-delta-ms', type=float, default=5, help="diferença absoluta ignorada em métricas de tempo")
+    return parser.parse_args(argv)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(values, scale=1000):
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 0.5) * scale, 3),
+        'p99': round(percentile(values, 0.99) * scale, 3),
+        'max': round(max(values, default=0.0) * scale, 3),
+    }
+
+
+class LagSampler:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        self.task.cancel()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - started - self.interval, 0.0))
+
+
+def render_message(template, guild, rng, n):
+    member, other = rng.sample(guild.member_ids, 2)
+    return template.format(
+        member=member, other=other, role=guild.role_id, n=n, big=rng.randrange(5000, 20000),
+        track=rng.randrange(200),
+    )
+
+
+async def drive_commands(bot, gateway, args, rng):
+    pending = {}
+    latencies = {}
+    errors = {}
+    done = asyncio.Event()
+
+    def finish(ctx, error=None):
+        started = pending.pop(ctx.message.id, None)
+        if started is None:
+            return
+        latencies.setdefault(ctx.command.qualified_name if ctx.command else '?', []).append(time.perf_counter() - started)
+        if error is not None:
+            error = getattr(error, 'original', error)
+            errors[type(error).__name__] = errors.get(type(error).__name__, 0) + 1
+        if not pending and sent == args.messages:
+            done.set()
+
+    async def on_command_completion(ctx):
+        finish(ctx)
+
+    async def on_command_error(ctx, error):
+        finish(ctx, error)
+
+    bot.add_listener(on_command_completion)
+    bot.add_listener(on_command_error)
+
+    weights, templates = zip(*WORKLOAD)
+    sent = 0
+    started = time.perf_counter()
+    for sent in range(1, args.messages + 1):
+        if args.rate:
+            delay = started + sent / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        guild = gateway.random_guild()
+        content = render_message(rng.choices(templates, weights)[0], guild, rng, sent)
+        # O id só é conhecido depois de montar o payload: registra antes de o comando rodar
+        message_id = gateway.send(guild, rng.choice(guild.member_ids), content)
+        pending[message_id] = time.perf_counter()
+        if not args.rate and sent % 100 == 0:
+            await asyncio.sleep(0)
+
+    if pending:
+        try:
+            await asyncio.wait_for(done.wait(), args.timeout)
+        except asyncio.TimeoutError:
+            print(f"[bench] {len(pending)} comando(s) não terminaram em {args.timeout:.0f}s")
+    elapsed = time.perf_counter() - started
+
+    bot.remove_listener(on_command_completion)
+    bot.remove_listener(on_command_error)
+    completed = sum(len(values) for values in latencies.values())
+    return {
+        'messages': args.messages,
+        'completed': completed,
+        'errors': sum(errors.values()),
+        'error_types': errors,
+        'lost': len(pending),
+        'duration_s': round(elapsed, 3),
+        'throughput': round(completed / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': summarize([v for values in latencies.values() for v in values]),
+        'commands': {name: summarize(values) for name, values in sorted(latencies.items())},
+    }
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    try:
+        await coro
+        return time.perf_counter() - started, None
+    except Exception as e:
+        return time.perf_counter() - started, e
+
+
+def summarize_backend(results, rejected=()):
+    # Recusas da admissão (rejected) voltam na hora: fora da latência, contadas à parte
+    errors = {}
+    timings = []
+    refused = 0
+    for elapsed, error in results:
+        if error is not None and isinstance(error, rejected):
+            refused += 1
+            continue
+        timings.append(elapsed)
+        if error is not None:
+            errors[type(error).__name__] = errors.get(type(error).__name__, 0) + 1
+    return dict(summarize(timings), errors=sum(errors.values()), error_types=errors, rejected=refused)
+
+
+async def drive_resolves(music, args, rng):
+    from audio.extractor import ExtractorBusy
+
+    extractor = music.extractor
+    # Resoluções dos p!tocar ainda na fila do extrator: a rajada começa com ele livre
+    deadline = time.perf_counter() + args.timeout
+    while extractor.pending and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    # Rajada do tamanho da fila de admissão: os workers ficam livres para as buscas em segundo
+    # plano dos players, então nada é recusado e a latência medida é a da extração
+    semaphore = asyncio.Semaphore(extractor.max_pending - extractor.workers)
+
+    async def resolve(query):
+        async with semaphore:
+            return await timed(extractor.resolve(query))
+
+    # Um quarto repetido de propósito sai do cache. Nomes diferentes dos do p!tocar e proporção
+    # fixa: com metade de acertos o p50 cairia ora num acerto, ora numa extração
+    unique = [f"busca {i}" for i in range(args.resolves - args.resolves // 4)]
+    queries = unique + rng.sample(unique, min(args.resolves // 4, len(unique)))
+    rng.shuffle(queries)
+    results = await asyncio.gather(*(resolve(q) for q in queries))
+    return summarize_backend(results, rejected=ExtractorBusy)
+
+
+async def drive_playlists(music, args):
+    from audio.spotify import SpotifyAPI
+
+    async def load(playlist_id):
+        info = await music.spotify.playlist(playlist_id)
+        async for _ in music.spotify.playlist_tracks(playlist_id, info['snapshot_id']):
+            pass
+
+    latency = Latency(args.spotify_latency, failure_rate=args.failure_rate, seed=args.seed)
+    music.spotify = SpotifyAPI(None, cache=music.spotify_cache)
+    music.spotify.client = StubSpotifyClient(latency)
+    # Metade das playlists repetidas: a segunda carga vem do cache por snapshot_id
+    ids = [f"pl{i % max(args.playlists // 2, 1)}" for i in range(args.playlists)]
+    results = []
+    for playlist_id in ids:
+        results.append(await timed(load(playlist_id)))
+    return summarize_backend(results)
+
+
+async def run(args):
+    # O import do bot.py entra no tempo até ficar pronto, como em um deploy
+    started = time.perf_counter()
+    import bot as entrypoint
+    from utils.gifs import GifPool
+    from utils.http import HttpClient
+    from utils.outbox import Outbox
+    imported = time.perf_counter() - started
+
+    bot = entrypoint.bot
+    rng = random.Random(args.seed)
+    report = {'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}}
+
+    # Mesmo preparo do main() do bot.py, com a sessão HTTP e o gateway trocados por simulações
+    http_client = HttpClient()
+    http_client.session = StubSession(Latency(args.gif_latency, failure_rate=args.failure_rate, seed=args.seed))
+    async with bot, GifPool(http_client) as gifs, Outbox() as outbox:
+        bot.http_client = http_client
+        bot.gifs = gifs
+        bot.outbox = outbox
+        bot.started_at = time.time()
+
+        loading = time.perf_counter()
+        await entrypoint.load_extensions()
+        extensions = time.perf_counter() - loading
+        # Depois do carregamento: os imports pesados que os cogs adiam não entram na conta à toa
+        install_extractor_stub(Latency(args.ytdl_latency, failure_rate=args.failure_rate, seed=args.seed))
+        install_translator_stub(Latency(args.translate_latency, failure_rate=args.failure_rate, seed=args.seed))
+        install_audio_stub()
+        music = bot.get_cog('Music')
+        music.ffmpeg_path = 'ffmpeg'
+        gateway = FakeGateway(
+            bot, guilds=args.guilds, members=args.members,
+            rest_latency=Latency(args.rest_latency, seed=args.seed), seed=args.seed
+        )
+        ready = await gateway.connect()
+        report['startup'] = {
+            'import_s': round(imported, 3),
+            'extensions_s': round(extensions, 3),
+            'ready_s': round(ready, 3),
+            'time_to_ready_s': round(time.perf_counter() - started, 3),
+            'per_extension_ms': {
+                name: {'import': round(t['import'] * 1000, 1), 'setup': round(t['setup'] * 1000, 1)}
+                for name, t in bot.startup_report.items()
+            },
+        }
+
+        lag = LagSampler()
+        lag.start()
+        report.update(await drive_commands(bot, gateway, args, rng))
+        report['backends'] = {
+            'resolve': await drive_resolves(music, args, rng),
+            'spotify_playlist': await drive_playlists(music, args),
+        }
+        lag.stop()
+        report['loop_lag_ms'] = summarize(lag.samples)
+        report['rest_calls'] = gateway.sent
+    return report
+
+
+def lookup(report, path):
+    for key in path:
+        if not isinstance(report, dict) or key not in report:
+            return None
+        report = report[key]
+    return report
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    regressions = []
+    print(f"\n{'métrica':<32}{'baseline':>12}{'atual':>12}{'variação':>10}")
+    for path, higher_is_better in COMPARED:
+        old, new = lookup(baseline, path), lookup(report, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        # Tempos na casa de poucos ms variam muito entre execuções: exige também diferença absoluta
+        if path[-1].endswith('_s'):
+            noise = abs(new - old) * 1000 < min_delta_ms
+        else:
+            noise = path[-1] in ('p50', 'p99') and abs(new - old) < min_delta_ms
+        flag = ' ✗' if worse > tolerance and not noise else ''
+        print(f"{'.'.join(path):<32}{old:>12.2f}{new:>12.2f}{change:>+9.0%}{flag}")
+        if flag:
+            regressions.append('.'.join(path))
+    return regressions
+
+
+def print_report(report):
+    startup = report['startup']
+    print(
+        f"[bench] Pronto em {startup['time_to_ready_s']:.2f}s "
+        f"(import {startup['import_s']:.2f}s, extensões {startup['extensions_s']:.2f}s)"
+    )
+    print(
+        f"[bench] {report['completed']}/{report['messages']} comandos em {report['duration_s']:.2f}s "
+        f"({report['throughput']:.1f}/s), {report['errors']} erro(s), {report['lost']} perdido(s)"
+    )
+    if report['error_types']:
+        print(f"[bench] Erros: {report['error_types']}")
+    latency, lag = report['latency_ms'], report['loop_lag_ms']
+    print(f"[bench] Latência: p50 {latency['p50']:.1f}ms · p99 {latency['p99']:.1f}ms · máx {latency['max']:.1f}ms")
+    print(f"[bench] Lag do loop: p50 {lag['p50']:.2f}ms · p99 {lag['p99']:.2f}ms · máx {lag['max']:.2f}ms")
+    for name, stats in report['commands'].items():
+        print(f"    {name:<16}{stats['count']:>6}×  p50 {stats['p50']:>8.1f}ms  p99 {stats['p99']:>8.1f}ms")
+    for name, stats in report['backends'].items():
+        print(
+            f"[bench] {name}: p50 {stats['p50']:.1f}ms · p99 {stats['p99']:.1f}ms · "
+            f"{stats['rejected']} recusada(s) · {stats['errors']} erro(s) {stats['error_types'] or ''}"
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    rejected = report['backends']['resolve']['rejected']
+    if rejected > args.max_rejected * args.resolves:
+        print(f"\n[bench] {rejected}/{args.resolves} buscas recusadas pelo extrator (limite {args.max_rejected:.0%})")
+        return 1
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n[bench] Regressão acima de {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import random
+import time
+import zlib
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+import discord
+import spotipy
+
+
+class Latency:
+    # Latência simulada de um backend: média ± jitter (fração da média) e taxa de falhas
+    def __init__(self, mean, jitter=0.5, failure_rate=0.0, seed=None):
+        self.mean = mean
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+
+    def sample(self):
+        spread = self.mean * self.jitter
+        return max(self.mean + self.rng.uniform(-spread, spread), 0.0)
+
+    def fails(self):
+        return self.rng.random() < self.failure_rate
+
+
+# --- yt-dlp -----------------------------------------------------------------
+
+class StubExtractorPool(Executor):
+    # Substitui o ProcessPoolExecutor do Extractor: mesmas funções, respostas sintéticas em threads
+    def __init__(self, latency, workers):
+        self.latency = latency
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stub-ytdl')
+
+    def submit(self, func, *args, **kwargs):
+        return self.executor.submit(self._call, func.__name__, *args)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _call(self, name, *args):
+        if name == '_warmup':
+            return os.getpid()
+        time.sleep(self.latency.sample())
+        if self.latency.fails():
+            from audio.extractor import DownloadError
+            raise DownloadError(f"stub: falha simulada em {name}")
+        if name == 'search':
+            return f"stub{zlib.crc32(args[0].encode()) % 10 ** 7:07d}"
+        if name == 'search_candidates':
+            query, count = args
+            return [
+                {'id': f"cand{i}{zlib.crc32(query.encode()) % 10 ** 6:06d}", 'title': query, 'duration': 200}
+                for i in range(count)
+            ]
+        if name == 'extract':
+            url = args[0]
+            return {
+                'id': url.rsplit('=', 1)[-1],
+                'url': f"https://stub.invalid/audio?src={url}",
+                'expires_at': time.time() + 6 * 3600,
+                'acodec': 'opus',
+                'ext': 'webm',
+                'title': f"Faixa {url[-6:]}",
+                'duration': 200,
+                'webpage_url': url,
+            }
+        if name == 'playlist_page':
+            url, start, count = args
+            size = 300
+            return {
+                'title': f"Playlist {url[-6:]}",
+                'count': size,
+                'fetched': max(min(count, size - start), 0),
+                'entries': [
+                    {'id': f"pl{i:05d}{zlib.crc32(url.encode()) % 10 ** 4:04d}", 'title': f"Vídeo {i}", 'duration': 200}
+                    for i in range(start, min(start + count, size))
+                ],
+            }
+        raise NotImplementedError(name)
+
+
+def install_extractor_stub(latency):
+    # Antes de carregar o cog: o warmup do cog_load já encontra o pool falso
+    from audio.extractor import Extractor
+
+    def ensure_pool(self):
+        if self.pool is None:
+            self.pool = StubExtractorPool(latency, self.workers)
+        return self.pool
+
+    Extractor._ensure_pool = ensure_pool
+
+
+# --- ffmpeg -----------------------------------------------------------------
+
+# Pacote Opus qualquer; o SILENCE do discord.py é reconhecido pelo motor e não pode ser usado
+STUB_PACKET = b'\xfc\xff\xfe' + bytes(60)
+
+
+class StubOpusSource(discord.AudioSource):
+    # Faz o papel do FFmpegOpusAudio: entrega os pacotes da faixa a partir do seek, sem processo
+    def __init__(self, duration=None, seek=0):
+        self.remaining = int(max((duration or 200) - seek, 0) / 0.02)
+
+    def is_opus(self):
+        return True
+
+    def read(self):
+        if self.remaining <= 0:
+            return b''
+        self.remaining -= 1
+        return STUB_PACKET
+
+
+def install_audio_stub():
+    # O player importa create_source direto do módulo: troca lá, onde é usado
+    from audio import player
+
+    player.create_source = lambda ffmpeg_path, info, seek=0: StubOpusSource(info.get('duration'), seek)
+
+
+# --- Spotify ----------------------------------------------------------------
+
+class StubSpotifyClient:
+    # Mesma interface usada pelo SpotifyAPI (chamadas síncronas, rodando no executor dele)
+    def __init__(self, latency, playlist_size=300):
+        self.latency = latency
+        self.playlist_size = playlist_size
+
+    def _wait(self):
+        time.sleep(self.latency.sample())
+        if self.latency.fails():
+            raise spotipy.SpotifyException(503, -1, "stub: falha simulada")
+
+    @staticmethod
+    def _track(item_id, index):
+        return {
+            'id': f"{item_id}t{index}",
+            'name': f"Música {index}",
+            'artists': [{'name': f"Artista {index % 17}"}],
+            'duration_ms': 180_000 + index,
+            'external_ids': {'isrc': f"BR{index:010d}"},
+            'type': 'track',
+        }
+
+    def track(self, track_id):
+        self._wait()
+        return self._track(track_id, 0)
+
+    def playlist(self, playlist_id, fields=None):
+        self._wait()
+        return {'name': f"Playlist {playlist_id}", 'snapshot_id': 'stub'}
+
+    def _page(self, item_id, limit, offset, wrap):
+        items = [
+            self._track(item_id, i) for i in range(offset, min(offset + limit, self.playlist_size))
+        ]
+        return {'items': [{'track': t} for t in items] if wrap else items, 'total': self.playlist_size}
+
+    def playlist_items(self, playlist_id, limit=100, offset=0, additional_types=None):
+        self._wait()
+        return self._page(playlist_id, limit, offset, wrap=True)
+
+    def album_tracks(self, album_id, limit=50, offset=0):
+        self._wait()
+        return self._page(album_id, limit, offset, wrap=False)
+
+
+# --- HTTP (GIFs) ------------------------------------------------------------
+
+def _gif_payload(url, rng):
+    gif = f"https://stub.invalid/gif/{rng.randrange(10 ** 9)}.gif"
+    if 'purrbot' in url:
+        return {'link': gif}
+    if 'nekos.best' in url:
+        return {'results': [{'url': f"{gif}?n={i}"} for i in range(10)]}
+    return {'url': gif}
+
+
+class _StubResponse:
+    def __init__(self, status, payload):
+        self.status = status
+        self.payload = payload
+
+    async def json(self, content_type=None):
+        return self.payload
+
+
+class _StubRequest:
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
+
+    async def __aenter__(self):
+        latency = self.session.latency
+        await asyncio.sleep(latency.sample())
+        if latency.fails():
+            return _StubResponse(503, None)
+        return _StubResponse(200, _gif_payload(self.url, latency.rng))
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class StubSession:
+    # O suficiente de aiohttp.ClientSession para o HttpClient real (retries, stats) rodar sem rede
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        return _StubRequest(self, url)
+
+    async def close(self):
+        pass
+
+
+# --- Tradutor ---------------------------------------------------------------
+
+def install_translator_stub(latency):
+    from utils import translation
+
+    def translate(text, target):
+        time.sleep(latency.sample())
+        if latency.fails():
+            raise RuntimeError("stub: falha simulada no tradutor")
+        return '\n'.join(f"[{target}] {line}" for line in text.split('\n'))
+
+    translation._translate = translate
@@ -1,43 +1,151 @@
+import asyncio
+import importlib
 import os
+import pkgutil
+import time
 import discord
 from discord.ext import commands
 
+from utils import metrics
+from utils.cluster import ClusterClient
+from utils.gifs import GifPool
+from utils.http import HttpClient
+from utils.outbox import Outbox
+from utils.roles import MEMBERS_INTENT, chunk_at_startup, member_cache_flags
+
+STARTED_AT = time.perf_counter()
 TOKEN = os.getenv("DISCORD_TOKEN")
+# Sharding: vazio roda um Bot comum; "auto" ou um número usa AutoShardedBot. No modo cluster o
+# launcher (cluster.py) define SHARD_COUNT, SHARD_IDS e CLUSTER_ID de cada processo
+SHARD_COUNT = os.getenv("SHARD_COUNT", "")
+SHARD_IDS = os.getenv("SHARD_IDS", "")
+CLUSTER_ID = os.getenv("CLUSTER_ID", "")
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True
+# Membros: intent opcional; o cache guarda só o necessário e os servidores são baixados sob demanda
+intents.members = MEMBERS_INTENT
+
+
+def create_bot():
+    options = dict(
+        command_prefix="p!", intents=intents, help_command=None,
+        member_cache_flags=member_cache_flags(intents), chunk_guilds_at_startup=chunk_at_startup(intents),
+    )
+    if not SHARD_COUNT:
+        return commands.Bot(**options)
+    if SHARD_COUNT != "auto":
+        options['shard_count'] = int(SHARD_COUNT)
+    if SHARD_IDS:
+        options['shard_ids'] = [int(shard_id) for shard_id in SHARD_IDS.split(',')]
+    return commands.AutoShardedBot(**options)
+
 
-bot = commands.Bot(command_prefix="p!", intents=intents, help_command=None)
+bot = create_bot()
+bot.cluster = None
+bot.startup_report = {}
+bot.ready_after = None
+
+
+def discover_extensions(package="commands"):
+    # Todo módulo de commands/ com setup() é uma extensão; "_" no início fica de fora
+    path = importlib.import_module(package).__path__
+    return sorted(
+        f"{package}.{module.name}" for module in pkgutil.iter_modules(path)
+        if not module.name.startswith("_")
+    )
+
+
+async def load_extension(name, report):
+    # Import (dependências incluídas) e setup medidos separadamente; o import é síncrono,
+    # o setup (cog_load) roda em paralelo com o das outras extensões
+    started = time.perf_counter()
+    try:
+        importlib.import_module(name)
+        imported = time.perf_counter()
+        await bot.load_extension(name)
+    except Exception as e:
+        print(f"[ERRO] Falha ao carregar {name}: {type(e).__name__}: {e}")
+        report[name] = {'import': 0.0, 'setup': 0.0, 'error': f"{type(e).__name__}: {e}"}
+        return
+    report[name] = {'import': imported - started, 'setup': time.perf_counter() - imported}
 
 
 async def load_extensions():
-    await bot.load_extension("commands.ping")
-    await bot.load_extension("commands.avatar")
-    await bot.load_extension("commands.userinfo")
-    await bot.load_extension("commands.serverinfo")
-    await bot.load_extension("commands.roll")
-    await bot.load_extension("commands.help")
-    await bot.load_extension("commands.abracar")
-    await bot.load_extension("commands.beijar")
-    await bot.load_extension("commands.tapa")
-    await bot.load_extension("commands.ship")
-    await bot.load_extension("commands.par")
-    await bot.load_extension("commands.calc")
-    await bot.load_extension("commands.lembrete")
-    await bot.load_extension("commands.traduzir")
-    await bot.load_extension("commands.music")
+    started = time.perf_counter()
+    report = {}
+    await asyncio.gather(*(load_extension(name, report) for name in discover_extensions()))
+    bot.startup_report = report
+
+    print(f"[Inicialização] {len(report)} extensões em {time.perf_counter() - started:.3f}s")
+    for name, timing in sorted(report.items(), key=lambda item: -(item[1]['import'] + item[1]['setup'])):
+        status = f"  ❌ {timing['error']}" if 'error' in timing else ''
+        print(f"    {name:<22} import {timing['import'] * 1000:7.1f}ms  setup {timing['setup'] * 1000:7.1f}ms{status}")
+    return report
 
 
 @bot.event
 async def on_ready():
     print(f'Bot conectado como: {bot.user.name}')
+    if bot.ready_after is None:
+        bot.ready_after = time.perf_counter() - STARTED_AT
+        print(f"[Inicialização] Pronto em {bot.ready_after:.2f}s")
+    if bot.cluster is not None:
+        bot.cluster.ready()
+
+
+@bot.event
+async def on_shard_ready(shard_id):
+    print(f"[Shard {shard_id}] Conectado")
+
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+
+@bot.after_invoke
+async def record_command(ctx):
+    # Chamado também quando o comando falha (ctx.command_failed)
+    name = ctx.command.qualified_name
+    metrics.COMMAND_LATENCY.labels(name).observe(time.perf_counter() - ctx.started_at)
+    if ctx.command_failed:
+        metrics.COMMAND_ERRORS.labels(name).inc()
 
 
 async def main():
-    async with bot:
-        await load_extensions()
-        await bot.start(TOKEN)
+    # Serviços compartilhados pelos cogs (self.bot.http_client, self.bot.gifs, self.bot.outbox, self.bot.loop_lag)
+    async with bot, HttpClient() as http_client, GifPool(http_client) as gifs, Outbox() as outbox:
+        bot.http_client = http_client
+        bot.gifs = gifs
+        bot.outbox = outbox
+        bot.started_at = time.time()
+        metrics.add_source('http', http_client.stats, labels={None: 'host'})
+        metrics.add_source('gifs', gifs.stats, labels={'buffers': 'action', 'providers': 'provider'})
+        metrics.add_source('outbox', outbox.stats)
 
-import asyncio
-asyncio.run(main())
+        bot.loop_lag = metrics.LoopLagMonitor()
+        bot.loop_lag.start()
+        metrics_server = metrics.MetricsServer()
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            # Porta ocupada (outra instância, METRICS_PORT repetida): o bot sobe sem /metrics
+            print(f"[Métricas] Não foi possível abrir {metrics_server.host}:{metrics_server.port}: {e}")
+            await metrics_server.stop()
+        if CLUSTER_ID:
+            bot.cluster = ClusterClient(bot, int(CLUSTER_ID))
+            bot.cluster.start()
+        try:
+            await load_extensions()
+            await bot.start(TOKEN)
+        finally:
+            bot.loop_lag.stop()
+            await metrics_server.stop()
+            if bot.cluster is not None:
+                await bot.cluster.close()
+
+# Guarda necessária: os workers de extração (spawn) importam este módulo
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,209 @@
+import asyncio
+import hmac
+import itertools
+import os
+import secrets
+import signal
+import sys
+import time
+
+import aiohttp
+
+from utils.cluster import (
+    CLUSTER_IPC_HOST, CLUSTER_IPC_PORT, CLUSTER_IPC_TOKEN, MAX_LINE, read_message, split_shards, write_message,
+)
+
+# Launcher do modo cluster: sobe CLUSTER_PROCESSES cópias do bot.py, cada uma com uma fatia dos
+# shards, reinicia quem cair e faz a ponte de IPC entre elas. Uso: python cluster.py
+TOKEN = os.getenv("DISCORD_TOKEN")
+CLUSTER_PROCESSES = int(os.getenv("CLUSTER_PROCESSES", os.cpu_count() or 1))
+# "auto" pergunta ao Discord quantos shards usar
+CLUSTER_SHARDS = os.getenv("CLUSTER_SHARDS", "auto")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+# Tempo por shard para um processo ficar pronto antes de o próximo começar a identificar
+IDENTIFY_TIMEOUT = 15
+RESTART_BACKOFF_MAX = 60
+# Processo que vive menos que isso conta como falha em sequência (o backoff cresce)
+STABLE_AFTER = 60
+# Qualquer processo local alcança a porta de IPC: só quem mandar o segredo no hello entra
+IPC_TOKEN = CLUSTER_IPC_TOKEN or secrets.token_hex(32)
+
+
+async def recommended_shards():
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot", headers={"Authorization": f"Bot {TOKEN}"}
+        ) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+
+class Worker:
+    def __init__(self, cluster_id, shard_ids, shard_count):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.process = None
+        self.writer = None
+        self.ready = asyncio.Event()
+        self.started_at = 0.0
+        self.restarts = 0
+
+    def environment(self):
+        env = dict(
+            os.environ,
+            SHARD_COUNT=str(self.shard_count),
+            SHARD_IDS=','.join(map(str, self.shard_ids)),
+            CLUSTER_ID=str(self.cluster_id),
+            CLUSTER_IPC_TOKEN=IPC_TOKEN,
+        )
+        if METRICS_PORT:
+            # Um /metrics por processo, em portas seguidas
+            env["METRICS_PORT"] = str(METRICS_PORT + self.cluster_id)
+        return env
+
+    async def spawn(self):
+        self.ready.clear()
+        self.started_at = time.monotonic()
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "bot.py", env=self.environment(), cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        print(f"[Launcher] Cluster {self.cluster_id} (pid {self.process.pid}) com os shards {self.shard_ids}")
+
+
+class Launcher:
+    def __init__(self, processes=CLUSTER_PROCESSES):
+        self.processes = processes
+        self.workers = {}
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.stopping = asyncio.Event()
+        self.tasks = []
+
+    async def run(self):
+        shard_count = await recommended_shards() if CLUSTER_SHARDS == "auto" else int(CLUSTER_SHARDS)
+        for cluster_id, shard_ids in enumerate(split_shards(shard_count, self.processes)):
+            self.workers[cluster_id] = Worker(cluster_id, shard_ids, shard_count)
+        print(f"[Launcher] {shard_count} shard(s) em {len(self.workers)} processo(s)")
+
+        server = await asyncio.start_server(self.handle_connection, CLUSTER_IPC_HOST, CLUSTER_IPC_PORT, limit=MAX_LINE)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stopping.set)
+            except NotImplementedError:
+                pass
+
+        try:
+            # Um processo por vez: o Discord só aceita um IDENTIFY a cada 5 s por bucket,
+            # e cada processo só controla o próprio ritmo
+            for worker in self.workers.values():
+                self.tasks.append(loop.create_task(self.supervise(worker)))
+                try:
+                    await asyncio.wait_for(worker.ready.wait(), IDENTIFY_TIMEOUT * len(worker.shard_ids))
+                except asyncio.TimeoutError:
+                    print(f"[Launcher] Cluster {worker.cluster_id} demorou para ficar pronto, seguindo")
+                if self.stopping.is_set():
+                    break
+            await self.stopping.wait()
+        finally:
+            print("[Launcher] Encerrando processos")
+            await self.shutdown()
+            server.close()
+            await server.wait_closed()
+
+    async def supervise(self, worker):
+        failures = 0
+        while not self.stopping.is_set():
+            await worker.spawn()
+            code = await worker.process.wait()
+            if self.stopping.is_set():
+                return
+            uptime = time.monotonic() - worker.started_at
+            failures = failures + 1 if uptime < STABLE_AFTER else 0
+            delay = min(2 ** failures, RESTART_BACKOFF_MAX)
+            worker.restarts += 1
+            print(f"[Launcher] Cluster {worker.cluster_id} saiu com código {code} após {uptime:.0f}s, "
+                  f"reiniciando em {delay}s")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def shutdown(self):
+        for worker in self.workers.values():
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.terminate()
+        for worker in self.workers.values():
+            if worker.process is None:
+                continue
+            try:
+                await asyncio.wait_for(worker.process.wait(), 10)
+            except asyncio.TimeoutError:
+                worker.process.kill()
+        for task in self.tasks:
+            task.cancel()
+
+    async def handle_connection(self, reader, writer):
+        worker = None
+        try:
+            hello = await read_message(reader)
+            if not hello or hello.get('op') != 'hello' or hello.get('cluster') not in self.workers:
+                return
+            token = hello.get('token')
+            if not isinstance(token, str) or not hmac.compare_digest(token.encode(), IPC_TOKEN.encode()):
+                print(f"[Launcher] Conexão de IPC recusada: segredo inválido (cluster {hello.get('cluster')})")
+                return
+            worker = self.workers[hello['cluster']]
+            worker.writer = writer
+            if hello.get('ready'):
+                worker.ready.set()
+            while (message := await read_message(reader)) is not None:
+                op = message.get('op')
+                if op == 'ready':
+                    worker.ready.set()
+                    print(f"[Launcher] Cluster {worker.cluster_id} pronto")
+                elif op == 'request':
+                    asyncio.get_running_loop().create_task(self.broadcast(writer, message))
+                elif op == 'result':
+                    future = self.pending.get((message['id'], worker.cluster_id))
+                    if future is not None and not future.done():
+                        future.set_result(message)
+        except (OSError, ValueError) as e:
+            print(f"[Launcher] Conexão de IPC encerrada: {type(e).__name__}: {e}")
+        finally:
+            if worker is not None and worker.writer is writer:
+                worker.writer = None
+            writer.close()
+
+    async def call(self, worker, action, args, timeout):
+        call_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[(call_id, worker.cluster_id)] = future
+        try:
+            write_message(worker.writer, {'op': 'call', 'id': call_id, 'action': action, 'args': args})
+            result = await asyncio.wait_for(future, timeout)
+            return {key: result[key] for key in ('ok', 'data', 'error') if key in result}
+        except asyncio.TimeoutError:
+            return {'ok': False, 'error': "sem resposta"}
+        finally:
+            self.pending.pop((call_id, worker.cluster_id), None)
+
+    async def broadcast(self, writer, request):
+        # Repassa a ação a todos os processos conectados e devolve o resultado de cada um
+        timeout = request.get('timeout', 5)
+        results = {}
+        calls = {}
+        for cluster_id, worker in self.workers.items():
+            if worker.writer is None or worker.writer.is_closing():
+                results[cluster_id] = {'ok': False, 'error': "desconectado"}
+            else:
+                calls[cluster_id] = self.call(worker, request['action'], request.get('args', {}), timeout)
+        for cluster_id, result in zip(calls, await asyncio.gather(*calls.values())):
+            results[cluster_id] = result
+        if not writer.is_closing():
+            write_message(writer, {'op': 'response', 'id': request['id'], 'results': results})
+
+
+if __name__ == "__main__":
+    asyncio.run(Launcher().run())
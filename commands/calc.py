@@ -1,47 +1,32 @@
 import discord
 from discord.ext import commands
-import ast
-import operator as op
+
+from utils import metrics
+from utils.calc import CalcError, Calculator
 
 class Calc(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.calculator = Calculator()
+
+    async def cog_load(self):
+        self.calculator.start()
+        metrics.add_source('calculator', self.calculator.stats)
+
+    def cog_unload(self):
+        metrics.remove_source('calculator')
+        self.calculator.close()
 
     @commands.command(name="calc")
     async def calc(self, ctx, *, expression: str):
         try:
-            # Operadores suportados
-            operators = {
-                ast.Add: op.add,
-                ast.Sub: op.sub,
-                ast.Mult: op.mul,
-                ast.Div: op.truediv,
-                ast.Pow: op.pow,
-                ast.Mod: op.mod,
-                ast.USub: op.neg,
-                ast.UAdd: op.pos
-            }
-
-            def eval_node(node):
-                if isinstance(node, ast.Constant):  
-                    return node.value
-                elif isinstance(node, ast.Num):  
-                    return node.n
-                elif isinstance(node, ast.BinOp):
-                    return operators[type(node.op)](eval_node(node.left), eval_node(node.right))
-                elif isinstance(node, ast.UnaryOp):
-                    return operators[type(node.op)](eval_node(node.operand))
-                else:
-                    raise TypeError(f"Tipo de nó não suportado: {type(node)}")
-
-            # Parse da expressão
-            tree = ast.parse(expression, mode='eval')
-            resultado = eval_node(tree.body)
-            
+            resultado = await self.calculator.evaluate(expression)
             await ctx.send(f"🧮 Resultado: `{resultado}`")
-        
+
+        except CalcError as e:
+            await ctx.send(f"❌ Expressão inválida: {e}")
         except Exception as e:
             await ctx.send(f"❌ Expressão inválida ou erro: {str(e)}")
 
 async def setup(bot):
-    await bot.add_cog(Calc(bot))
\ No newline at end of file
+    await bot.add_cog(Calc(bot))
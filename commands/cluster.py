@@ -0,0 +1,92 @@
+import discord
+from discord.ext import commands
+
+from utils.cluster import node_stats
+from utils.reminders import format_duration
+
+
+def formatar_latencia(latencia):
+    return "-" if latencia is None else f"{latencia * 1000:.0f}ms"
+
+
+class Cluster(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def coletar(self):
+        # Sem launcher (processo único) o próprio processo é o cluster inteiro
+        if self.bot.cluster is None:
+            return {'0': {'ok': True, 'data': dict(node_stats(self.bot), cluster=0)}}
+        return await self.bot.cluster.broadcast('stats')
+
+    @commands.group(name="cluster", invoke_without_command=True)
+    @commands.is_owner()
+    async def cluster(self, ctx):
+        try:
+            resultados = await self.coletar()
+        except (ConnectionError, TimeoutError) as e:
+            return await self.bot.outbox.send(ctx.channel, f"❌ Launcher indisponível: {e}")
+
+        embed = discord.Embed(title="🛰️ Cluster", color=discord.Color.blurple())
+        totais = {'guilds': 0, 'voice': 0, 'playing': 0}
+        for cluster_id, resultado in sorted(resultados.items(), key=lambda item: int(item[0])):
+            if not resultado['ok']:
+                embed.add_field(name=f"Cluster {cluster_id}", value=f"❌ {resultado['error']}", inline=True)
+                continue
+            dados = resultado['data']
+            for chave in totais:
+                totais[chave] += dados[chave]
+            embed.add_field(
+                name=f"Cluster {cluster_id}",
+                value=(
+                    f"Shards: {', '.join(map(str, dados['shards']))}\n"
+                    f"Servidores: {dados['guilds']}\n"
+                    f"Voz: {dados['playing']}/{dados['voice']} tocando\n"
+                    f"Gateway: {formatar_latencia(dados['latency'])} · lag p99 {dados['loop_lag_p99'] * 1000:.0f}ms\n"
+                    f"Online há: {format_duration(dados['uptime'])} · pid {dados['pid']}"
+                ),
+                inline=True
+            )
+        embed.description = (
+            f"{len(resultados)} processo(s) · {totais['guilds']} servidores · "
+            f"{totais['playing']}/{totais['voice']} conexões de voz tocando"
+        )
+        await self.bot.outbox.send(ctx.channel, embed=embed)
+
+    # O is_owner do grupo não vale aqui: com invoke_without_command o discord.py chama o
+    # subcomando direto, sem as verificações do grupo
+    @cluster.command(name="recarregar")
+    @commands.is_owner()
+    async def recarregar(self, ctx, extensao: str):
+        nome = extensao if extensao.startswith("commands.") else f"commands.{extensao}"
+        try:
+            if self.bot.cluster is None:
+                await self.bot.reload_extension(nome)
+                resultados = {'0': {'ok': True}}
+            else:
+                resultados = await self.bot.cluster.broadcast('reload', extension=nome)
+        except (ConnectionError, TimeoutError) as e:
+            return await self.bot.outbox.send(ctx.channel, f"❌ Launcher indisponível: {e}")
+        except commands.ExtensionError as e:
+            return await self.bot.outbox.send(ctx.channel, f"❌ Falha ao recarregar {nome}: {e}")
+
+        linhas = [
+            f"{'✅' if resultado['ok'] else '❌'} Cluster {cluster_id}"
+            + ("" if resultado['ok'] else f": {resultado['error']}")
+            for cluster_id, resultado in sorted(resultados.items(), key=lambda item: int(item[0]))
+        ]
+        await self.bot.outbox.send(ctx.channel, f"🔄 Recarregando `{nome}`\n" + "\n".join(linhas))
+
+    @cluster.error
+    @recarregar.error
+    async def cluster_error(self, ctx, error):
+        if isinstance(error, commands.NotOwner):
+            await self.bot.outbox.send(ctx.channel, "❌ Apenas o dono do bot pode usar este comando.")
+        elif isinstance(error, commands.MissingRequiredArgument):
+            await self.bot.outbox.send(ctx.channel, "❌ Uso: p!cluster recarregar [extensão]")
+        else:
+            print(f"[ERRO cluster] {type(error).__name__}: {error}")
+
+
+async def setup(bot):
+    await bot.add_cog(Cluster(bot))
@@ -22,9 +22,11 @@ class Help(commands.Cog):
                 "👤 **p!userinfo [@usuário]** – Mostra informações do usuário\n"
                 "🏠 **p!serverinfo** – Mostra informações do servidor\n"
                 "🖼️ **p!avatar [@usuário]** – Mostra o avatar do usuário\n"
-                "⏰ **p!lembrete [tempo] [mensagem]** – Define um lembrete (ex: `p!lembrete 10m beber água`)\n"
-                "🧠 **p!calc [expressão]** – Calcula expressões matemáticas (ex: `p!calc 5*3+(2^3)`)\n"
-                "🌐 **p!traduzir [idioma] [texto]** – Traduz o texto para o idioma desejado (ex: `p!traduzir en Olá mundo`)"
+                "⏰ **p!lembrete [tempo] [mensagem]** – Define um lembrete (ex: `p!lembrete 1h30m beber água`)\n"
+                "📋 **p!lembretes** / **p!cancelarlembrete [id]** – Lista ou cancela seus lembretes\n"
+                "🧠 **p!calc [expressão]** – Calcula expressões matemáticas, com funções como `sqrt`, `sin`, `log` e `fatorial` (ex: `p!calc 5*3+(2^3)`)\n"
+                "🌐 **p!traduzir [idioma] [texto]** – Traduz o texto para o idioma desejado (ex: `p!traduzir en Olá mundo`)\n"
+                "💬 **p!traduzirchat [idioma] [quantidade]** – Traduz as últimas mensagens do canal (ex: `p!traduzirchat en 10`)"
             ), 
             inline=False
         )
@@ -38,12 +40,16 @@ class Help(commands.Cog):
             value=(
                 "🔊 **p!entrar** – Entra no canal de voz\n"
                 "🚪 **p!sair** – Sai do canal de voz\n"
-                "▶️ **p!tocar [URL]** – Toca uma música do YouTube\n"
+                "▶️ **p!tocar [URL]** – Toca uma música ou playlist do YouTube\n"
                 "🔁 **p!pular** – Pula uma música da fila\n"
                 "⏸️ **p!pausar** – Pausa a música atual\n"
                 "▶️ **p!continuar** – Continua a música pausada\n"
                 "⏹️ **p!parar** – Para a música e limpa a fila\n"
-                "📜 **p!fila** – Mostra a fila de reprodução"
+                "📜 **p!fila** – Mostra a fila de reprodução\n"
+                "🔀 **p!embaralhar** – Embaralha a fila\n"
+                "↕️ **p!mover [de] [para]** – Muda uma música de posição na fila\n"
+                "🗑️ **p!remover [posição]** – Remove uma música da fila\n"
+                "🧹 **p!repetidas** – Remove as músicas repetidas da fila"
             ),
             inline=False
         )
@@ -59,7 +65,7 @@ class Help(commands.Cog):
                 "💋 **p!beijar [@usuário]** – Dá um beijinho virtual\n"
                 "👋 **p!tapa [@usuário]** – Dá um tapinha (de leve, viu?)\n"
                 "❤️ **p!ship [@usuário1] [@usuário2]** – Calcula o amor entre dois usuários\n"
-                "🎯 **p!par [@cargo]** – Sorteia dois membros com o cargo escolhido"
+                "🎯 **p!par [@cargo] (todos)** – Sorteia dois membros com o cargo escolhido, ou forma pares com o cargo inteiro"
             ),
             inline=False
         )
@@ -1,36 +1,71 @@
 import discord
 from discord.ext import commands
-import asyncio
-import re
+import time
+
+from utils import metrics
+from utils.reminders import ReminderScheduler, format_duration, parse_duration
+
+MAX_POR_USUARIO = 50
 
 class Lembrete(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.scheduler = ReminderScheduler(bot, self.entregar)
+
+    async def cog_load(self):
+        self.scheduler.start()
+        metrics.add_source('reminders', self.scheduler.stats)
 
-    def parse_tempo(self, tempo_str):
-        match = re.match(r"(\d+)([smh])", tempo_str.lower())
-        if not match:
-            return None
-        quantidade, unidade = match.groups()
-        quantidade = int(quantidade)
-        if unidade == "s":
-            return quantidade
-        elif unidade == "m":
-            return quantidade * 60
-        elif unidade == "h":
-            return quantidade * 3600
-        return None
+    def cog_unload(self):
+        metrics.remove_source('reminders')
+        self.scheduler.stop()
+
+    async def entregar(self, user_id, channel_id, mensagem, atraso):
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            channel = await self.bot.fetch_channel(channel_id)
+
+        texto = f"🔔 <@{user_id}>, aqui está seu lembrete: {mensagem}"
+        if atraso > 60:
+            texto += f"\n⏱️ (entregue com {format_duration(atraso)} de atraso)"
+        await channel.send(texto, allowed_mentions=discord.AllowedMentions(users=True, everyone=False, roles=False))
 
     @commands.command(name="lembrete")
     async def lembrete(self, ctx, tempo: str, *, mensagem: str):
-        segundos = self.parse_tempo(tempo)
+        segundos = parse_duration(tempo)
         if segundos is None:
-            await ctx.send("❌ Formato inválido! Use algo como 10s, 5m ou 2h.")
+            await ctx.send("❌ Formato inválido! Use algo como 10s, 5m, 2h, 1h30m ou 2d.")
+            return
+
+        if self.scheduler.store.count_for_user(ctx.author.id) >= MAX_POR_USUARIO:
+            await ctx.send(f"❌ Você já tem {MAX_POR_USUARIO} lembretes pendentes. Cancele algum com `p!cancelarlembrete`.")
             return
-        
-        await ctx.send(f"⏰ Certo {ctx.author.mention}, vou te lembrar em {tempo}!")
-        await asyncio.sleep(segundos)
-        await ctx.send(f"🔔 {ctx.author.mention}, aqui está seu lembrete: {mensagem}")
+
+        lembrete_id = self.scheduler.add(ctx.author.id, ctx.channel.id, segundos, mensagem)
+        await ctx.send(f"⏰ Certo {ctx.author.mention}, vou te lembrar em {format_duration(segundos)}! (lembrete #{lembrete_id})")
+
+    @commands.command(name="lembretes")
+    async def lembretes(self, ctx):
+        pendentes = self.scheduler.store.for_user(ctx.author.id)
+        if not pendentes:
+            return await ctx.send("📭 Você não tem lembretes pendentes.")
+
+        agora = time.time()
+        linhas = []
+        for lembrete_id, due_at, mensagem in pendentes:
+            mensagem = mensagem if len(mensagem) <= 50 else f"{mensagem[:47]}..."
+            linhas.append(f"**#{lembrete_id}** – em {format_duration(due_at - agora)}: {mensagem}")
+
+        embed = discord.Embed(title="⏰ Seus lembretes", description="\n".join(linhas), color=discord.Color.blurple())
+        embed.set_footer(text="Use p!cancelarlembrete [id] para cancelar")
+        await ctx.send(embed=embed)
+
+    @commands.command(name="cancelarlembrete")
+    async def cancelar_lembrete(self, ctx, lembrete_id: int):
+        if self.scheduler.cancel(ctx.author.id, lembrete_id):
+            await ctx.send(f"🗑️ Lembrete #{lembrete_id} cancelado.")
+        else:
+            await ctx.send("❌ Não encontrei esse lembrete entre os seus.")
 
 async def setup(bot):
     await bot.add_cog(Lembrete(bot))
@@ -1,53 +1,152 @@
 import discord
-from discord.ext import commands
-import yt_dlp
+from discord.ext import commands, tasks
 import asyncio
+import importlib
+import math
 import os
 import re
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import time
-import imageio_ffmpeg
+from functools import cached_property
+
+from audio.disk_cache import AudioCache
+from audio.extractor import (
+    PLAYLIST_LIMIT, DownloadError, Extractor, ExtractorBusy, NoResults, playlist_id_from_url
+)
+from audio.player import GuildPlayer
+from audio.spotify import SpotifyAPI, SpotifyCache
+from audio.track import Track
+from audio.voice import VoiceLifecycle
+from utils import metrics
 
 SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
 
+FILA_POR_PAGINA = 10
+# Depois disso os botões do p!fila param de responder
+FILA_TIMEOUT = 180
+
+
+def formatar_duracao(segundos):
+    if not segundos:
+        return "?:??"
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    if horas:
+        return f"{horas}:{minutos:02d}:{segundos:02d}"
+    return f"{minutos}:{segundos:02d}"
+
+
+def descrever_faixa(track):
+    titulo = track.title if len(track.title) <= 50 else f"{track.title[:47]}..."
+    linha = f"{titulo} `{formatar_duracao(track.duration)}`"
+    if track.requester:
+        linha += f" · <@{track.requester}>"
+    return linha
+
+
+class QueueView(discord.ui.View):
+    # p!fila numa mensagem só: cada página é montada na hora a partir da fila atual,
+    # então só as faixas visíveis são percorridas e a fila pode mudar enquanto alguém navega
+    def __init__(self, player, author_id):
+        super().__init__(timeout=FILA_TIMEOUT)
+        self.player = player
+        self.author_id = author_id
+        self.page = 0
+        self.message = None
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(len(self.player.queue) / FILA_POR_PAGINA))
+
+    def render(self):
+        self.page = min(self.page, self.pages - 1)
+        start = self.page * FILA_POR_PAGINA
+        linhas = [
+            f"`{i}.` {descrever_faixa(track)}"
+            for i, track in enumerate(self.player.queue.page(start, FILA_POR_PAGINA), start + 1)
+        ]
+        embed = discord.Embed(
+            title="🎶 Fila de reprodução",
+            description="\n".join(linhas) or "📭 Fila vazia",
+            color=discord.Color.blurple()
+        )
+        if self.player.current is not None:
+            embed.add_field(name="Tocando agora", value=descrever_faixa(self.player.current), inline=False)
+        embed.set_footer(text=f"Página {self.page + 1}/{self.pages} · {len(self.player.queue)} faixa(s)")
+
+        self.first.disabled = self.previous.disabled = self.page == 0
+        self.next.disabled = self.last.disabled = self.page >= self.pages - 1
+        return embed
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Use p!fila para navegar pela fila.", ephemeral=True)
+            return False
+        return True
+
+    async def show(self, interaction, page):
+        self.page = max(page, 0)
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def first(self, interaction, button):
+        await self.show(interaction, 0)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction, button):
+        await self.show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction, button):
+        await self.show(interaction, self.page + 1)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def last(self, interaction, button):
+        await self.show(interaction, self.pages - 1)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
 class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.song_queue = []
-        self.current_song = None
+        self.players = {}
+        self.extractor = Extractor(bot)
         self.spotify = None
+        self.spotify_cache = SpotifyCache(load=False)
+        self.audio_cache = AudioCache()
+        self.voice = VoiceLifecycle(self)
         self.last_spotify_request = 0
         
         print("[Music Cog] Inicializando cog de música...")
-        
-        self.ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
-        print(f"[FFmpeg] Caminho: {self.ffmpeg_path}")
-        
-        if not os.path.exists(self.ffmpeg_path):
+        # FFmpeg e cliente do Spotify ficam para o primeiro uso: não atrasam a conexão do bot
+        if not (SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET):
+            print("⚠️ [Spotify] Credenciais não configuradas")
+
+    @cached_property
+    def ffmpeg_path(self):
+        import imageio_ffmpeg
+
+        path = imageio_ffmpeg.get_ffmpeg_exe()
+        print(f"[FFmpeg] Caminho: {path}")
+        if not os.path.exists(path):
             print("[ERRO FFmpeg] Executável não encontrado!")
         else:
             print("[FFmpeg] Executável encontrado")
+        return path
 
-        if SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET:
-            print("[Spotify] Conectando...")
-            try:
-                auth_manager = SpotifyClientCredentials(
-                    client_id=SPOTIFY_CLIENT_ID,
-                    client_secret=SPOTIFY_CLIENT_SECRET
-                )
-                self.spotify = spotipy.Spotify(auth_manager=auth_manager)
-                print("✅ [Spotify] Conectado")
-            except Exception as e:
-                print(f"⚠️ [Spotify] Erro: {e}")
-                self.spotify = None
-        else:
-            print("⚠️ [Spotify] Credenciais não configuradas")
+    def notify(self, ctx, content):
+        # Respostas de status do cog saem pelo agendador: o comando não espera o Discord
+        self.bot.outbox.status(ctx.channel, content)
 
     async def ensure_voice(self, ctx):
         if not ctx.author.voice:
-            await ctx.send("❌ Entre em um canal de voz primeiro!")
+            self.notify(ctx, "❌ Entre em um canal de voz primeiro!")
             return False
         return True
 
@@ -55,225 +154,193 @@ class Music(commands.Cog):
         if not self.spotify:
             if SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET:
                 try:
+                    from spotipy.oauth2 import SpotifyClientCredentials
+
                     auth_manager = SpotifyClientCredentials(
                         client_id=SPOTIFY_CLIENT_ID,
                         client_secret=SPOTIFY_CLIENT_SECRET
                     )
-                    self.spotify = spotipy.Spotify(auth_manager=auth_manager)
+                    self.spotify = SpotifyAPI(auth_manager, cache=self.spotify_cache)
+                    print("✅ [Spotify] Conectado")
                     return True
                 except Exception as e:
-                    print(f"[ERRO Spotify] Falha na reconexão: {e}")
+                    print(f"[ERRO Spotify] Falha na conexão: {e}")
                     return False
             return False
         return True
 
-    async def play_next(self, ctx):
-        if len(self.song_queue) > 0:
-            self.current_song = self.song_queue.pop(0)
-            await self.play_yt(ctx, self.current_song)
-        else:
-            self.current_song = None
-            await ctx.send("🎶 Fila vazia")
-
-    async def play_yt(self, ctx, query):
-        print(f"[play_yt] Buscando: {query}")
-        
-        ytdl_options = {
-            'format': 'bestaudio/best',
-            'quiet': True,
-            'no_warnings': True,
-            'ignoreerrors': True,
-            'extract_flat': True,
-            'default_search': 'ytsearch',
-            'socket_timeout': 15,
-            'retries': 5,
-            'extractor_args': {
-                'youtube': {
-                    'skip': ['dash', 'hls'],
-                    'player_client': ['android', 'web'],
-                }
-            },
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7'
-            }
-        }
-
-        ffmpeg_options = {
-            'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -probesize 20M -analyzeduration 20M',
-            'options': '-vn -filter:a "volume=0.7"'
+    def get_player(self, ctx):
+        player = self.players.get(ctx.guild.id)
+        if player is None:
+            print(f"[Music Cog] Criando player para o servidor {ctx.guild.id}")
+            player = GuildPlayer(self, ctx.guild)
+            self.players[ctx.guild.id] = player
+        player.channel = ctx.channel
+        return player
+
+    def drop_player(self, player):
+        # Só remove se ainda for o player registrado e não houver nada pendente
+        if self.players.get(player.guild.id) is player and not player.is_active:
+            del self.players[player.guild.id]
+
+    def voice_stats(self):
+        voice_clients = [vc for vc in self.bot.voice_clients if vc.is_connected()]
+        return {
+            'players': len(self.players),
+            'connected': len(voice_clients),
+            'playing': sum(1 for vc in voice_clients if vc.is_playing()),
+            'queued': sum(len(player.queue) for player in self.players.values()),
+            **self.voice.stats(),
         }
 
-        try:
-            with yt_dlp.YoutubeDL(ytdl_options) as ytdl:
-                # Verifica se é uma URL ou busca
-                is_url = query.startswith(('http://', 'https://'))
-                
-                # Extrai informações
-                info = await self.bot.loop.run_in_executor(
-                    None,
-                    lambda: ytdl.extract_info(
-                        query if is_url else f"ytsearch:{query}",
-                        download=False
-                    )
-                )
-
-                # Verifica se há resultados
-                if not info:
-                    await ctx.send("❌ Nenhum resultado encontrado para sua busca.")
-                    return await self.play_next(ctx)
-                    
-                # Se for uma busca, pega o primeiro resultado
-                if 'entries' in info:
-                    entries = [e for e in info['entries'] if e is not None]
-                    if not entries:
-                        await ctx.send("❌ Nenhum vídeo encontrado ou vídeo restrito.")
-                        return await self.play_next(ctx)
-                    info = entries[0]
-
-                # Obtém URL do áudio
-                audio_url = None
-                if 'url' in info:
-                    audio_url = info['url']
-                else:
-                    # Tenta encontrar a melhor URL de áudio nos formatos disponíveis
-                    for fmt in info.get('formats', []):
-                        if fmt.get('acodec') != 'none':
-                            audio_url = fmt.get('url')
-                            if audio_url:
-                                break
-                    
-                    if not audio_url and 'requested_formats' in info:
-                        for fmt in info['requested_formats']:
-                            if fmt.get('acodec') != 'none':
-                                audio_url = fmt.get('url')
-                                if audio_url:
-                                    break
-
-                if not audio_url:
-                    audio_url = f"https://youtu.be/{info.get('id', '')}"
-
-                # Prepara metadados para exibição
-                title = info.get('title', query)
-                webpage_url = info.get('webpage_url', f"https://youtu.be/{info.get('id', '')}")
-
-                # Verifica se o bot ainda está conectado
-                if not ctx.voice_client or not ctx.voice_client.is_connected():
-                    await ctx.send("❌ O bot foi desconectado do canal de voz.")
-                    return
-
-                # Cria a fonte de áudio
-                source = discord.FFmpegPCMAudio(
-                    executable=self.ffmpeg_path,
-                    source=audio_url,
-                    **ffmpeg_options
-                )
-
-                # Reproduz a música
-                ctx.voice_client.play(
-                    source,
-                    after=lambda e: asyncio.run_coroutine_threadsafe(
-                        self.play_next(ctx),
-                        self.bot.loop
-                    ) if not e else print(f"Erro na reprodução: {e}")
-                )
-
-                await ctx.send(f"🎵 Tocando: **{title}**\n🔗 {webpage_url}")
-
-        except yt_dlp.utils.DownloadError as e:
-            print(f"[ERRO Download] {e}")
-            await ctx.send("❌ Erro ao baixar o vídeo. O vídeo pode estar indisponível ou restrito.")
-            await self.play_next(ctx)
-        except discord.ClientException as e:
-            print(f"[ERRO Discord] {e}")
-            await ctx.send("❌ Erro na conexão de voz. Verifique se o bot está conectado corretamente.")
-        except Exception as e:
-            print(f"[ERRO play_yt] {type(e).__name__}: {e}")
-            await ctx.send("❌ Erro inesperado ao reproduzir a música.")
-            await self.play_next(ctx)
+    async def warm_up(self):
+        # Cache do Spotify e workers do yt-dlp carregam em segundo plano, sem atrasar o on_ready
+        await self.spotify_cache.load_async()
+        await self.bot.wait_until_ready()
+        if SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET:
+            await asyncio.to_thread(importlib.import_module, 'spotipy.oauth2')
+        await self.extractor.start()
+
+    async def cog_load(self):
+        self.bot.loop.create_task(self.warm_up())
+        self.save_spotify_cache.start()
+        self.voice.start()
+        metrics.add_source('extractor', self.extractor.stats)
+        metrics.add_source('spotify_cache', self.spotify_cache.stats)
+        metrics.add_source('voice', self.voice_stats)
+        metrics.add_source('audio_cache', self.audio_cache.stats)
+
+    def cog_unload(self):
+        for name in ('extractor', 'spotify_cache', 'voice', 'audio_cache'):
+            metrics.remove_source(name)
+        for player in list(self.players.values()):
+            player.destroy()
+        self.players.clear()
+        self.voice.stop()
+        self.extractor.close()
+        self.audio_cache.close()
+        if self.spotify:
+            self.spotify.close()
+        self.save_spotify_cache.cancel()
+        self.spotify_cache.save()
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        if member.id == self.bot.user.id and after.channel is not None and before.channel != after.channel:
+            self.voice.moved(member.guild, after.channel)
+
+    @tasks.loop(minutes=5)
+    async def save_spotify_cache(self):
+        await self.spotify_cache.save_async()
 
     async def process_spotify_url(self, ctx, url):
+        player = self.get_player(ctx)
         print(f"[process_spotify_url] Processando URL do Spotify: {url}")
         if not await self.ensure_spotify_connection():
             print("[process_spotify_url] Conexão com Spotify falhou")
-            return await ctx.send("❌ Problema na conexão com o Spotify. Tente novamente mais tarde.")
+            return self.notify(ctx, "❌ Problema na conexão com o Spotify. Tente novamente mais tarde.")
+
+        await self.run_ingest(player, self.ingest_spotify(ctx, player, url))
+
+    async def run_ingest(self, player, coro):
+        # A ingestão roda como task do player: p!parar, p!limpar e p!sair a interrompem
+        task = player.ingest(coro)
+        try:
+            await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            print(f"[ingest {player.guild.id}] Ingestão interrompida")
+
+    async def process_youtube_playlist(self, ctx, url):
+        player = self.get_player(ctx)
+        print(f"[process_youtube_playlist] Processando playlist do YouTube: {url}")
+        await self.run_ingest(player, self.ingest_youtube_playlist(ctx, player, url))
+
+    async def ingest_youtube_playlist(self, ctx, player, url):
+        # Listagem plana em páginas: as faixas entram sem resolver e só são extraídas
+        # quando chegam perto do começo da fila (prefetch do player)
+        self.notify(ctx, "🔍 Processando playlist do YouTube...")
+        added = 0
+        title = total = None
+        try:
+            async for page in self.extractor.playlist(url):
+                title, total = page['title'], page['count']
+                player.enqueue_many(Track.from_youtube(entry, requester=ctx.author.id) for entry in page['entries'])
+                added += len(page['entries'])
+        except (NoResults, ExtractorBusy) as e:
+            if not added:
+                return self.notify(ctx, str(e))
+            print(f"[process_youtube_playlist] Listagem interrompida após {added} faixas: {e}")
+        except DownloadError as e:
+            print(f"[ERRO Download] {e}")
+            if not added:
+                return self.notify(ctx, "❌ Não consegui abrir a playlist. Ela pode ser privada ou não existir.")
+        except asyncio.TimeoutError:
+            if not added:
+                return self.notify(ctx, "⌛ A playlist demorou demais para carregar.")
+            print(f"[process_youtube_playlist] Timeout após {added} faixas")
+
+        if not added:
+            return self.notify(ctx, "❌ Nenhum vídeo disponível nesta playlist.")
+        message = f"✅ Playlist '{title}' adicionada: {added} músicas na fila!"
+        if total and total > PLAYLIST_LIMIT:
+            message += f"\n⚠️ A playlist tem {total} vídeos; só os {PLAYLIST_LIMIT} primeiros entram na fila."
+        self.notify(ctx, message)
+
+    async def ingest_spotify(self, ctx, player, url):
+        from spotipy import SpotifyException
 
         try:
             if 'track' in url:
                 print("[process_spotify_url] Tipo: Track")
                 track_id = re.search(r'track/([a-zA-Z0-9]+)', url).group(1)
-                track = self.spotify.track(track_id)
-                query = f"{track['name']} {track['artists'][0]['name']}"
-                self.song_queue.append(query)
-                await ctx.send(f"✅ Música adicionada: **{track['name']}** - **{track['artists'][0]['name']}**")
+                track = await self.spotify.track(track_id)
+                player.enqueue(Track.from_spotify(track, requester=ctx.author.id))
+                self.notify(ctx, f"✅ Música adicionada: **{track['name']}** - **{track['artists'][0]}**")
                 
             elif 'album' in url:
                 print("[process_spotify_url] Tipo: Album")
-                await ctx.send("🔍 Processando álbum do Spotify...")
+                self.notify(ctx, "🔍 Processando álbum do Spotify...")
                 album_id = re.search(r'album/([a-zA-Z0-9]+)', url).group(1)
-                tracks = []
-                results = self.spotify.album_tracks(album_id)
-                tracks.extend(results['items'])
-                
-                while results['next']:
-                    results = self.spotify.next(results)
-                    tracks.extend(results['items'])
                 
-                for track in tracks:
-                    query = f"{track['name']} {track['artists'][0]['name']}"
-                    self.song_queue.append(query)
+                # Cada página entra na fila assim que chega: a reprodução começa após a primeira
+                added = 0
+                async for tracks in self.spotify.album_tracks(album_id):
+                    player.enqueue_many(Track.from_spotify(track, requester=ctx.author.id) for track in tracks)
+                    added += len(tracks)
                 
-                await ctx.send(f"✅ Álbum adicionado: {len(tracks)} músicas na fila!")
+                self.notify(ctx, f"✅ Álbum adicionado: {added} músicas na fila!")
                 
             elif 'playlist' in url:
                 print("[process_spotify_url] Tipo: Playlist")
-                await ctx.send("🔍 Processando playlist do Spotify...")
+                self.notify(ctx, "🔍 Processando playlist do Spotify...")
                 playlist_id = re.search(r'playlist/([a-zA-Z0-9]+)', url).group(1)
                 
-                playlist_info = self.spotify.playlist(playlist_id)
+                playlist_info = await self.spotify.playlist(playlist_id)
                 playlist_name = playlist_info['name']
                 print(f"[process_spotify_url] Nome da playlist: {playlist_name}")
                 
-                results = self.spotify.playlist_items(playlist_id, additional_types=['track'])
-                tracks = results['items']
-                
-                while results['next']:
-                    results = self.spotify.next(results)
-                    tracks.extend(results['items'])
-                
                 added = 0
-                for item in tracks:
-                    if item.get('track'):
-                        track = item['track']
-                        if track and track['type'] == 'track':  
-                            query = f"{track['name']} {track['artists'][0]['name']}"
-                            self.song_queue.append(query)
-                            added += 1
+                async for tracks in self.spotify.playlist_tracks(playlist_id, playlist_info['snapshot_id']):
+                    player.enqueue_many(Track.from_spotify(track, requester=ctx.author.id) for track in tracks)
+                    added += len(tracks)
                 
-                await ctx.send(f"✅ Playlist '{playlist_name}' adicionada: {added} músicas na fila!")
+                self.notify(ctx, f"✅ Playlist '{playlist_name}' adicionada: {added} músicas na fila!")
             
             else:
                 print("[process_spotify_url] Tipo não suportado")
-                return await ctx.send("❌ Tipo de link do Spotify não suportado")
-            
-            if not ctx.voice_client.is_playing() and not self.current_song:
-                print("[process_spotify_url] Nada tocando, iniciando reprodução")
-                await self.play_next(ctx)
+                return self.notify(ctx, "❌ Tipo de link do Spotify não suportado")
                 
-        except spotipy.SpotifyException as e:
+        except SpotifyException as e:
             print(f"[ERRO Spotify] Exception: {e}")
             error_msg = f"❌ Erro no Spotify: A playlist pode ser privada ou não existir."
             if "404" in str(e):
                 error_msg += "\n🔍 A playlist pode ser privada ou não existir."
-            await ctx.send(error_msg)
+            self.notify(ctx, error_msg)
         except Exception as e:
             print(f"[ERRO process_spotify_url] Exception: {e}")
-            await ctx.send(f"❌ Erro ao processar link: {str(e)}")
+            self.notify(ctx, f"❌ Erro ao processar link: {str(e)}")
 
     @commands.command(name="entrar")
     async def join(self, ctx):
@@ -289,30 +356,31 @@ class Music(commands.Cog):
             if ctx.voice_client.channel != channel:
                 print("[comando entrar] Movendo para novo canal")
                 await ctx.voice_client.move_to(channel)
-                await ctx.send(f"✅ Movido para: {channel.name}")
+                self.notify(ctx, f"✅ Movido para: {channel.name}")
             return
             
         print("[comando entrar] Conectando ao canal de voz")
         try:
             await channel.connect()
-            await ctx.send(f"✅ Conectado a: {channel.name}")
+            self.notify(ctx, f"✅ Conectado a: {channel.name}")
             print("[comando entrar] Conexão estabelecida com sucesso")
         except Exception as e:
             print(f"[ERRO entrar] Falha ao conectar: {e}")
-            await ctx.send(f"❌ Falha ao conectar: {e}")
+            self.notify(ctx, f"❌ Falha ao conectar: {e}")
 
     @commands.command(name="sair")
     async def leave(self, ctx):
         print(f"[comando sair] Chamado por {ctx.author}")
         if ctx.voice_client:
             print("[comando sair] Desconectando do canal de voz")
+            player = self.players.pop(ctx.guild.id, None)
+            if player:
+                player.destroy()
             await ctx.voice_client.disconnect()
-            self.song_queue = []
-            self.current_song = None
-            await ctx.send("👋 Desconectado")
+            self.notify(ctx, "👋 Desconectado")
         else:
             print("[comando sair] Nenhum canal de voz para desconectar")
-            await ctx.send("❌ Não estou em um canal de voz")
+            self.notify(ctx, "❌ Não estou em um canal de voz")
 
     @commands.command(name="tocar")
     async def play(self, ctx, *, query):
@@ -328,24 +396,29 @@ class Music(commands.Cog):
                 print("[comando tocar] Conectado com sucesso")
             except Exception as e:
                 print(f"[ERRO tocar] Falha ao conectar: {e}")
-                await ctx.send(f"❌ Falha ao conectar: {e}")
+                self.notify(ctx, f"❌ Falha ao conectar: {e}")
                 return
 
         if 'open.spotify.com' in query:
             print("[comando tocar] Detectado link do Spotify")
             return await self.process_spotify_url(ctx, query)
 
-        self.song_queue.append(query)
-        print(f"[comando tocar] Música adicionada à fila. Tamanho da fila: {len(self.song_queue)}")
+        if playlist_id_from_url(query):
+            print("[comando tocar] Detectado link de playlist do YouTube")
+            return await self.process_youtube_playlist(ctx, query)
+
+        player = self.get_player(ctx)
+        busy = player.is_active
+        player.enqueue(Track(query, requester=ctx.author.id))
+        print(f"[comando tocar] Música adicionada à fila. Tamanho da fila: {len(player.queue)}")
         
         if query.startswith(('http://', 'https://')):
-            await ctx.send(f"✅ Adicionado à fila: **{query}**")
+            self.notify(ctx, f"✅ Adicionado à fila: **{query}**")
         else:
-            await ctx.send(f"🔍 Adicionado à fila: Pesquisa por **'{query}'**")
+            self.notify(ctx, f"🔍 Adicionado à fila: Pesquisa por **'{query}'**")
 
-        if not ctx.voice_client.is_playing() and not self.current_song:
+        if not busy:
             print("[comando tocar] Nada tocando, iniciando reprodução")
-            await self.play_next(ctx)
         else:
             print("[comando tocar] Já há música tocando, adicionado à fila")
 
@@ -355,10 +428,10 @@ class Music(commands.Cog):
         if ctx.voice_client and ctx.voice_client.is_playing():
             print("[comando pausar] Pausando reprodução")
             ctx.voice_client.pause()
-            await ctx.send("⏸️ Pausado")
+            self.notify(ctx, "⏸️ Pausado")
         else:
             print("[comando pausar] Nada tocando para pausar")
-            await ctx.send("❌ Nada tocando para pausar")
+            self.notify(ctx, "❌ Nada tocando para pausar")
 
     @commands.command(name="continuar")
     async def resume(self, ctx):
@@ -366,69 +439,176 @@ class Music(commands.Cog):
         if ctx.voice_client and ctx.voice_client.is_paused():
             print("[comando continuar] Retomando reprodução")
             ctx.voice_client.resume()
-            await ctx.send("▶️ Retomado")
+            self.notify(ctx, "▶️ Retomado")
         else:
             print("[comando continuar] Nada pausado para retomar")
-            await ctx.send("❌ Nada pausado para retomar")
+            self.notify(ctx, "❌ Nada pausado para retomar")
 
     @commands.command(name="parar")
     async def stop(self, ctx):
         print(f"[comando parar] Chamado por {ctx.author}")
         if ctx.voice_client:
             print("[comando parar] Parando reprodução e limpando fila")
-            ctx.voice_client.stop()
-            self.song_queue = []
-            self.current_song = None
-            await ctx.send("⏹️ Parado e fila limpa")
+            player = self.players.get(ctx.guild.id)
+            if player:
+                player.stop()
+            else:
+                ctx.voice_client.stop()
+            self.notify(ctx, "⏹️ Parado e fila limpa")
         else:
             print("[comando parar] Nada tocando para parar")
-            await ctx.send("❌ Nada tocando para parar")
+            self.notify(ctx, "❌ Nada tocando para parar")
 
     @commands.command(name="pular")
     async def skip(self, ctx):
         print(f"[comando pular] Chamado por {ctx.author}")
         if not ctx.voice_client:
             print("[comando pular] Nenhum cliente de voz")
-            return await ctx.send("❌ Não estou conectado a um canal de voz")
+            return self.notify(ctx, "❌ Não estou conectado a um canal de voz")
         
-        if not ctx.voice_client.is_playing():
+        player = self.players.get(ctx.guild.id)
+        if not ctx.voice_client.is_playing() and not (player and player.current):
             print("[comando pular] Nada tocando no momento")
-            return await ctx.send("❌ Nenhuma música tocando no momento")
+            return self.notify(ctx, "❌ Nenhuma música tocando no momento")
         
-        if len(self.song_queue) == 0:
+        if not player or not player.queue:
             print("[comando pular] Fila vazia após pular")
-            ctx.voice_client.stop()
-            self.current_song = None
-            return await ctx.send("⏭️ Música pulada (fila vazia)")
+            if player:
+                player.skip()
+            else:
+                ctx.voice_client.stop()
+            return self.notify(ctx, "⏭️ Música pulada (fila vazia)")
         
         print("[comando pular] Pulando para próxima música")
-        ctx.voice_client.stop()
-        await ctx.send("⏭️ Música pulada - indo para a próxima")
+        player.skip()
+        self.notify(ctx, "⏭️ Música pulada - indo para a próxima")
 
     @commands.command(name="fila")
     async def show_queue(self, ctx):
         print(f"[comando fila] Chamado por {ctx.author}")
-        if not self.song_queue:
+        player = self.players.get(ctx.guild.id)
+        if not player or (not player.queue and player.current is None):
             print("[comando fila] Fila vazia")
-            await ctx.send("📭 Fila vazia")
+            self.notify(ctx, "📭 Fila vazia")
             return
-            
-        queue_list = []
-        for i, song in enumerate(self.song_queue, 1):
-            song_display = song if len(song) <= 50 else f"{song[:47]}..."
-            queue_list.append(f"{i}. {song_display}")
-        
-        print(f"[comando fila] Exibindo fila com {len(queue_list)} itens")
-        for i in range(0, len(queue_list), 10):
-            chunk = queue_list[i:i + 10]
-            await ctx.send("🎶 Fila de reprodução:\n" + "\n".join(chunk))
+
+        print(f"[comando fila] Exibindo fila com {len(player.queue)} itens")
+        view = QueueView(player, ctx.author.id)
+        view.message = await self.bot.outbox.send(ctx.channel, embed=view.render(), view=view)
+
+    async def queue_position(self, ctx, *posicoes):
+        # Posições como o p!fila mostra (a partir de 1); None se não houver fila ou posição inválida
+        player = self.players.get(ctx.guild.id)
+        if not player or not player.queue:
+            self.notify(ctx, "📭 Fila vazia")
+            return None
+        for posicao in posicoes:
+            if not 1 <= posicao <= len(player.queue):
+                self.notify(ctx, f"❌ Posição inválida: use um número de 1 a {len(player.queue)}")
+                return None
+        return player
+
+    @commands.command(name="embaralhar")
+    async def shuffle_queue(self, ctx):
+        print(f"[comando embaralhar] Chamado por {ctx.author}")
+        player = await self.queue_position(ctx)
+        if player:
+            player.shuffle()
+            self.notify(ctx, f"🔀 Fila embaralhada ({len(player.queue)} faixas)")
+
+    @commands.command(name="mover")
+    async def move_track(self, ctx, de: int, para: int):
+        print(f"[comando mover] Chamado por {ctx.author}: {de} -> {para}")
+        player = await self.queue_position(ctx, de)
+        if player:
+            track = player.move(de - 1, para - 1)
+            self.notify(ctx, f"↕️ **{track.title}** movida para a posição {min(max(para, 1), len(player.queue))}")
+
+    @commands.command(name="remover")
+    async def remove_track(self, ctx, posicao: int):
+        print(f"[comando remover] Chamado por {ctx.author}: {posicao}")
+        player = await self.queue_position(ctx, posicao)
+        if player:
+            track = player.remove(posicao - 1)
+            self.notify(ctx, f"🗑️ Removida da fila: **{track.title}**")
+
+    @commands.command(name="repetidas")
+    async def dedupe_queue(self, ctx):
+        print(f"[comando repetidas] Chamado por {ctx.author}")
+        player = await self.queue_position(ctx)
+        if player:
+            removed = player.dedupe()
+            self.notify(ctx, f"🧹 {len(removed)} faixa(s) repetida(s) removida(s) da fila")
+
+    @move_track.error
+    @remove_track.error
+    async def queue_edit_error(self, ctx, error):
+        if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+            self.notify(ctx, f"❌ Uso: p!{ctx.command.name} {ctx.command.signature}")
+        else:
+            print(f"[ERRO {ctx.command.name}] {type(error).__name__}: {error}")
 
     @commands.command(name="limpar")
     async def clear_queue(self, ctx):
         print(f"[comando limpar] Chamado por {ctx.author}")
-        self.song_queue = []
+        player = self.players.get(ctx.guild.id)
+        if player:
+            player.clear()
         print("[comando limpar] Fila limpa")
-        await ctx.send("🧹 Fila de reprodução limpa!")
+        self.notify(ctx, "🧹 Fila de reprodução limpa!")
+
+    @commands.group(name="cache", invoke_without_command=True)
+    @commands.is_owner()
+    async def audio_cache_info(self, ctx):
+        stats = self.audio_cache.stats()
+        if not self.audio_cache.enabled:
+            return self.notify(ctx, "💾 Cache de áudio desativado (MUSIC_AUDIO_CACHE_MB=0)")
+
+        embed = discord.Embed(title="💾 Cache de áudio", color=discord.Color.blurple())
+        embed.add_field(
+            name="Uso",
+            value=(
+                f"{stats['files']} faixa(s) · {stats['bytes'] / 1024 / 1024:.1f} MB de "
+                f"{stats['max_bytes'] / 1024 / 1024:.0f} MB"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Acertos",
+            value=f"{stats['hits']} de {stats['hits'] + stats['misses']} ({stats['hit_rate']:.0%})",
+            inline=True
+        )
+        embed.add_field(
+            name="Downloads",
+            value=(
+                f"{stats['stored']} salvos · {stats['failures']} falhas · "
+                f"{stats['evicted']} removidos · {stats['pending']} em andamento"
+            ),
+            inline=True
+        )
+        top = [
+            f"{plays}× {(title or video_id)[:50]}" for title, video_id, plays in self.audio_cache.top()
+        ]
+        embed.add_field(name="Mais tocadas", value="\n".join(top) or "Nenhuma faixa salva", inline=False)
+        embed.set_footer(text="Use p!cache limpar para apagar o cache")
+        await self.bot.outbox.send(ctx.channel, embed=embed)
+
+    # O is_owner do grupo não vale aqui: com invoke_without_command o discord.py chama o
+    # subcomando direto, sem as verificações do grupo
+    @audio_cache_info.command(name="limpar")
+    @commands.is_owner()
+    async def audio_cache_purge(self, ctx):
+        files, size = await self.audio_cache.purge()
+        print(f"[comando cache] {ctx.author} limpou o cache de áudio ({files} faixas)")
+        self.notify(ctx, f"🧹 Cache de áudio limpo: {files} faixa(s), {size / 1024 / 1024:.1f} MB liberados")
+
+    @audio_cache_info.error
+    @audio_cache_purge.error
+    async def audio_cache_error(self, ctx, error):
+        if isinstance(error, commands.NotOwner):
+            self.notify(ctx, "❌ Apenas o dono do bot pode usar este comando.")
+        else:
+            print(f"[ERRO cache] {type(error).__name__}: {error}")
 
 async def setup(bot):
     print("[setup] Registrando cog de música")
@@ -1,29 +1,115 @@
+import asyncio
 import discord
 from discord.ext import commands
+import os
 import random
 
+from utils import metrics
+from utils.roles import RoleIndex
+
+PARES_POR_MENSAGEM = 50
+# p!par @cargo todos em cargos enormes: o resto dos pares só é contado, não listado
+PAR_MAX_MENSAGENS = int(os.getenv('PAR_MAX_MENSAGENS', 4))
+
 class Par(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Sem o intent de membros os eventos de cargo não chegam: fica o cache do discord.py
+        self.index = RoleIndex() if bot.intents.members else None
+
+    async def cog_load(self):
+        if self.index is not None:
+            metrics.add_source('roles', self.index.stats)
+
+    def cog_unload(self):
+        metrics.remove_source('roles')
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if self.index is not None:
+            self.index.member_joined(member)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload):
+        # O raw chega mesmo para quem não estava no cache
+        if self.index is not None:
+            self.index.member_left(payload.guild_id, payload.user.id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if self.index is not None:
+            self.index.member_updated(before, after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        if self.index is not None:
+            self.index.role_deleted(role)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        # Sessão nova: eventos perdidos durante a queda, o índice é refeito no próximo uso
+        if self.index is not None:
+            self.index.forget(guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        if self.index is not None:
+            self.index.forget(guild.id)
+
+    async def membros(self, ctx, cargo):
+        if self.index is None:
+            return [m.id for m in cargo.members if not m.bot]
+        async with ctx.typing():
+            return await self.index.role(ctx.guild, cargo)
 
     @commands.command(name='par')
-    async def par(self, ctx, cargo: discord.Role = None):
+    async def par(self, ctx, cargo: discord.Role = None, modo: str = None):
         if not cargo:
-            return await ctx.send("❌ Você precisa mencionar um cargo. Ex: `p!par @Cargo`")
+            return await ctx.send("❌ Você precisa mencionar um cargo. Ex: `p!par @Cargo` ou `p!par @Cargo todos`")
 
-        membros = [m for m in cargo.members if not m.bot]
+        try:
+            membros = await self.membros(ctx, cargo)
+        except asyncio.TimeoutError:
+            return await ctx.send("⌛ O Discord demorou para mandar a lista de membros, tente de novo.")
 
         if len(membros) < 2:
             return await ctx.send("❌ Não há membros suficientes com esse cargo para formar um par.")
 
-        par_sorteado = random.sample(membros, 2)
+        if modo and modo.lower() == 'todos':
+            return await self.todos(ctx, cargo, membros)
+
+        par_sorteado = membros.sample(2) if self.index is not None else random.sample(membros, 2)
 
         embed = discord.Embed(
             title="💑 Par Romântico",
-            description=f"✨ {par_sorteado[0].mention} + {par_sorteado[1].mention} = Casal do ano!",
+            description=f"✨ <@{par_sorteado[0]}> + <@{par_sorteado[1]}> = Casal do ano!",
             color=discord.Color.red()
         )
         await ctx.send(embed=embed)
 
+    async def todos(self, ctx, cargo, membros):
+        # Forma pares com o cargo inteiro; com número ímpar, alguém fica de vela
+        ids = membros.shuffled() if self.index is not None else random.sample(membros, len(membros))
+        sobra = ids.pop() if len(ids) % 2 else None
+        pares = [f"💞 <@{ids[i]}> + <@{ids[i + 1]}>" for i in range(0, len(ids), 2)]
+
+        limite = PARES_POR_MENSAGEM * PAR_MAX_MENSAGENS
+        paginas = [pares[i:i + PARES_POR_MENSAGEM] for i in range(0, min(len(pares), limite), PARES_POR_MENSAGEM)]
+        for numero, pagina in enumerate(paginas, 1):
+            embed = discord.Embed(
+                title=f"💑 Pares de {cargo.name}" + (f" ({numero}/{len(paginas)})" if len(paginas) > 1 else ""),
+                description="\n".join(pagina),
+                color=discord.Color.red()
+            )
+            if numero == len(paginas):
+                rodape = f"{len(pares)} casais formados"
+                if len(pares) > limite:
+                    rodape += f" ({len(pares) - limite} não listados)"
+                if sobra is not None:
+                    embed.add_field(name="🕯️ Segurando vela", value=f"<@{sobra}>")
+                embed.set_footer(text=rodape)
+            # Várias mensagens seguidas: o agendador respeita o limite do canal
+            await self.bot.outbox.send(ctx.channel, embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Par(bot))
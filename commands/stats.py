@@ -0,0 +1,99 @@
+import time
+
+import discord
+from discord.ext import commands
+
+from utils import metrics
+from utils.reminders import format_duration
+
+MAX_COMANDOS = 10
+# Limite de caracteres de um campo de embed
+MAX_CAMPO = 1024
+# Limites do embed inteiro: campos e caracteres somando título, campos e rodapé
+MAX_CAMPOS = 25
+MAX_EMBED = 6000
+# Reservado para o rodapé que avisa das fontes que ficaram de fora
+RESERVA_RODAPE = 100
+
+
+def formatar_ms(segundos):
+    return f"{segundos * 1000:.0f}ms"
+
+
+def formatar_fonte(nome, stats, labels):
+    linhas = []
+    for metrica, _, valores, valor in metrics.flatten_stats(nome, stats, labels):
+        chave = metrica[len(nome) + 1:] or nome
+        if valores:
+            chave += f"[{','.join(valores)}]"
+        valor = f"{valor:.3f}" if isinstance(valor, float) else str(valor)
+        linhas.append(f"{chave}: {valor}")
+    texto = "\n".join(linhas)
+    if len(texto) > MAX_CAMPO - 8:
+        texto = texto[:MAX_CAMPO - 12] + "\n..."
+    return f"```{texto or '-'}```"
+
+
+class Stats(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="stats")
+    @commands.is_owner()
+    async def stats(self, ctx):
+        embed = discord.Embed(title="📊 Estatísticas do bot", color=discord.Color.blurple())
+
+        lag = metrics.LOOP_LAG.labels()
+        uptime = format_duration(time.time() - getattr(self.bot, 'started_at', time.time()))
+        embed.add_field(
+            name="Geral",
+            value=(
+                f"Online há: {uptime}\n"
+                f"Servidores: {len(self.bot.guilds)}\n"
+                f"Gateway: {formatar_ms(self.bot.latency)}\n"
+                f"Lag do loop: p50 {formatar_ms(lag.quantile(0.5))} · "
+                f"p99 {formatar_ms(lag.quantile(0.99))} · máx {formatar_ms(lag.max)}"
+            ),
+            inline=False
+        )
+
+        comandos = sorted(
+            metrics.COMMAND_LATENCY.children.items(),
+            key=lambda item: item[1].count,
+            reverse=True
+        )[:MAX_COMANDOS]
+        linhas = []
+        for (nome,), hist in comandos:
+            # children.get: só ler não cria uma série zerada para quem nunca falhou
+            erros = metrics.COMMAND_ERRORS.children.get((nome,))
+            erros = erros.value if erros is not None else 0
+            linhas.append(
+                f"`{nome}` {hist.count}× · p50 {formatar_ms(hist.quantile(0.5))} · "
+                f"p99 {formatar_ms(hist.quantile(0.99))} · {erros:.0f} erro(s)"
+            )
+        embed.add_field(name="Comandos", value="\n".join(linhas) or "Nenhum comando ainda", inline=False)
+
+        omitidas = 0
+        for nome, (stats, labels) in metrics.REGISTRY.read_sources().items():
+            valor = formatar_fonte(nome, stats, labels)
+            # Passando do limite o Discord recusa o embed inteiro: o que não cabe fica de fora
+            tamanho = len(embed) + len(nome) + len(valor)
+            if len(embed.fields) >= MAX_CAMPOS or tamanho > MAX_EMBED - RESERVA_RODAPE:
+                omitidas += 1
+                continue
+            embed.add_field(name=nome, value=valor, inline=True)
+        if omitidas:
+            embed.set_footer(text=f"{omitidas} fonte(s) omitida(s) pelo limite de tamanho do embed")
+
+        await ctx.send(embed=embed)
+
+    @stats.error
+    async def stats_error(self, ctx, error):
+        if isinstance(error, commands.NotOwner):
+            await ctx.send("❌ Apenas o dono do bot pode usar este comando.")
+        else:
+            print(f"[ERRO stats] {type(error).__name__}: {error}")
+
+
+async def setup(bot):
+    await bot.add_cog(Stats(bot))
@@ -1,15 +1,32 @@
 import discord
 from discord.ext import commands
-from deep_translator import GoogleTranslator
+
+from utils import metrics
+from utils.translation import InvalidLanguage, Translator, normalize_language
+
+MAX_MENSAGENS = 25
 
 class Traduzir(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.translator = Translator()
+
+    async def cog_load(self):
+        metrics.add_source('translator', self.translator.stats)
+        self.bot.loop.create_task(self.warm_up())
+
+    async def warm_up(self):
+        await self.bot.wait_until_ready()
+        await self.translator.warm_up()
+
+    def cog_unload(self):
+        metrics.remove_source('translator')
+        self.translator.close()
 
     @commands.command(name="traduzir")
     async def traduzir(self, ctx, idioma: str, *, texto: str):
         try:
-            traduzido = GoogleTranslator(source="auto", target=idioma).translate(texto)
+            traduzido = await self.translator.translate(texto, idioma)
 
             embed = discord.Embed(title="Tradução", color=discord.Color.green())
             embed.add_field(name="Original", value=texto, inline=False)
@@ -17,8 +34,44 @@ class Traduzir(commands.Cog):
             embed.set_footer(text=f"Traduzido para '{idioma}'")
             await ctx.send(embed=embed)
 
+        except InvalidLanguage as e:
+            await ctx.send(f"❌ {e} Use um código como `en`, `es` ou `pt`.")
         except Exception as e:
             await ctx.send(f"❌ Ocorreu um erro ao tentar traduzir: {str(e)}")
 
+    @commands.command(name="traduzirchat")
+    async def traduzir_chat(self, ctx, idioma: str, quantidade: int = 10):
+        try:
+            normalize_language(idioma)
+        except InvalidLanguage as e:
+            return await ctx.send(f"❌ {e} Use um código como `en`, `es` ou `pt`.")
+
+        quantidade = max(1, min(quantidade, MAX_MENSAGENS))
+        mensagens = [
+            m async for m in ctx.channel.history(limit=quantidade, before=ctx.message)
+            if m.content and not m.author.bot
+        ]
+        if not mensagens:
+            return await ctx.send("❌ Não encontrei mensagens para traduzir.")
+        mensagens.reverse()
+
+        try:
+            traduzidas = await self.translator.translate_batch([m.content for m in mensagens], idioma)
+        except Exception as e:
+            return await ctx.send(f"❌ Ocorreu um erro ao tentar traduzir: {str(e)}")
+
+        linhas = []
+        for mensagem, traduzida in zip(mensagens, traduzidas):
+            linha = f"**{mensagem.author.display_name}:** {traduzida}"
+            linhas.append(linha if len(linha) <= 300 else f"{linha[:297]}...")
+
+        embed = discord.Embed(
+            title="Tradução do chat",
+            description="\n".join(linhas)[:4096],
+            color=discord.Color.green()
+        )
+        embed.set_footer(text=f"Últimas {len(mensagens)} mensagens traduzidas para '{idioma}'")
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Traduzir(bot))
@@ -0,0 +1,290 @@
+import ast
+import asyncio
+import math
+import multiprocessing
+import operator as op
+import os
+from functools import lru_cache
+
+CALC_TIMEOUT = float(os.getenv('CALC_TIMEOUT', 2))
+MAX_EXPRESSION_LENGTH = 300
+MAX_NODES = 200
+# Estimativa (em bits) do maior número que a expressão pode produzir:
+# até INLINE_BITS roda direto no loop, até MAX_BITS vai para o processo worker
+INLINE_BITS = 4096
+MAX_BITS = 4_000_000
+# Inteiros maiores que isso são mostrados em notação científica
+MAX_RESULT_DIGITS = 1000
+MAX_FACTORIAL = 100_000
+
+OPERATORS = {
+    ast.Add: op.add,
+    ast.Sub: op.sub,
+    ast.Mult: op.mul,
+    ast.Div: op.truediv,
+    ast.FloorDiv: op.floordiv,
+    ast.Pow: op.pow,
+    ast.Mod: op.mod,
+    ast.USub: op.neg,
+    ast.UAdd: op.pos,
+}
+
+
+def _factorial(n):
+    if n != int(n) or n < 0:
+        raise ValueError("fatorial só existe para inteiros não negativos")
+    if n > MAX_FACTORIAL:
+        raise ValueError("fatorial grande demais")
+    return math.factorial(int(n))
+
+
+def _log(x, base=math.e):
+    return math.log(x, base)
+
+
+FUNCTIONS = {
+    'sqrt': math.sqrt, 'raiz': math.sqrt, 'cbrt': lambda x: math.copysign(abs(x) ** (1 / 3), x),
+    'sin': math.sin, 'sen': math.sin, 'cos': math.cos, 'tan': math.tan, 'tg': math.tan,
+    'asin': math.asin, 'acos': math.acos, 'atan': math.atan,
+    'log': _log, 'ln': math.log, 'log10': math.log10, 'log2': math.log2, 'exp': math.exp,
+    'abs': abs, 'round': round, 'floor': math.floor, 'ceil': math.ceil,
+    'factorial': _factorial, 'fatorial': _factorial,
+    'radians': math.radians, 'degrees': math.degrees,
+}
+
+CONSTANTS = {
+    'pi': math.pi, 'π': math.pi, 'e': math.e, 'tau': math.tau, 'phi': (1 + 5 ** 0.5) / 2,
+}
+
+
+class CalcError(Exception):
+    pass
+
+
+def normalize(expression):
+    # "^" é potência para quem usa o comando; "×" e "÷" também são aceitos
+    return expression.strip().replace('^', '**').replace('×', '*').replace('÷', '/')
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression):
+    # Parse + validação ficam em cache: expressões repetidas não passam pelo parser de novo
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalcError("expressão longa demais")
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except (SyntaxError, RecursionError, ValueError) as e:
+        raise CalcError("sintaxe inválida") from e
+
+    nodes = 0
+    for node in ast.walk(tree.body):
+        nodes += 1
+        if nodes > MAX_NODES:
+            raise CalcError("expressão complexa demais")
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                raise CalcError("só números são permitidos")
+        elif isinstance(node, (ast.BinOp, ast.UnaryOp)):
+            if type(node.op) not in OPERATORS:
+                raise CalcError(f"operador não suportado: {type(node.op).__name__}")
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise CalcError("função não suportada")
+        elif isinstance(node, ast.Name):
+            if node.id not in CONSTANTS and node.id not in FUNCTIONS:
+                raise CalcError(f"nome desconhecido: {node.id}")
+        elif not isinstance(node, (ast.operator, ast.unaryop, ast.Load)):
+            raise CalcError(f"tipo de nó não suportado: {type(node).__name__}")
+    return tree.body
+
+
+def estimate_bits(node):
+    # Custo da expressão: limite superior (em bits) do maior número que aparece em qualquer
+    # ponto do cálculo. Um operando caro conta mesmo quando o resultado final é pequeno
+    # (9**9**9 % 7, sqrt(9**9**9)): ele é calculado por inteiro antes do operador
+    return _estimate(node)[1]
+
+
+def _estimate(node):
+    # (bits do resultado, custo até aqui), sem calcular nada de fato
+    if isinstance(node, ast.Constant):
+        size = math.log2(abs(node.value)) if node.value else 0.0
+        return size, size
+    if isinstance(node, ast.Name):
+        return 2.0, 2.0
+    if isinstance(node, ast.UnaryOp):
+        return _estimate(node.operand)
+    if isinstance(node, ast.Call):
+        args = [_estimate(arg) for arg in node.args]
+        children = max((cost for _, cost in args), default=0.0)
+        name = node.func.id
+        if name in ('factorial', 'fatorial') and args:
+            n = 2 ** min(args[0][0], 64)
+            size = n * math.log2(max(n, 2))
+        elif name in ('abs', 'round', 'floor', 'ceil') and args:
+            size = args[0][0]
+        else:
+            # As demais funções trabalham com float: estouram com OverflowError, não travam
+            size = 1024.0
+        return size, max(children, size)
+
+    left, left_cost = _estimate(node.left)
+    right, right_cost = _estimate(node.right)
+    if isinstance(node.op, (ast.Add, ast.Sub)):
+        size = max(left, right) + 1
+    elif isinstance(node.op, ast.Mult):
+        size = left + right
+    elif isinstance(node.op, ast.Pow):
+        if isinstance(node.right, ast.UnaryOp) and isinstance(node.right.op, ast.USub):
+            # Expoente negativo: o resultado é uma fração (float)
+            size = max(left, 1.0)
+        else:
+            size = max(left, 1.0) * 2 ** min(right, 64)
+    elif isinstance(node.op, ast.Mod):
+        size = right
+    elif isinstance(node.op, ast.FloorDiv):
+        size = left
+    else:
+        # Divisão: float, estoura com OverflowError se não couber
+        size = 1024.0
+    return size, max(left_cost, right_cost, size)
+
+
+def eval_node(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            raise CalcError(f"{node.id} é uma função, use {node.id}(...)")
+        return CONSTANTS[node.id]
+    if isinstance(node, ast.BinOp):
+        return OPERATORS[type(node.op)](eval_node(node.left), eval_node(node.right))
+    if isinstance(node, ast.UnaryOp):
+        return OPERATORS[type(node.op)](eval_node(node.operand))
+    if isinstance(node, ast.Call):
+        return FUNCTIONS[node.func.id](*(eval_node(arg) for arg in node.args))
+    raise CalcError(f"tipo de nó não suportado: {type(node).__name__}")
+
+
+def format_result(value):
+    if isinstance(value, int) and value.bit_length() > MAX_RESULT_DIGITS * 3.32:
+        # str() de inteiros gigantes é lento (e limitado pelo Python): mostra só a ordem de grandeza
+        exponent = math.log10(abs(value))
+        mantissa = 10 ** (exponent - math.floor(exponent))
+        sign = '-' if value < 0 else ''
+        return f"≈ {sign}{mantissa:.6f}e+{math.floor(exponent)}"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return str(value)
+
+
+def evaluate(expression):
+    # Também é o ponto de entrada do processo worker
+    return format_result(eval_node(compile_expression(expression)))
+
+
+def _restart_pool(pool):
+    pool.terminate()
+    return multiprocessing.get_context('spawn').Pool(1)
+
+
+class Calculator:
+    # Expressões leves rodam no loop; as pesadas em um processo separado com tempo limite
+    def __init__(self, timeout=CALC_TIMEOUT):
+        self.timeout = timeout
+        self.pool = None
+        # Cálculos esperando o worker atual; falham juntos quando ele é morto
+        self.waiting = set()
+        # Troca do pool em andamento (numa thread): quem chega espera o novo
+        self.replacing = None
+        self.inline = 0
+        self.offloaded = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def start(self):
+        # O processo worker sobe junto com o cog, não no primeiro cálculo pesado
+        self._ensure_pool()
+
+    def _ensure_pool(self):
+        if self.pool is None:
+            self.pool = multiprocessing.get_context('spawn').Pool(1)
+        return self.pool
+
+    def close(self):
+        self.replacing = None
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def _replace(self, pool):
+        # O worker continua preso no cálculo: mata o processo e sobe outro fora do event loop.
+        # Quem estava na fila atrás dele falha agora, não só quando o próprio timeout vencer
+        self.pool = None
+        waiting, self.waiting = self.waiting, set()
+        for future in waiting:
+            if not future.done():
+                future.set_exception(CalcError("o worker travou em outro cálculo, tente de novo"))
+        task = self.replacing = asyncio.ensure_future(asyncio.to_thread(_restart_pool, pool))
+
+        def replaced(_):
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                print(f"[Calc] Falha ao recriar o worker: {task.exception()}")
+            elif self.replacing is task:
+                self.pool = task.result()
+            else:
+                # close() veio antes de o pool novo ficar pronto
+                task.result().terminate()
+            if self.replacing is task:
+                self.replacing = None
+
+        task.add_done_callback(replaced)
+
+    async def evaluate(self, expression):
+        expression = normalize(expression)
+        tree = compile_expression(expression)
+        cost = estimate_bits(tree)
+
+        if cost > MAX_BITS:
+            self.rejected += 1
+            raise CalcError("resultado grande demais para calcular")
+        if cost <= INLINE_BITS:
+            self.inline += 1
+            return evaluate(expression)
+
+        self.offloaded += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def done(result):
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+
+        def failed(error):
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_exception(error))
+
+        if self.replacing is not None:
+            # wait() não repassa a falha da troca: nesse caso _ensure_pool() sobe o pool aqui
+            await asyncio.wait({self.replacing})
+        pool = self._ensure_pool()
+        pool.apply_async(evaluate, (expression,), callback=done, error_callback=failed)
+        self.waiting.add(future)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if self.pool is pool:
+                self._replace(pool)
+            raise CalcError("o cálculo demorou demais")
+        finally:
+            self.waiting.discard(future)
+
+    def stats(self):
+        return {
+            'inline': self.inline,
+            'offloaded': self.offloaded,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'compile_cache': compile_expression.cache_info()._asdict(),
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+import json
+import math
+import os
+import time
+
+from utils import metrics
+
+# Endereço do canal de IPC do launcher (cluster.py)
+CLUSTER_IPC_HOST = os.getenv('CLUSTER_IPC_HOST', '127.0.0.1')
+CLUSTER_IPC_PORT = int(os.getenv('CLUSTER_IPC_PORT', 9190))
+# Segredo do hello: sem ele o launcher recusa a conexão. Vazio no .env, o launcher sorteia um a
+# cada execução e repassa aos processos que ele mesmo sobe
+CLUSTER_IPC_TOKEN = os.getenv('CLUSTER_IPC_TOKEN', '')
+CLUSTER_TIMEOUT = 5
+RECONNECT_DELAY = 2
+# Linhas JSON maiores que isso derrubam a conexão (stats de um processo ficam bem abaixo)
+MAX_LINE = 1024 * 1024
+
+
+def split_shards(total, clusters):
+    # Intercalado (0, N, 2N...): servidores vizinhos em id, e os canais de voz mais ativos,
+    # se espalham pelos processos em vez de cair todos no mesmo
+    clusters = max(1, min(clusters, total))
+    return [list(range(i, total, clusters)) for i in range(clusters)]
+
+
+async def read_message(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def write_message(writer, message):
+    writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+
+
+def node_stats(bot):
+    # Retrato de um processo: o que o p!cluster soma entre todos
+    voice_clients = [vc for vc in bot.voice_clients if vc.is_connected()]
+    lag = metrics.LOOP_LAG.labels()
+    return {
+        'pid': os.getpid(),
+        'shards': sorted(bot.shards) if hasattr(bot, 'shards') else [0],
+        'guilds': len(bot.guilds),
+        'latency': None if math.isnan(bot.latency) else bot.latency,
+        'voice': len(voice_clients),
+        'playing': sum(1 for vc in voice_clients if vc.is_playing()),
+        'uptime': time.time() - getattr(bot, 'started_at', time.time()),
+        'loop_lag_p99': lag.quantile(0.99),
+    }
+
+
+class ClusterClient:
+    # Lado do worker: conecta no launcher, responde às chamadas dele e pede broadcasts.
+    # Mensagens são linhas JSON; "request" sai daqui, o launcher repassa como "call" a cada
+    # processo e devolve um "response" com o resultado de todos
+    def __init__(self, bot, cluster_id, host=CLUSTER_IPC_HOST, port=CLUSTER_IPC_PORT, token=CLUSTER_IPC_TOKEN):
+        self.bot = bot
+        self.cluster_id = cluster_id
+        self.host = host
+        self.port = port
+        self.token = token
+        self.writer = None
+        self.task = None
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.handlers = {'stats': self._stats, 'reload': self._reload}
+        self.is_ready = False
+
+    def register(self, action, handler):
+        self.handlers[action] = handler
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+
+    @property
+    def connected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def run(self):
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=MAX_LINE)
+                write_message(self.writer, {
+                    'op': 'hello', 'cluster': self.cluster_id, 'pid': os.getpid(), 'ready': self.is_ready,
+                    'token': self.token,
+                })
+                print(f"[Cluster {self.cluster_id}] Conectado ao launcher em {self.host}:{self.port}")
+                while (message := await read_message(reader)) is not None:
+                    self._dispatch(message)
+            except (OSError, ValueError) as e:
+                print(f"[Cluster {self.cluster_id}] IPC indisponível: {type(e).__name__}: {e}")
+            finally:
+                self.writer = None
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("conexão com o launcher perdida"))
+                self.pending.clear()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def _dispatch(self, message):
+        op = message.get('op')
+        if op == 'call':
+            asyncio.get_running_loop().create_task(self._call(message))
+        elif op == 'response':
+            future = self.pending.pop(message['id'], None)
+            if future is not None and not future.done():
+                future.set_result(message['results'])
+
+    async def _call(self, message):
+        handler = self.handlers.get(message['action'])
+        try:
+            if handler is None:
+                raise LookupError(f"ação desconhecida: {message['action']}")
+            result = {'ok': True, 'data': await handler(**message.get('args', {}))}
+        except Exception as e:
+            result = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        if self.connected:
+            write_message(self.writer, {'op': 'result', 'id': message['id'], **result})
+
+    def ready(self):
+        # Avisa o launcher que os shards deste processo conectaram: o próximo processo pode subir
+        self.is_ready = True
+        if self.connected:
+            write_message(self.writer, {'op': 'ready', 'cluster': self.cluster_id})
+
+    async def broadcast(self, action, timeout=CLUSTER_TIMEOUT, **args):
+        # Executa a ação em todos os processos; devolve {cluster: {'ok', 'data' ou 'error'}}
+        if not self.connected:
+            raise ConnectionError("sem conexão com o launcher")
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        write_message(self.writer, {
+            'op': 'request', 'id': request_id, 'action': action, 'args': args, 'timeout': timeout,
+        })
+        try:
+            # Folga para o launcher juntar as respostas que chegarem no limite
+            return await asyncio.wait_for(future, timeout + 1)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def _stats(self):
+        return dict(node_stats(self.bot), cluster=self.cluster_id)
+
+    async def _reload(self, extension):
+        await self.bot.reload_extension(extension)
+        return extension
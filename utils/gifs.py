@@ -0,0 +1,199 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+import aiohttp
+import discord
+
+from utils.http import HttpError
+
+GIF_BUFFER_SIZE = int(os.getenv('GIF_BUFFER_SIZE', 20))
+# Abaixo disso o buffer volta a ser reabastecido em segundo plano
+GIF_REFILL_THRESHOLD = GIF_BUFFER_SIZE // 2
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 60
+
+
+class Provider:
+    def __init__(self, name, url, parse, actions, aliases=None):
+        self.name = name
+        self.url = url
+        self.parse = parse
+        self.actions = set(actions)
+        self.aliases = aliases or {}
+        self.failures = 0
+        self.open_until = 0.0
+        self.successes = 0
+        self.errors = 0
+
+    def supports(self, action):
+        return action in self.actions
+
+    @property
+    def available(self):
+        # Circuito aberto: depois do cooldown deixa passar uma tentativa (meio-aberto)
+        return time.monotonic() >= self.open_until
+
+    def record_success(self):
+        self.failures = 0
+        self.successes += 1
+
+    def record_failure(self):
+        self.failures += 1
+        self.errors += 1
+        if self.failures >= BREAKER_FAILURES:
+            self.open_until = time.monotonic() + BREAKER_COOLDOWN
+            print(f"⚠️ [GIFs] {self.name} fora do ar, pausado por {BREAKER_COOLDOWN}s")
+
+    def endpoint(self, action):
+        return self.url.format(action=self.aliases.get(action, action))
+
+    def stats(self):
+        return {
+            'successes': self.successes,
+            'errors': self.errors,
+            'open': not self.available,
+        }
+
+
+def default_providers():
+    return [
+        Provider(
+            'purrbot', 'https://api.purrbot.site/v2/img/sfw/{action}/gif',
+            lambda data: [data['link']],
+            ('hug', 'kiss', 'slap', 'pat', 'cuddle', 'bite', 'poke', 'tickle', 'lick', 'feed'),
+        ),
+        Provider(
+            'nekos.best', 'https://nekos.best/api/v2/{action}?amount=10',
+            lambda data: [result['url'] for result in data['results']],
+            ('hug', 'kiss', 'slap', 'pat', 'cuddle', 'bite', 'poke', 'tickle', 'feed', 'wave'),
+        ),
+        Provider(
+            'nekos.life', 'https://nekos.life/api/v2/img/{action}',
+            lambda data: [data['url']],
+            ('hug', 'kiss', 'slap', 'pat', 'cuddle', 'poke', 'tickle', 'feed'),
+        ),
+        Provider(
+            'waifu.pics', 'https://api.waifu.pics/sfw/{action}',
+            lambda data: [data['url']],
+            ('hug', 'kiss', 'slap', 'pat', 'cuddle', 'bite', 'poke', 'lick', 'wave'),
+        ),
+    ]
+
+
+class GifPool:
+    # Buffer de URLs de GIFs por ação, reabastecido em segundo plano alternando entre provedores.
+    # Os comandos respondem da memória; só esperam a rede se nunca houve GIF para a ação
+    def __init__(self, http_client, providers=None, buffer_size=GIF_BUFFER_SIZE):
+        self.http = http_client
+        self.providers = providers if providers is not None else default_providers()
+        self.buffer_size = buffer_size
+        self.buffers = {}
+        self.recent = {}
+        self.refills = {}
+        self._rotation = 0
+        self.served = 0
+        self.live_fetches = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for task in self.refills.values():
+            task.cancel()
+        self.refills.clear()
+
+    def register(self, action):
+        if action not in self.buffers:
+            self.buffers[action] = deque(maxlen=self.buffer_size)
+            self.recent[action] = deque(maxlen=self.buffer_size)
+        self._schedule_refill(action)
+
+    def _schedule_refill(self, action):
+        task = self.refills.get(action)
+        if task is None or task.done():
+            self.refills[action] = asyncio.get_running_loop().create_task(self._refill(action))
+
+    def _providers_for(self, action):
+        # Rodízio: cada rodada começa por um provedor diferente
+        supported = [p for p in self.providers if p.supports(action)]
+        if not supported:
+            return []
+        self._rotation = (self._rotation + 1) % len(supported)
+        return supported[self._rotation:] + supported[:self._rotation]
+
+    async def _fetch(self, action):
+        for provider in self._providers_for(action):
+            if not provider.available:
+                continue
+            try:
+                urls = provider.parse(await self.http.get_json(provider.endpoint(action)))
+            except (HttpError, aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+                print(f"[GIFs] {provider.name} falhou para '{action}': {type(e).__name__}: {e}")
+                provider.record_failure()
+                continue
+            provider.record_success()
+            return urls
+        return []
+
+    async def _refill(self, action):
+        buffer = self.buffers[action]
+        # Limite de rodadas: um provedor que só repete GIFs não prende a task para sempre
+        for _ in range(self.buffer_size):
+            if len(buffer) >= self.buffer_size:
+                return
+            urls = await self._fetch(action)
+            if not urls:
+                # Todos os provedores falharam ou estão com o circuito aberto
+                return
+            for url in urls:
+                if url not in buffer and url not in self.recent[action]:
+                    buffer.append(url)
+
+    async def get(self, action):
+        if action not in self.buffers:
+            self.register(action)
+        buffer = self.buffers[action]
+        recent = self.recent[action]
+
+        if buffer:
+            url = buffer.popleft()
+        elif recent:
+            # Buffer vazio mas reabastecendo: repete um GIF já enviado em vez de esperar a rede
+            url = random.choice(recent)
+        else:
+            self.live_fetches += 1
+            urls = await self._fetch(action)
+            if not urls:
+                return None
+            url = urls[0]
+            buffer.extend(u for u in urls[1:] if u not in buffer)
+
+        recent.append(url)
+        self.served += 1
+        if len(buffer) < GIF_REFILL_THRESHOLD:
+            self._schedule_refill(action)
+        return url
+
+    def stats(self):
+        return {
+            'served': self.served,
+            'live_fetches': self.live_fetches,
+            'buffers': {action: len(buffer) for action, buffer in self.buffers.items()},
+            'providers': {provider.name: provider.stats() for provider in self.providers},
+        }
+
+
+async def send_gif(ctx, action, description, color, error_message):
+    url = await ctx.bot.gifs.get(action)
+    if url is None:
+        return await ctx.send(error_message)
+
+    embed = discord.Embed(description=description, color=color)
+    embed.set_image(url=url)
+    await ctx.send(embed=embed)
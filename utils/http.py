@@ -0,0 +1,161 @@
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import aiohttp
+
+from utils import metrics
+
+HTTP_LIMIT = int(os.getenv('HTTP_LIMIT', 100))
+HTTP_LIMIT_PER_HOST = int(os.getenv('HTTP_LIMIT_PER_HOST', 10))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))
+RETRY_BASE_DELAY = 0.3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Retry-After maior que isso não é esperado: o erro sobe na hora
+RETRY_AFTER_MAX = 30
+
+
+HTTP_SECONDS = metrics.histogram('potinho_http_seconds', 'Latência das requisições HTTP de saída', ['host'])
+
+
+class HttpError(Exception):
+    def __init__(self, status, url, retry_after=None):
+        super().__init__(f"HTTP {status} em {url}")
+        self.status = status
+        self.url = url
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    # Segundos ("120") ou data HTTP ("Wed, 21 Oct 2015 07:28:00 GMT"); None se ausente/inválido
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HostStats:
+    __slots__ = ('requests', 'errors', 'retries', 'latency_total', 'latency_max')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def observe(self, latency):
+        self.requests += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'latency_avg': self.latency_total / self.requests if self.requests else 0.0,
+            'latency_max': self.latency_max,
+        }
+
+
+class HttpClient:
+    # Uma única ClientSession para o bot inteiro: conexões keep-alive reaproveitadas,
+    # cache de DNS, limite de conexões por host, timeout e novas tentativas com jitter
+    def __init__(self, limit=HTTP_LIMIT, limit_per_host=HTTP_LIMIT_PER_HOST, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.session = None
+        self.hosts = {}
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={'User-Agent': 'BotPotinho (discord bot)'},
+        )
+        print(f"[HTTP] Cliente iniciado ({self.limit} conexões, {self.limit_per_host} por host)")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _host(self, url):
+        host = urlparse(url).hostname or url
+        stats = self.hosts.get(host)
+        if stats is None:
+            stats = self.hosts[host] = HostStats()
+        return host, stats
+
+    @staticmethod
+    def _observe(stats, histogram, started):
+        elapsed = time.perf_counter() - started
+        stats.observe(elapsed)
+        histogram.observe(elapsed)
+
+    async def request_json(self, method, url, **kwargs):
+        host, stats = self._host(url)
+        histogram = HTTP_SECONDS.labels(host)
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    if resp.status < 400:
+                        data = await resp.json(content_type=None)
+                        self._observe(stats, histogram, started)
+                        return data
+                    error = HttpError(resp.status, url, parse_retry_after(resp.headers.get('Retry-After')))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            except ValueError as e:
+                # Resposta 2xx que não é JSON: falha como as outras, mas repetir não adianta
+                error = e
+            self._observe(stats, histogram, started)
+
+            # Backoff exponencial com jitter completo para não sincronizar as novas tentativas
+            delay = random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+            if isinstance(error, HttpError):
+                retryable = error.status in RETRY_STATUSES
+                if error.retry_after is not None:
+                    # O servidor disse quanto esperar (429/503): vale mais que o backoff
+                    delay = error.retry_after
+                    retryable = retryable and delay <= RETRY_AFTER_MAX
+            else:
+                retryable = not isinstance(error, ValueError)
+            if not retryable or attempt >= self.retries:
+                stats.errors += 1
+                raise error
+            stats.retries += 1
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url, **kwargs):
+        return await self.request_json('GET', url, **kwargs)
+
+    def stats(self):
+        return {host: stats.as_dict() for host, stats in self.hosts.items()}
@@ -0,0 +1,350 @@
+import asyncio
+import math
+import os
+import time
+
+from aiohttp import web
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# 0 desliga o endpoint /metrics
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+LOOP_LAG_INTERVAL = 0.25
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{_escape_label(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape_label(value):
+    # Formato texto do Prometheus: \, " e quebra de linha escapados dentro do valor do label
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def time(self):
+        return _Timer(self)
+
+    def quantile(self, q):
+        # Interpolação linear dentro do bucket, como o histogram_quantile do Prometheus
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def __getattr__(self, item):
+        # Métricas sem labels: metric.inc() em vez de metric.labels().inc()
+        if item.startswith('_') or self.labelnames:
+            raise AttributeError(item)
+        return getattr(self.labels(), item)
+
+    def samples(self):
+        for values, child in self.children.items():
+            yield self.name, self.labelnames, values, child.value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def samples(self):
+        names = self.labelnames + ('le',)
+        for values, child in self.children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", names, values + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, values, child.sum
+            yield f"{self.name}_count", self.labelnames, values, child.count
+
+
+_DYNAMIC = object()
+
+
+def flatten_stats(prefix, stats, labels=None, _key=None, _names=(), _values=()):
+    # Achata o dict de stats() em (nome, labels, valores, número). Chaves dinâmicas
+    # (hosts, provedores...) viram label: labels={'providers': 'provider'}, None = raiz
+    labels = labels or {}
+    label = labels.get(_key)
+    for key, value in stats.items():
+        if label is not None:
+            name, names, values = prefix, _names + (label,), _values + (str(key),)
+        else:
+            name, names, values = f"{prefix}_{key}", _names, _values
+        if isinstance(value, dict):
+            # Abaixo de uma chave dinâmica os nomes voltam a ser fixos
+            yield from flatten_stats(name, value, labels, key if label is None else _DYNAMIC, names, values)
+        elif isinstance(value, bool):
+            # Estados ligado/desligado (ex.: disjuntor aberto) viram 1/0
+            yield name, names, values, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, names, values, value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.sources = {}
+
+    def _register(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            # Recarregar um módulo (ex.: reload de extensão) reaproveita a métrica
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        # collector() é chamado a cada coleta e devolve métricas já preenchidas
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def add_source(self, name, stats, labels=None):
+        # stats() de um serviço (caches, pools...), exportado como gauges e mostrado no p!stats
+        self.sources[name] = (stats, labels)
+
+    def remove_source(self, name):
+        self.sources.pop(name, None)
+
+    def read_sources(self):
+        results = {}
+        for name, (stats, labels) in list(self.sources.items()):
+            try:
+                results[name] = (stats(), labels)
+            except Exception as e:
+                print(f"[Métricas] Fonte '{name}' falhou: {type(e).__name__}: {e}")
+        return results
+
+    def collect(self):
+        yield from self.metrics.values()
+        for collector in list(self.collectors):
+            try:
+                yield from collector()
+            except Exception as e:
+                print(f"[Métricas] Coletor falhou: {type(e).__name__}: {e}")
+        for name, (stats, labels) in self.read_sources().items():
+            gauges = {}
+            for metric_name, names, values, value in flatten_stats(f"potinho_{name}", stats, labels):
+                metric = gauges.get(metric_name)
+                if metric is None:
+                    metric = gauges[metric_name] = Gauge(metric_name, f"{name}: {metric_name}", names)
+                metric.labels(*values).set(value)
+            yield from gauges.values()
+
+    def render(self):
+        lines = []
+        for metric in self.collect():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, values, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.gauge(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def add_source(name, stats, labels=None):
+    REGISTRY.add_source(name, stats, labels)
+
+
+def remove_source(name):
+    REGISTRY.remove_source(name)
+
+
+COMMAND_LATENCY = histogram('potinho_command_seconds', 'Duração dos comandos', ['command'])
+COMMAND_ERRORS = counter('potinho_command_errors_total', 'Comandos que terminaram com erro', ['command'])
+LOOP_LAG = histogram('potinho_event_loop_lag_seconds', 'Atraso do event loop', buckets=LAG_BUCKETS)
+
+
+class LoopLagMonitor:
+    # Dorme um intervalo fixo e mede quanto o loop demorou a mais para acordar a task
+    def __init__(self, interval=LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.task = None
+        self.last = 0.0
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last = max(loop.time() - started - self.interval, 0.0)
+            LOOP_LAG.observe(self.last)
+
+
+class MetricsServer:
+    # Endpoint /metrics no formato texto do Prometheus, só na interface local por padrão
+    def __init__(self, registry=REGISTRY, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def start(self):
+        if not self.port:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"[Métricas] Servindo em http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
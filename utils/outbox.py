@@ -0,0 +1,232 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import discord
+
+from utils import metrics
+
+# Linhas de status que chegam dentro dessa janela saem numa mensagem só
+OUTBOX_MERGE_WINDOW = float(os.getenv('OUTBOX_MERGE_WINDOW', 0.75))
+# Status pendentes por canal; passando disso os mais antigos são descartados
+OUTBOX_BACKLOG = int(os.getenv('OUTBOX_BACKLOG', 10))
+# Limite do Discord para criar (e, à parte, editar) mensagens: 5 a cada 5 s por canal
+CHANNEL_BURST = 5
+CHANNEL_PERIOD = 5.0
+MAX_MESSAGE = 2000
+# Sem nada para enviar por esse tempo, a task do canal termina (volta no próximo envio)
+IDLE_TIMEOUT = 60
+
+OUTBOX_MESSAGES = metrics.counter(
+    'potinho_outbox_messages_total', 'Mensagens tratadas pelo agendador de envios', ['result']
+)
+
+
+class RateBucket:
+    # Balde de fichas: até "burst" envios seguidos, depois um a cada period / burst
+    def __init__(self, burst=CHANNEL_BURST, period=CHANNEL_PERIOD):
+        self.burst = burst
+        self.rate = burst / period
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def delay(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        delay = self.delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.delay()
+        self.tokens -= 1
+
+
+def merge_lines(lines, limit=MAX_MESSAGE):
+    # Junta linhas em mensagens de até "limit" caracteres, sem quebrar uma linha no meio
+    messages, current = [], ''
+    for line in lines:
+        line = line[:limit]
+        if current and len(current) + 1 + len(line) > limit:
+            messages.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        messages.append(current)
+    return messages
+
+
+class ChannelOutbox:
+    # Fila de saída de um canal (um bucket de rate limit do Discord): respostas primeiro, depois
+    # o "tocando agora" e por fim as linhas de status acumuladas, mescladas numa mensagem
+    def __init__(self, channel):
+        self.channel = channel
+        self.replies = deque()
+        self.statuses = deque()
+        self.now_playing = None
+        self.now_playing_message = None
+        self.send_bucket = RateBucket()
+        self.edit_bucket = RateBucket()
+        self.task = None
+        self._wake = asyncio.Event()
+        # Respostas e "tocando agora" não esperam a janela de mesclagem
+        self._urgent = asyncio.Event()
+
+    @property
+    def backlog(self):
+        return len(self.replies) + len(self.statuses) + (self.now_playing is not None)
+
+    def wake(self, urgent=False):
+        self._wake.set()
+        if urgent:
+            self._urgent.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        while True:
+            if not self.backlog:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    return
+            if not self.replies and self.now_playing is None:
+                # Só status: dá tempo de outras linhas chegarem e saírem juntas
+                self._urgent.clear()
+                try:
+                    await asyncio.wait_for(self._urgent.wait(), OUTBOX_MERGE_WINDOW)
+                except asyncio.TimeoutError:
+                    pass
+
+            if self.replies:
+                await self._send_reply(self.replies.popleft())
+            elif self.now_playing is not None:
+                content, self.now_playing = self.now_playing, None
+                await self._send_now_playing(content)
+            elif self.statuses:
+                lines = list(self.statuses)
+                self.statuses.clear()
+                messages = merge_lines(lines)
+                OUTBOX_MESSAGES.labels('merged').inc(len(lines) - len(messages))
+                for i, content in enumerate(messages):
+                    if i and self.replies:
+                        # Uma resposta chegou no meio: o resto volta para a fila de status
+                        self.statuses.extendleft(reversed(messages[i:]))
+                        break
+                    try:
+                        await self._send(content)
+                    except discord.HTTPException:
+                        pass
+
+    async def _send(self, content=None, **kwargs):
+        await self.send_bucket.acquire()
+        try:
+            message = await self.channel.send(content, **kwargs)
+        except discord.HTTPException as e:
+            OUTBOX_MESSAGES.labels('failed').inc()
+            print(f"[Outbox {self.channel.id}] Falha ao enviar mensagem: {e}")
+            raise
+        OUTBOX_MESSAGES.labels('sent').inc()
+        return message
+
+    async def _send_reply(self, reply):
+        kwargs, future = reply
+        if future.done():
+            return
+        try:
+            future.set_result(await self._send(**kwargs))
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+
+    async def _send_now_playing(self, content):
+        # Edita a mensagem anterior se nada foi postado depois dela; senão, uma nova embaixo
+        message = self.now_playing_message
+        if message is not None and getattr(self.channel, 'last_message_id', None) == message.id:
+            await self.edit_bucket.acquire()
+            try:
+                await message.edit(content=content)
+                OUTBOX_MESSAGES.labels('edited').inc()
+                return
+            except discord.HTTPException as e:
+                print(f"[Outbox {self.channel.id}] Falha ao editar 'tocando agora': {e}")
+        try:
+            self.now_playing_message = await self._send(content)
+        except discord.HTTPException:
+            self.now_playing_message = None
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        for _, future in self.replies:
+            future.cancel()
+        self.replies.clear()
+
+
+class Outbox:
+    # Agendador de mensagens do bot. Os comandos não esperam o Discord: status saem em segundo
+    # plano, mesclados por canal, e são descartados se acumularem; o rate limit fica aqui,
+    # não dentro do ctx.send de quem está processando o comando
+    def __init__(self, backlog=OUTBOX_BACKLOG):
+        self.backlog = backlog
+        self.channels = {}
+        self.dropped = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def _channel(self, channel):
+        outbox = self.channels.get(channel.id)
+        if outbox is None:
+            outbox = self.channels[channel.id] = ChannelOutbox(channel)
+        # Mantém o objeto mais recente do canal (last_message_id atualizado pelo cache)
+        outbox.channel = channel
+        return outbox
+
+    def status(self, channel, content):
+        # Baixa prioridade: pode ser mesclado com outras linhas ou descartado sob acúmulo
+        outbox = self._channel(channel)
+        outbox.statuses.append(content)
+        while len(outbox.statuses) > self.backlog:
+            outbox.statuses.popleft()
+            self.dropped += 1
+            OUTBOX_MESSAGES.labels('dropped').inc()
+        outbox.wake()
+
+    def now_playing(self, channel, content):
+        # Só o último conteúdo importa: trocas rápidas de faixa viram uma edição só
+        outbox = self._channel(channel)
+        if outbox.now_playing is not None:
+            OUTBOX_MESSAGES.labels('replaced').inc()
+        outbox.now_playing = content
+        outbox.wake(urgent=True)
+
+    async def send(self, channel, content=None, **kwargs):
+        # Resposta que o comando precisa (embeds, views): nunca descartada, passa na frente
+        outbox = self._channel(channel)
+        future = asyncio.get_running_loop().create_future()
+        outbox.replies.append((dict(kwargs, content=content), future))
+        outbox.wake(urgent=True)
+        return await future
+
+    def stats(self):
+        return {
+            'channels': sum(1 for outbox in self.channels.values() if outbox.task and not outbox.task.done()),
+            'backlog': sum(outbox.backlog for outbox in self.channels.values()),
+            'dropped': self.dropped,
+        }
+
+    def close(self):
+        for outbox in self.channels.values():
+            outbox.close()
+        self.channels.clear()
@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+import re
+import time
+
+from utils.storage import connect
+
+DURATION_RE = re.compile(r'(\d+)([smhdw])')
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+MAX_DURATION = 365 * 86400
+# Lembretes entregues por consulta ao banco quando vários vencem juntos
+DELIVERY_BATCH = 500
+# Entrega que falhou volta ao banco e é tentada de novo depois de RETRY_DELAY segundos, até
+# MAX_ATTEMPTS vezes
+RETRY_DELAY = 60
+MAX_ATTEMPTS = 5
+
+
+def parse_duration(text):
+    # "10s", "5m", "1h30m", "2d", "1w2d" -> segundos; None se o formato for inválido
+    text = text.lower().replace(' ', '')
+    if not text or DURATION_RE.sub('', text):
+        return None
+    total = sum(int(amount) * UNITS[unit] for amount, unit in DURATION_RE.findall(text))
+    if total <= 0 or total > MAX_DURATION:
+        return None
+    return total
+
+
+def format_duration(seconds):
+    seconds = int(max(seconds, 0))
+    parts = []
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60), ('s', 1)):
+        amount, seconds = divmod(seconds, size)
+        if amount:
+            parts.append(f"{amount}{unit}")
+    return ''.join(parts) or '0s'
+
+
+class ReminderStore:
+    def __init__(self, filename='reminders.sqlite3'):
+        self.conn = connect(filename)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS reminders ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+            "channel_id INTEGER NOT NULL, due_at REAL NOT NULL, "
+            "created_at REAL NOT NULL, message TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS reminders_user ON reminders (user_id, due_at)")
+        self.conn.commit()
+
+    def add(self, user_id, channel_id, due_at, message):
+        cursor = self.conn.execute(
+            "INSERT INTO reminders (user_id, channel_id, due_at, created_at, message) VALUES (?, ?, ?, ?, ?)",
+            (user_id, channel_id, due_at, time.time(), message)
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def schedule(self):
+        # Só (vencimento, id): o texto fica no disco até a hora da entrega
+        return self.conn.execute("SELECT due_at, id FROM reminders").fetchall()
+
+    def claim(self, ids):
+        # Lê e apaga numa transação só: no modo cluster todos os processos carregam os mesmos
+        # lembretes, e só quem apagar primeiro entrega
+        placeholders = ','.join('?' * len(ids))
+        with self.conn:
+            return self.conn.execute(
+                f"DELETE FROM reminders WHERE id IN ({placeholders}) "
+                "RETURNING id, user_id, channel_id, due_at, created_at, message",
+                ids
+            ).fetchall()
+
+    def restore(self, rows):
+        # Devolve lembretes tirados por claim() cuja entrega falhou, com o mesmo id
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO reminders (id, user_id, channel_id, due_at, created_at, message) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def delete(self, ids):
+        self.conn.executemany("DELETE FROM reminders WHERE id = ?", [(i,) for i in ids])
+        self.conn.commit()
+
+    def for_user(self, user_id, limit=10):
+        return self.conn.execute(
+            "SELECT id, due_at, message FROM reminders WHERE user_id = ? ORDER BY due_at LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+
+    def count_for_user(self, user_id):
+        return self.conn.execute("SELECT COUNT(*) FROM reminders WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def cancel(self, user_id, reminder_id):
+        cursor = self.conn.execute("DELETE FROM reminders WHERE id = ? AND user_id = ?", (reminder_id, user_id))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
+    def close(self):
+        self.conn.close()
+
+
+class ReminderScheduler:
+    # Uma única task dorme até o próximo vencimento do heap; cancelados são descartados
+    # quando chegam ao topo (a linha não existe mais no banco)
+    def __init__(self, bot, deliver, store=None):
+        self.bot = bot
+        self.deliver = deliver
+        self.store = store or ReminderStore()
+        self.heap = []
+        self.task = None
+        self._changed = asyncio.Event()
+        self.delivered = 0
+        self.failures = 0
+        # id -> entregas que já falharam
+        self.attempts = {}
+
+    def start(self):
+        self.heap = self.store.schedule()
+        heapq.heapify(self.heap)
+        print(f"[Lembretes] {len(self.heap)} lembrete(s) pendente(s) carregado(s)")
+        self.task = self.bot.loop.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+        self.store.close()
+
+    def add(self, user_id, channel_id, seconds, message):
+        due_at = time.time() + seconds
+        reminder_id = self.store.add(user_id, channel_id, due_at, message)
+        heapq.heappush(self.heap, (due_at, reminder_id))
+        # Só acorda a task se o novo lembrete for o próximo a vencer
+        if self.heap[0][1] == reminder_id:
+            self._changed.set()
+        return reminder_id
+
+    def cancel(self, user_id, reminder_id):
+        return self.store.cancel(user_id, reminder_id)
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            # Esta é a única task de entrega: um erro numa volta não pode derrubá-la
+            try:
+                await self._tick()
+            except Exception as e:
+                print(f"[ERRO Lembretes] Falha no agendador: {type(e).__name__}: {e}")
+                await asyncio.sleep(1)
+
+    async def _tick(self):
+        self._changed.clear()
+        if not self.heap:
+            await self._changed.wait()
+            return
+
+        delay = self.heap[0][0] - time.time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        # Tudo que já venceu sai de uma vez (inclusive o atraso acumulado com o bot fora do ar)
+        now = time.time()
+        due = []
+        while self.heap and self.heap[0][0] <= now and len(due) < DELIVERY_BATCH:
+            due.append(heapq.heappop(self.heap)[1])
+
+        try:
+            rows = self.store.claim(due)
+        except Exception:
+            # Continuam no banco: voltam ao heap para a próxima tentativa
+            for reminder_id in due:
+                heapq.heappush(self.heap, (now + RETRY_DELAY, reminder_id))
+            raise
+
+        delivered = await asyncio.gather(*(self._deliver(row, now) for row in rows))
+        failed = [row for row, ok in zip(rows, delivered) if not ok]
+        if failed:
+            self._retry(failed, now)
+
+    async def _deliver(self, row, now):
+        reminder_id, user_id, channel_id, due_at, _, message = row
+        try:
+            await self.deliver(user_id, channel_id, message, now - due_at)
+        except Exception as e:
+            self.failures += 1
+            print(f"[ERRO Lembretes] Falha ao entregar lembrete {reminder_id}: {type(e).__name__}: {e}")
+            return False
+        self.delivered += 1
+        self.attempts.pop(reminder_id, None)
+        return True
+
+    def _retry(self, rows, now):
+        # claim() já apagou as linhas: quem falhou volta ao banco (com o vencimento original,
+        # para o atraso aparecer na entrega) e ao heap, para daqui a RETRY_DELAY
+        retry = []
+        for row in rows:
+            reminder_id = row[0]
+            attempts = self.attempts.get(reminder_id, 0) + 1
+            if attempts >= MAX_ATTEMPTS:
+                self.attempts.pop(reminder_id, None)
+                print(f"[ERRO Lembretes] Lembrete {reminder_id} descartado após {attempts} tentativas")
+                continue
+            self.attempts[reminder_id] = attempts
+            retry.append(row)
+        if not retry:
+            return
+        self.store.restore(retry)
+        for row in retry:
+            heapq.heappush(self.heap, (now + RETRY_DELAY, row[0]))
+
+    def stats(self):
+        return {'scheduled': len(self.heap), 'delivered': self.delivered, 'failures': self.failures}
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import random
+import time
+
+import discord
+
+# Intent privilegiado de membros (precisa estar ligado no portal do Discord). Sem ele não há
+# índice: o p!par usa só os membros que estiverem no cache, como antes
+MEMBERS_INTENT = os.getenv('MEMBERS_INTENT', '0') == '1'
+# "full" guarda todos os membros no cache do discord.py; "voice" guarda só quem está em canal de
+# voz (o player precisa deles) e o p!par vive do índice de ids, bem mais leve em servidores grandes
+MEMBER_CACHE = os.getenv('MEMBER_CACHE', 'voice')
+# "demand" baixa os membros de um servidor no primeiro p!par; "startup" baixa de todos ao conectar
+MEMBER_CHUNKING = os.getenv('MEMBER_CHUNKING', 'demand')
+# No modo "voice" trocas de cargo de quem não está no cache não chegam como evento: o índice do
+# servidor é refeito no próximo uso depois desse tempo
+ROLE_INDEX_TTL = int(os.getenv('ROLE_INDEX_TTL', 600))
+# Tempo mínimo para o Discord entregar a lista de membros; servidores grandes ganham mais
+CHUNK_TIMEOUT = 30
+
+
+def member_cache_flags(intents):
+    if not intents.members or MEMBER_CACHE == 'full':
+        return discord.MemberCacheFlags.from_intents(intents)
+    return discord.MemberCacheFlags(voice=intents.voice_states, joined=False)
+
+
+def chunk_at_startup(intents):
+    return intents.members and MEMBER_CHUNKING == 'startup'
+
+
+class RoleMembers:
+    # Ids dos membros (sem bots) de um cargo numa lista, mais a posição de cada um: adicionar,
+    # remover (trocando com o último) e sortear são O(1), sem montar lista a cada comando
+    __slots__ = ('ids', 'positions')
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, member_id):
+        if member_id not in self.positions:
+            self.positions[member_id] = len(self.ids)
+            self.ids.append(member_id)
+
+    def discard(self, member_id):
+        index = self.positions.pop(member_id, None)
+        if index is None:
+            return
+        last = self.ids.pop()
+        if last != member_id:
+            self.ids[index] = last
+            self.positions[last] = index
+
+    def sample(self, count, rng=random):
+        return rng.sample(self.ids, count)
+
+    def shuffled(self, rng=random):
+        ids = list(self.ids)
+        rng.shuffle(ids)
+        return ids
+
+
+class GuildRoles:
+    __slots__ = ('roles', 'built_at')
+
+    def __init__(self):
+        self.roles = {}
+        self.built_at = time.monotonic()
+
+    def add(self, member_id, role_ids):
+        for role_id in role_ids:
+            members = self.roles.get(role_id)
+            if members is None:
+                members = self.roles[role_id] = RoleMembers()
+            members.add(member_id)
+
+    def discard(self, member_id, role_ids=None):
+        # Sem a lista de cargos (saída do servidor), procura em todos: são no máximo 250
+        for role_id in self.roles if role_ids is None else role_ids:
+            members = self.roles.get(role_id)
+            if members is not None:
+                members.discard(member_id)
+
+
+def role_ids(member):
+    # O @everyone entra também: p!par @everyone sorteia entre todo o servidor
+    return [role.id for role in member.roles]
+
+
+class RoleIndex:
+    # Membros por cargo de cada servidor, montado com um chunk do gateway no primeiro uso e
+    # mantido pelos eventos de membro (entrada, saída, troca de cargo)
+    def __init__(self, cache_members=MEMBER_CACHE == 'full', ttl=ROLE_INDEX_TTL):
+        self.cache_members = cache_members
+        # Com todos os membros no cache os eventos chegam sempre; sem eles, o índice expira
+        self.ttl = None if cache_members else ttl
+        self.guilds = {}
+        # guild_id -> (task do chunk, eventos que chegaram durante ele)
+        self.building = {}
+        self.chunks = 0
+        self.chunk_seconds = 0.0
+
+    def _fresh(self, guild_id):
+        index = self.guilds.get(guild_id)
+        if index is None:
+            return None
+        if self.ttl is not None and time.monotonic() - index.built_at > self.ttl:
+            return None
+        return index
+
+    async def role(self, guild, role):
+        index = self._fresh(guild.id)
+        if index is None:
+            building = self.building.get(guild.id)
+            if building is None:
+                task = asyncio.get_running_loop().create_task(self._build(guild))
+                building = self.building[guild.id] = (task, [])
+            # shield: quem desistir de esperar não cancela o chunk dos outros
+            index = await asyncio.shield(building[0])
+        return index.roles.get(role.id) or RoleMembers()
+
+    async def _build(self, guild):
+        started = time.perf_counter()
+        try:
+            if self.cache_members and guild.chunked:
+                members = guild.members
+            else:
+                timeout = max(CHUNK_TIMEOUT, (guild.member_count or 0) / 5000)
+                members = await asyncio.wait_for(guild.chunk(cache=self.cache_members), timeout)
+                self.chunks += 1
+            index = GuildRoles()
+            for member in members:
+                if not member.bot:
+                    index.add(member.id, role_ids(member))
+            # Eventos que chegaram enquanto o chunk era baixado, na ordem
+            for apply in self.building[guild.id][1]:
+                apply(index)
+            self.guilds[guild.id] = index
+        finally:
+            self.building.pop(guild.id, None)
+            self.chunk_seconds += time.perf_counter() - started
+        print(f"[Cargos] Índice de {guild.name} com {len(members)} membros em {time.perf_counter() - started:.2f}s")
+        return index
+
+    def _apply(self, guild_id, apply):
+        building = self.building.get(guild_id)
+        if building is not None:
+            building[1].append(apply)
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            apply(index)
+
+    def member_joined(self, member):
+        if not member.bot:
+            self._apply(member.guild.id, lambda index: index.add(member.id, role_ids(member)))
+
+    def member_left(self, guild_id, user_id):
+        self._apply(guild_id, lambda index: index.discard(user_id))
+
+    def member_updated(self, before, after):
+        if after.bot:
+            return
+        old, new = set(role_ids(before)), set(role_ids(after))
+        if old == new:
+            return
+
+        def apply(index):
+            index.discard(after.id, old - new)
+            index.add(after.id, new - old)
+
+        self._apply(after.guild.id, apply)
+
+    def role_deleted(self, role):
+        index = self.guilds.get(role.guild.id)
+        if index is not None:
+            index.roles.pop(role.id, None)
+
+    def forget(self, guild_id):
+        self.guilds.pop(guild_id, None)
+
+    def stats(self):
+        return {
+            'guilds': len(self.guilds),
+            'roles': sum(len(index.roles) for index in self.guilds.values()),
+            'entries': sum(len(members) for index in self.guilds.values() for members in index.roles.values()),
+            'chunks': self.chunks,
+            'chunk_seconds': round(self.chunk_seconds, 3),
+        }
@@ -0,0 +1,140 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+
+
+def data_path(filename):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, filename)
+
+
+def connect(filename, **kwargs):
+    # WAL: leitores não esperam quem escreve (nem entre processos do cluster) e o commit não faz
+    # fsync, só o checkpoint. Todos os bancos de DATA_DIR abrem por aqui
+    conn = sqlite3.connect(data_path(filename), **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class Writer:
+    # Uma thread por arquivo faz as escritas de todos os PersistentMap dele, fora do event loop.
+    # O que chegou junto vira um só commit, feito na hora: nenhuma transação fica aberta
+    # esperando a próxima escrita, segurando o lock de escrita do arquivo
+    def __init__(self, filename):
+        self.filename = filename
+        self.conn = connect(filename, check_same_thread=False)
+        self.queue = queue.SimpleQueue()
+        self.batches = 0
+        self.failures = 0
+        self.thread = threading.Thread(target=self._run, name=f'storage-{filename}', daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, sql, params, done=None):
+        self.queue.put((sql, params, done))
+
+    def flush(self, timeout=10):
+        # Espera o que já estava na fila chegar ao disco (encerramento)
+        written = threading.Event()
+        self.queue.put((None, None, written.set))
+        written.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            statements = [(sql, params) for sql, params, _ in batch if sql is not None]
+            try:
+                with self.conn:
+                    for sql, params in statements:
+                        self.conn.execute(sql, params)
+                self.batches += 1
+            except sqlite3.Error as e:
+                self.failures += 1
+                print(f"[Storage] Falha ao gravar {len(statements)} escrita(s) em {self.filename}: {e}")
+            for _, _, done in batch:
+                if done is not None:
+                    done()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def writer(filename):
+    # Por processo: um fork herda o dicionário, mas não a thread
+    key = (os.getpid(), filename)
+    with _writers_lock:
+        instance = _writers.get(key)
+        if instance is None:
+            instance = _writers[key] = Writer(filename)
+        return instance
+
+
+class PersistentMap:
+    # Dicionário texto -> texto guardado em uma tabela SQLite dentro de DATA_DIR. Leituras no
+    # event loop, pela conexão própria; escritas pela thread do Writer do arquivo
+    def __init__(self, filename, table):
+        self.table = table
+        self.conn = connect(filename)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.writer = writer(filename)
+        # Escritas ainda na fila do Writer: key -> (versão, valor ou None se apagada). Quem lê
+        # logo depois de escrever enxerga o valor novo antes de ele chegar ao banco
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.versions = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key][1]
+        row = self.conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        self._write(
+            key, value,
+            f"INSERT OR REPLACE INTO {self.table} (key, value, updated_at) VALUES (?, ?, ?)",
+            (key, value, time.time())
+        )
+
+    def delete(self, key):
+        self._write(key, None, f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def _write(self, key, value, sql, params):
+        with self.lock:
+            self.versions += 1
+            version = self.versions
+            self.pending[key] = (version, value)
+        self.writer.submit(sql, params, lambda: self._written(key, version))
+
+    def _written(self, key, version):
+        # Roda na thread do Writer; uma escrita mais nova da mesma chave continua pendente
+        with self.lock:
+            if self.pending.get(key, (None,))[0] == version:
+                del self.pending[key]
+
+    def flush(self):
+        self.writer.flush()
+
+    def __len__(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.conn.close()
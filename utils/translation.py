@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from utils.cache import LRUCache
+
+TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', 5000))
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', 4))
+# Limite do Google por pedido é 5000 caracteres; sobra margem para os separadores
+BATCH_MAX_CHARS = 4500
+
+
+class InvalidLanguage(ValueError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _languages():
+    # O deep_translator só é importado no primeiro uso de p!traduzir
+    from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
+    return GOOGLE_LANGUAGES_TO_CODES, set(GOOGLE_LANGUAGES_TO_CODES.values())
+
+
+def normalize_language(language):
+    # Aceita o código ("en", "pt") ou o nome em inglês ("english"), sem ir à rede
+    language = language.strip().lower()
+    names, codes = _languages()
+    if language in codes:
+        return language
+    if language in names:
+        return names[language]
+    raise InvalidLanguage(f"Idioma '{language}' não suportado.")
+
+
+_local = threading.local()
+
+
+def _translator(target):
+    # GoogleTranslator guarda estado do pedido na instância: uma por thread e idioma
+    translators = getattr(_local, 'translators', None)
+    if translators is None:
+        translators = _local.translators = {}
+    translator = translators.get(target)
+    if translator is None:
+        from deep_translator import GoogleTranslator
+        translator = translators[target] = GoogleTranslator(source='auto', target=target)
+    return translator
+
+
+def _translate(text, target):
+    return _translator(target).translate(text)
+
+
+class Translator:
+    # Tradução fora do loop, com cache LRU por (texto, idioma) e pedidos iguais em andamento unidos
+    def __init__(self, workers=TRANSLATION_WORKERS, cache_size=TRANSLATION_CACHE_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='translate')
+        self.cache = LRUCache(cache_size)
+        self.inflight = {}
+        self.backend_calls = 0
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def warm_up(self):
+        # Importa o deep_translator numa thread para o primeiro p!traduzir não travar o loop
+        await asyncio.to_thread(_languages)
+
+    async def _call(self, text, target):
+        self.backend_calls += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _translate, text, target)
+
+    async def translate(self, text, language):
+        target = normalize_language(language)
+        key = (text, target)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._call(text, target))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self.inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if task.result() is not None:
+            self.cache.put(key, task.result())
+
+    async def translate_batch(self, texts, language):
+        # Junta os textos não cacheados em blocos de até BATCH_MAX_CHARS, uma linha por texto,
+        # e traduz cada bloco em um único pedido
+        target = normalize_language(language)
+        results = [self.cache.get((text, target)) for text in texts]
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        for chunk in self._chunks(texts, pending):
+            lines = [' '.join(texts[i].split()) for i in chunk]
+            translated = await self._call('\n'.join(lines), target)
+            parts = (translated or '').split('\n')
+            one_by_one = len(parts) != len(chunk)
+            if one_by_one:
+                # O tradutor juntou ou quebrou linhas: traduz esse bloco um por um
+                parts = await asyncio.gather(*(self.translate(texts[i], target) for i in chunk))
+            for i, line, part in zip(chunk, lines, parts):
+                if not part and line and not one_by_one:
+                    # Linha que voltou vazia (ou None do tradutor): tenta esse texto sozinho
+                    part = await self.translate(texts[i], target)
+                if part is None:
+                    # Nem sozinho: fica o original, fora do cache para tentar de novo depois
+                    results[i] = texts[i]
+                    continue
+                results[i] = part.strip()
+                self.cache.put((texts[i], target), results[i])
+        return results
+
+    @staticmethod
+    def _chunks(texts, indexes):
+        chunk, size = [], 0
+        for i in indexes:
+            length = len(texts[i]) + 1
+            if chunk and size + length > BATCH_MAX_CHARS:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(i)
+            size += length
+        if chunk:
+            yield chunk
+
+    def stats(self):
+        return {
+            'backend_calls': self.backend_calls,
+            'inflight': len(self.inflight),
+            'cache': self.cache.stats(),
+        }